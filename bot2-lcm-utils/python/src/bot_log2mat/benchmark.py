@@ -0,0 +1,259 @@
+"""Throughput of the per-message work of log_to_mat.
+
+Times turning encoded messages of a few bot_core types into rows, the way
+log_to_mat does it: decoding each message and flattening it with the
+closures of lcmtype_flatten, which works for any type, and for fixed-size
+types, reading the row straight out of the encoded data with the
+struct.Struct of lcmtype_layout, one message at a time or (as with
+--vectorize) a block of messages at a time.  Prints the messages per
+second of each.
+
+Then times deciding which events to convert, over the events of a synthetic
+log with hundreds of channels, as log_to_mat does it, with the decision for
+each channel kept in a dict, and as it used to, with a list of the ignored
+channels and the regexes matched again for every event.
+
+usage: python -m bot_log2mat.benchmark [options]
+"""
+import getopt
+import random
+import re
+import sys
+import timeit
+
+from bot_core import pose_t, planar_lidar_t, rigid_transform_t
+
+from channel_filter import decide_channel, CHANNEL_ACCEPT, \
+        CHANNEL_UNKNOWN_TYPE
+from lcmtype_flatten import make_flattener
+from lcmtype_layout import make_struct_flattener, make_structured_dtype, \
+        unpack_rows, FINGERPRINT_SIZE
+from mmap_log import LogEvent
+
+# seconds each way of flattening a type is timed for, by default
+DEFAULT_SECONDS = 1.0
+
+# messages in each block unpacked at once, as with --vectorize
+VECTORIZED_BLOCK_ROWS = 10000
+
+# channels of the synthetic log of the channel filter benchmark: of a known
+# type, ignored by FILTER_IGNORE, and of an unknown type
+FILTER_CONVERTED_CHANNELS = 200
+FILTER_IGNORED_CHANNELS = 250
+FILTER_UNKNOWN_CHANNELS = 50
+FILTER_EVENTS = 200000
+FILTER_IGNORE = "RAW_.*"
+
+# times the events are filtered, keeping the fastest
+FILTER_REPEATS = 5
+
+def _make_pose(rand):
+    msg = pose_t()
+    msg.utime = 1000000000
+    msg.pos = [ rand.random() for i in range(3) ]
+    msg.vel = [ rand.random() for i in range(3) ]
+    msg.orientation = [ 1, 0, 0, 0 ]
+    msg.rotation_rate = [ rand.random() for i in range(3) ]
+    msg.accel = [ rand.random() for i in range(3) ]
+    return msg
+
+def _make_planar_lidar(rand):
+    msg = planar_lidar_t()
+    msg.utime = 1000000000
+    msg.nranges = 360
+    msg.ranges = [ rand.random() for i in range(msg.nranges) ]
+    msg.nintensities = 0
+    msg.intensities = []
+    msg.rad0 = -1.5
+    msg.radstep = 0.01
+    return msg
+
+def _make_rigid_transform(rand):
+    msg = rigid_transform_t()
+    msg.utime = 1000000000
+    msg.trans = [ rand.random() for i in range(3) ]
+    msg.quat = [ 1, 0, 0, 0 ]
+    return msg
+
+def benchmark_types(seed=1):
+    """Returns the (name, lcmtype, encoded message) tuples that are
+    timed."""
+    rand = random.Random(seed)
+    return [ ("bot_core.pose_t", pose_t, _make_pose(rand).encode()),
+            ("bot_core.planar_lidar_t", planar_lidar_t,
+                _make_planar_lidar(rand).encode()),
+            ("bot_core.rigid_transform_t", rigid_transform_t,
+                _make_rigid_transform(rand).encode()) ]
+
+def run_timed(func, seconds, rows_per_call=1):
+    """Call func over and over for the given number of seconds.  Returns the
+    rows per second."""
+    timer = timeit.default_timer
+    ncalls = 0
+    start = timer()
+    while True:
+        for i in xrange(100):
+            func()
+        ncalls += 100
+        elapsed = timer() - start
+        if elapsed >= seconds:
+            return ncalls * rows_per_call / elapsed
+
+def time_type(lcmtype, encoded, seconds):
+    """Time the ways of flattening the encoded message.  Returns the
+    messages per second with decode + closures, with a struct, and
+    vectorized, with None for the last two if the type isn't fixed-size."""
+    flattener = make_flattener(lcmtype.decode(encoded))
+    closure_rate = run_timed(lambda: flattener(lcmtype.decode(encoded)),
+            seconds)
+    struct_flattener = make_struct_flattener(lcmtype)
+    dtype = make_structured_dtype(lcmtype)
+    if struct_flattener is None or dtype is None:
+        return closure_rate, None, None
+    expected = flattener(lcmtype.decode(encoded))
+    if struct_flattener(encoded) != expected or \
+            unpack_rows(encoded[FINGERPRINT_SIZE:], dtype)[0].tolist() != \
+            expected:
+        raise ValueError("%s: the struct flattener doesn't match the "
+                "closures" % lcmtype.__name__)
+    struct_rate = run_timed(lambda: struct_flattener(encoded), seconds)
+    block = encoded[FINGERPRINT_SIZE:FINGERPRINT_SIZE + dtype.itemsize] * \
+            VECTORIZED_BLOCK_ROWS
+    vectorized_rate = run_timed(lambda: unpack_rows(block, dtype), seconds,
+            VECTORIZED_BLOCK_ROWS)
+    return closure_rate, struct_rate, vectorized_rate
+
+def make_filter_events(nevents=FILTER_EVENTS, seed=1):
+    """Returns the events of the channel filter benchmark, on channels
+    picked at random, with payloads that only hold a fingerprint."""
+    rand = random.Random(seed)
+    known = pose_t._get_packed_fingerprint()
+    unknown = "\x01" * FINGERPRINT_SIZE
+    channels = [ ("POSE_%d" % i, known) \
+            for i in range(FILTER_CONVERTED_CHANNELS) ]
+    channels += [ ("RAW_%d" % i, known) \
+            for i in range(FILTER_IGNORED_CHANNELS) ]
+    channels += [ ("UNKNOWN_%d" % i, unknown) \
+            for i in range(FILTER_UNKNOWN_CHANNELS) ]
+    events = []
+    for i in xrange(nevents):
+        channel, data = rand.choice(channels)
+        events.append(LogEvent(i, 1000000000 + i * 100, channel, data))
+    return events
+
+def filter_with_decisions(events, type_db, channels_to_process,
+        channels_to_ignore):
+    """Filter events as log_to_mat's get_event_type() does.  Returns the
+    number of events converted."""
+    decisions = {}
+    nconverted = 0
+    for e in events:
+        decision = decisions.get(e.channel)
+        if decision is None:
+            decision = decide_channel(e.channel, channels_to_process,
+                    channels_to_ignore)
+            decisions[e.channel] = decision
+        if decision != CHANNEL_ACCEPT:
+            continue
+        if type_db.get(e.data[:FINGERPRINT_SIZE]) is None:
+            decisions[e.channel] = CHANNEL_UNKNOWN_TYPE
+            continue
+        nconverted += 1
+    return nconverted
+
+def filter_with_list(events, type_db, channel_to_process, channel_to_ignore):
+    """Filter events as log_to_mat did before it kept a decision per
+    channel, with one -c and one -i regex.  Returns the number of events
+    converted."""
+    ignored_channels = []
+    nconverted = 0
+    for e in events:
+        if e.channel in ignored_channels:
+            continue
+        if (channel_to_ignore.match(e.channel) and \
+                len(channel_to_ignore.match(e.channel).group()) == \
+                len(e.channel)) or not channel_to_process.match(e.channel):
+            ignored_channels.append(e.channel)
+            continue
+        if type_db.get(e.data[:FINGERPRINT_SIZE]) is None:
+            ignored_channels.append(e.channel)
+            continue
+        nconverted += 1
+    return nconverted
+
+def time_filter(func, events, *args):
+    """Returns the number of events converted by the filter, and its
+    fastest time in seconds over FILTER_REPEATS runs."""
+    timer = timeit.default_timer
+    best = None
+    for i in range(FILTER_REPEATS):
+        start = timer()
+        nconverted = func(events, *args)
+        elapsed = timer() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return nconverted, best
+
+def _format_rate(rate):
+    if rate is None:
+        return "-"
+    return "%.0fk" % (rate / 1000)
+
+def usage():
+    sys.stderr.write("""usage: %s [options]
+
+Times flattening messages of a few bot_core types the ways log_to_mat does
+it, and prints the messages per second of each.  Variable-length types are
+only flattened with closures.
+
+    -h --help          print this message
+    -s --seconds=sec   time each way of flattening a type for [sec] seconds
+                       [default %g]
+""" % (sys.argv[0], DEFAULT_SECONDS))
+    sys.exit(1)
+
+def main():
+    try:
+        opts, args = getopt.gnu_getopt(sys.argv[1:], "hs:",
+                [ "help", "seconds=" ])
+    except getopt.GetoptError, err:
+        sys.stderr.write("%s\n" % err)
+        usage()
+    seconds = DEFAULT_SECONDS
+    for o, a in opts:
+        if o in ("-h", "--help"):
+            usage()
+        elif o in ("-s", "--seconds"):
+            seconds = float(a)
+    if args:
+        usage()
+
+    sys.stdout.write("%-27s %15s %12s %12s\n" % ("messages/s",
+        "decode+closures", "struct", "vectorized"))
+    for name, lcmtype, encoded in benchmark_types():
+        rates = time_type(lcmtype, encoded, seconds)
+        sys.stdout.write("%-27s %15s %12s %12s\n" % ((name,) + \
+                tuple(_format_rate(rate) for rate in rates)))
+        sys.stdout.flush()
+
+    events = make_filter_events()
+    type_db = { pose_t._get_packed_fingerprint() : pose_t }
+    sys.stdout.write("\nfiltering %d events on %d channels with -i '%s'\n" % \
+            (len(events), FILTER_CONVERTED_CHANNELS + FILTER_IGNORED_CHANNELS +
+                FILTER_UNKNOWN_CHANNELS, FILTER_IGNORE))
+    process = re.compile(".*")
+    ignore = re.compile(FILTER_IGNORE)
+    expected, list_time = time_filter(filter_with_list, events, type_db,
+            process, ignore)
+    nconverted, dict_time = time_filter(filter_with_decisions, events,
+            type_db, [ process ], [ ignore ])
+    if nconverted != expected:
+        raise ValueError("the filters converted %d and %d events" % \
+                (expected, nconverted))
+    for name, elapsed in (("ignored channel list", list_time),
+            ("decision per channel", dict_time)):
+        sys.stdout.write("%-27s %9.0f ms %9.2f us/event\n" % (name,
+            elapsed * 1000, elapsed * 1e6 / len(events)))
+
+if __name__ == "__main__":
+    main()
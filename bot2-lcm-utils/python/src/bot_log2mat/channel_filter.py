@@ -0,0 +1,31 @@
+"""Which channels of a log log_to_mat converts.
+
+A channel is converted if it matches any of the -c regexes and none of the
+-i regexes.  A -c regex only has to match the start of the channel name,
+while a -i regex has to match all of it.  log_to_mat decides once per
+channel, and keeps the decision in a dict keyed by the channel name.
+"""
+
+# what log_to_mat decided for a channel
+CHANNEL_ACCEPT = 0
+CHANNEL_REJECT = 1
+CHANNEL_UNKNOWN_TYPE = 2
+
+def match_channel(regex, channel):
+    """Check whether a compiled regex matches the whole channel name."""
+    m = regex.match(channel)
+    return m is not None and len(m.group()) == len(channel)
+
+def decide_channel(channel, channels_to_process, channels_to_ignore):
+    """Check a channel against the -c and -i regexes.  Ignores take
+    precedence over includes.
+
+    @return CHANNEL_ACCEPT or CHANNEL_REJECT
+    """
+    for regex in channels_to_ignore:
+        if match_channel(regex, channel):
+            return CHANNEL_REJECT
+    for regex in channels_to_process:
+        if regex.match(channel):
+            return CHANNEL_ACCEPT
+    return CHANNEL_REJECT
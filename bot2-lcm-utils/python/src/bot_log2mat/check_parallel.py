@@ -0,0 +1,218 @@
+"""Check that log_to_mat --jobs converts a log the same as the serial loop.
+
+Writes a synthetic log, converts it with log_to_mat to a .mat file and with
+--print, without --jobs and then with each number of jobs in both --shard
+modes, and compares the outputs.  The printed text must be byte-identical.
+The .mat files can't be, since scipy writes the time they were created into
+their header, so the variables in them are compared instead, as the bytes
+of each array, along with the .m files next to them.
+
+The log has a fixed-size type (bot_core.pose_t), a variable-length type
+(bot_core.planar_lidar_t), NaNs, a message that fails to decode, a channel
+that is dropped after an unknown message partway through the log, and
+fake event headers inside message data for the range shards to trip over.
+
+usage: python -m bot_log2mat.check_parallel [options]
+"""
+import getopt
+import os
+import random
+import shutil
+import struct
+import subprocess
+import sys
+import tempfile
+
+import numpy
+import scipy.io
+
+from lcm import EventLog
+from bot_core import pose_t, planar_lidar_t, rigid_transform_t
+
+from log_shards import LOG_SYNC_WORD
+
+# number of POSE messages in the log, by default
+DEFAULT_EVENTS = 3000
+
+# --jobs checked, by default
+DEFAULT_JOBS = [ 2, 3, 7 ]
+
+SHARD_MODES = [ "range", "channel" ]
+
+_LOG_TO_MAT = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+        "log_to_mat.py")
+
+def write_log(fname, nevents=DEFAULT_EVENTS, seed=1):
+    """Write a synthetic log with nevents POSE messages and messages on
+    other channels in between."""
+    rand = random.Random(seed)
+    log = EventLog(fname, "w")
+    t = 1000000000
+    fake_header = struct.pack(">IqqII", LOG_SYNC_WORD, 5, 5, 4, 100)
+    for i in range(nevents):
+        t += 10000
+        pose = pose_t()
+        pose.utime = t
+        pose.pos = [ rand.random() for j in range(3) ]
+        pose.orientation = [ 1, 0, 0, float("nan") if i == 7 else 0 ]
+        log.write_event(t, "POSE", pose.encode())
+        if i == nevents // 2:
+            # fails to decode
+            log.write_event(t, "POSE", pose.encode()[:30])
+        # POSE2 is dropped at its first message of an unknown type
+        if i == nevents * 2 // 3:
+            log.write_event(t, "POSE2", "\x01" * 8 + "garbage")
+        else:
+            log.write_event(t, "POSE2", pose.encode())
+        if i % 3 == 0:
+            lidar = planar_lidar_t()
+            lidar.utime = t
+            lidar.nranges = 100 + i % 7
+            lidar.ranges = [ rand.random() for j in range(lidar.nranges) ]
+            lidar.nintensities = 0
+            lidar.intensities = []
+            lidar.rad0 = -1.5
+            lidar.radstep = 0.01
+            log.write_event(t + 1, "LIDAR", lidar.encode())
+        if i % 5 == 0:
+            transform = rigid_transform_t()
+            transform.utime = t
+            transform.trans = [ i, 2, 3 ]
+            transform.quat = [ 1, 0, 0, 0 ]
+            log.write_event(t + 2, "BODY_TO_LOCAL", transform.encode())
+        if i % 11 == 0:
+            log.write_event(t + 3, "JUNK", fake_header + "ABCD" + \
+                    struct.pack(">I", LOG_SYNC_WORD) * 10)
+    log.close()
+
+def run_log_to_mat(args):
+    """Run log_to_mat with the given arguments, without a cache of the LCM
+    types.  Raises RuntimeError if it fails."""
+    cmd = [ sys.executable, _LOG_TO_MAT, "--lcmtypes-cache=",
+            "-l", "bot_core" ] + args
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE)
+    out, err = proc.communicate()
+    if proc.returncode != 0:
+        raise RuntimeError("%s failed:\n%s" % (" ".join(cmd), err))
+
+def _read(fname):
+    f = open(fname, "rb")
+    try:
+        return f.read()
+    finally:
+        f.close()
+
+def _same_array(a, b):
+    if a.dtype != b.dtype or a.shape != b.shape:
+        return False
+    if a.dtype.names:
+        return all(_same_array(a[name], b[name]) for name in a.dtype.names)
+    if a.dtype == object:
+        return all(_same_array(numpy.asarray(x), numpy.asarray(y)) \
+                for x, y in zip(a.flat, b.flat))
+    return a.tostring() == b.tostring()
+
+def compare_mat(fname, expected_fname):
+    """Compare the variables saved in two .mat files, and the .m files next
+    to them.  Returns a list of the differences."""
+    data = scipy.io.loadmat(fname)
+    expected = scipy.io.loadmat(expected_fname)
+    names = set(k for k in data if not k.startswith("__"))
+    expected_names = set(k for k in expected if not k.startswith("__"))
+    diffs = [ "%s is missing" % k for k in sorted(expected_names - names) ]
+    diffs += [ "%s is extra" % k for k in sorted(names - expected_names) ]
+    for k in sorted(names & expected_names):
+        if not _same_array(data[k], expected[k]):
+            diffs.append("%s differs" % k)
+    # the .m file refers to the .mat file by name
+    mfile = _read(os.path.splitext(fname)[0] + ".m")
+    expected_mfile = _read(os.path.splitext(expected_fname)[0] + ".m")
+    base = os.path.splitext(os.path.basename(fname))[0]
+    expected_base = os.path.splitext(os.path.basename(expected_fname))[0]
+    if mfile.replace(base, expected_base) != expected_mfile:
+        diffs.append("the .m file differs")
+    return diffs
+
+def check_parallel(log_fname, out_dir, jobs=DEFAULT_JOBS, out=sys.stdout):
+    """Convert the log without and with --jobs, writing the outputs to
+    out_dir, and compare them.  Returns whether they are all the same."""
+    serial_mat = os.path.join(out_dir, "serial.mat")
+    serial_txt = os.path.join(out_dir, "serial.txt")
+    run_log_to_mat([ "-o", serial_mat, log_fname ])
+    run_log_to_mat([ "-p", "-o", serial_txt, log_fname ])
+    expected_txt = _read(serial_txt)
+
+    ok = True
+    for num_jobs in jobs:
+        for mode in SHARD_MODES:
+            name = "j%d_%s" % (num_jobs, mode)
+            args = [ "-j", str(num_jobs), "--shard=%s" % mode ]
+            mat = os.path.join(out_dir, name + ".mat")
+            txt = os.path.join(out_dir, name + ".txt")
+            run_log_to_mat(args + [ "-o", mat, log_fname ])
+            run_log_to_mat(args + [ "-p", "-o", txt, log_fname ])
+            diffs = compare_mat(mat, serial_mat)
+            if _read(txt) != expected_txt:
+                diffs.append("the --print output differs")
+            out.write("-j %-3d --shard=%-8s %s\n" % (num_jobs, mode,
+                "; ".join(diffs) if diffs else "same"))
+            out.flush()
+            ok = ok and not diffs
+    return ok
+
+def usage():
+    sys.stderr.write("""usage: %s [options]
+
+Converts a synthetic log with log_to_mat, with and without --jobs, and
+checks that the outputs are the same.
+
+    -h --help          print this message
+    -n --events=N      write [N] POSE messages to the log [default %d]
+    -j --jobs=N,...    check these numbers of jobs [default %s]
+    -k --keep=dir      write the log and outputs to [dir] and keep them,
+                       instead of using a temporary directory
+""" % (sys.argv[0], DEFAULT_EVENTS, ",".join(str(j) for j in DEFAULT_JOBS)))
+    sys.exit(1)
+
+def main():
+    try:
+        opts, args = getopt.gnu_getopt(sys.argv[1:], "hn:j:k:",
+                [ "help", "events=", "jobs=", "keep=" ])
+    except getopt.GetoptError, err:
+        sys.stderr.write("%s\n" % err)
+        usage()
+    nevents = DEFAULT_EVENTS
+    jobs = DEFAULT_JOBS
+    keep_dir = None
+    for o, a in opts:
+        if o in ("-h", "--help"):
+            usage()
+        elif o in ("-n", "--events"):
+            nevents = int(a)
+        elif o in ("-j", "--jobs"):
+            jobs = [ int(j) for j in a.split(",") ]
+        elif o in ("-k", "--keep"):
+            keep_dir = a
+    if args:
+        usage()
+
+    if keep_dir is not None:
+        out_dir = keep_dir
+        if not os.path.isdir(out_dir):
+            os.makedirs(out_dir)
+    else:
+        out_dir = tempfile.mkdtemp(prefix="log2mat_check_")
+    try:
+        log_fname = os.path.join(out_dir, "synthetic.lcmlog")
+        write_log(log_fname, nevents)
+        ok = check_parallel(log_fname, out_dir, jobs)
+    finally:
+        if keep_dir is None:
+            shutil.rmtree(out_dir)
+    if not ok:
+        sys.exit(1)
+    sys.stdout.write("--jobs output matches the serial output\n")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+"""Throughput and cost statistics for log_to_mat --stats.
+
+ConversionStats counts the messages and bytes read on each channel, the
+time spent decoding and flattening them, and the size of their output, and
+times the phases of a conversion (e.g. reading the log, padding, saving).
+It also formats the progress line shown while a log is converted, with the
+message and byte rates and an estimate of the time left.
+"""
+import json
+import time
+
+class ChannelStats(object):
+    __slots__ = [ "messages", "bytes", "decode_time", "convert_time",
+            "output_bytes", "ignored_messages", "ignored_bytes" ]
+
+    def __init__(self):
+        self.messages = 0
+        self.bytes = 0
+        self.decode_time = 0.0
+        # decoding and flattening
+        self.convert_time = 0.0
+        self.output_bytes = 0
+        self.ignored_messages = 0
+        self.ignored_bytes = 0
+
+    def get_flatten_time(self):
+        return max(0.0, self.convert_time - self.decode_time)
+
+    def merge(self, other):
+        for name in self.__slots__:
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+
+    def __getstate__(self):
+        return [ getattr(self, name) for name in self.__slots__ ]
+
+    def __setstate__(self, state):
+        for name, value in zip(self.__slots__, state):
+            setattr(self, name, value)
+
+def _format_duration(seconds):
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return "%d:%02d:%02d" % (seconds // 3600, seconds // 60 % 60,
+                seconds % 60)
+    return "%d:%02d" % (seconds // 60, seconds % 60)
+
+class ConversionStats(object):
+    def __init__(self, total_bytes=None):
+        """
+        @param total_bytes the number of bytes of log to convert, used for
+        the progress and time left estimates
+        """
+        self.total_bytes = total_bytes
+        self.channels = {}
+        # (name, seconds) in the order the phases first ran
+        self.phases = []
+        self._phase = None
+        self._phase_start = None
+        self.start_time = time.time()
+
+    def channel(self, channel):
+        stats = self.channels.get(channel)
+        if stats is None:
+            stats = ChannelStats()
+            self.channels[channel] = stats
+        return stats
+
+    def add_message(self, channel, nbytes, elapsed):
+        """Count a message that was converted in elapsed seconds."""
+        stats = self.channel(channel)
+        stats.messages += 1
+        stats.bytes += nbytes
+        stats.convert_time += elapsed
+
+    def add_ignored(self, channel, nbytes):
+        """Count a message on an ignored channel."""
+        stats = self.channel(channel)
+        stats.ignored_messages += 1
+        stats.ignored_bytes += nbytes
+
+    def ignore_channel(self, channel):
+        """Count the messages converted on a channel as ignored, e.g. when
+        a worker converted a channel that an earlier shard of the log
+        ignored."""
+        stats = self.channel(channel)
+        stats.ignored_messages += stats.messages
+        stats.ignored_bytes += stats.bytes
+        stats.messages = 0
+        stats.bytes = 0
+
+    def add_decode(self, channel, elapsed):
+        self.channel(channel).decode_time += elapsed
+
+    def add_convert_time(self, channel, elapsed):
+        self.channel(channel).convert_time += elapsed
+
+    def add_output(self, channel, nbytes):
+        self.channel(channel).output_bytes += nbytes
+
+    def merge(self, other):
+        """Add the channel statistics of another ConversionStats, e.g. from
+        a worker process."""
+        for channel, stats in other.channels.items():
+            self.channel(channel).merge(stats)
+
+    def start_phase(self, name):
+        """Start timing a phase, ending the current one."""
+        now = time.time()
+        self._end_phase(now)
+        self._phase = name
+        self._phase_start = now
+
+    def end_phase(self):
+        self._end_phase(time.time())
+        self._phase = None
+
+    def _end_phase(self, now):
+        if self._phase is None:
+            return
+        for i, (name, seconds) in enumerate(self.phases):
+            if name == self._phase:
+                self.phases[i] = (name, seconds + now - self._phase_start)
+                return
+        self.phases.append((self._phase, now - self._phase_start))
+
+    def get_progress(self, messages, bytes_read):
+        """Returns a progress line for messages read from the first
+        bytes_read bytes of the log."""
+        elapsed = max(time.time() - self.start_time, 1e-6)
+        line = "read % d messages, %.0f msgs/s, %.1f MB/s" % (messages,
+                messages / elapsed, bytes_read / elapsed / 1e6)
+        if self.total_bytes:
+            line += ", % d %% done" % (bytes_read * 100.0 / self.total_bytes)
+            if bytes_read > 0:
+                left = (self.total_bytes - bytes_read) * elapsed / bytes_read
+                line += ", ETA %s" % _format_duration(left)
+        return line
+
+    def to_dict(self):
+        channels = {}
+        for channel, stats in self.channels.items():
+            channels[channel] = { "messages" : stats.messages,
+                "bytes" : stats.bytes,
+                "decode_seconds" : stats.decode_time,
+                "flatten_seconds" : stats.get_flatten_time(),
+                "output_bytes" : stats.output_bytes,
+                "ignored_messages" : stats.ignored_messages,
+                "ignored_bytes" : stats.ignored_bytes }
+        return { "total_seconds" : time.time() - self.start_time,
+            "phases" : [ { "name" : name, "seconds" : seconds } \
+                    for name, seconds in self.phases ],
+            "channels" : channels }
+
+    def format_table(self):
+        """Returns the per channel and per phase statistics as a table, with
+        the most expensive channels first."""
+        lines = [ "%-24s %9s %9s %9s %9s %9s" % ("channel", "msgs", "MB",
+            "decode s", "flatten s", "out MB") ]
+        channels = sorted(self.channels.items(), key=lambda (channel, stats): \
+                (-stats.convert_time, -stats.bytes - stats.ignored_bytes, channel))
+        for channel, stats in channels:
+            if stats.messages or not stats.ignored_messages:
+                lines.append("%-24s %9d %9.2f %9.3f %9.3f %9.2f" % (channel,
+                    stats.messages, stats.bytes / 1e6, stats.decode_time,
+                    stats.get_flatten_time(), stats.output_bytes / 1e6))
+            if stats.ignored_messages:
+                lines.append("%-24s %9d %9.2f %9s %9s %9s" % (channel,
+                    stats.ignored_messages, stats.ignored_bytes / 1e6,
+                    "ignored", "", ""))
+        lines.append("")
+        lines.append("%-24s %9s" % ("phase", "seconds"))
+        for name, seconds in self.phases:
+            lines.append("%-24s %9.3f" % (name, seconds))
+        lines.append("%-24s %9.3f" % ("total", time.time() - self.start_time))
+        return "\n".join(lines) + "\n"
+
+    def save_json(self, fname):
+        f = open(fname, "w")
+        try:
+            json.dump(self.to_dict(), f, indent=2, sort_keys=True,
+                    separators=(",", ": "))
+            f.write("\n")
+        finally:
+            f.close()
@@ -0,0 +1,73 @@
+"""Flattening of decoded LCM messages.
+
+make_flattener() builds a function that turns a decoded message into the
+flat list of its numeric fields, in declaration order, that log_to_mat
+stores as one row of a channel's matrix.  Strings are left out.  Works for
+any LCM type, and is used for the types that lcmtype_layout can't read
+straight out of the encoded data.
+"""
+import types
+
+import numpy
+
+def make_simple_accessor(fieldname):
+    return lambda lst, x: lst.append(getattr(x, fieldname))
+
+def make_numpy_array_accessor(fieldname):
+    return lambda lst, x: lst.extend(numpy.array(getattr(x, fieldname)).ravel())
+
+def make_obj_accessor(fieldname, func):
+    return lambda lst, x: func(lst, getattr(x, fieldname))
+
+def make_obj_list_accessor(fieldname, func):
+    return lambda lst, x: map(lambda item: func(lst, item), getattr(x, fieldname))
+#    def list_accessor(lst, msg):
+#        msg_lst = getattr(msg, fieldname)
+#        for elem in msg_lst:
+#            func(lst, elem)
+#    return list_accessor
+#    
+
+
+def make_lcmtype_accessor(msg):
+    funcs = []
+
+    for fieldname in getattr(msg, '__slots__'):
+        m = getattr(msg, fieldname)
+
+        if type(m) in [ types.IntType, types.LongType, types.FloatType,
+                types.BooleanType ]:
+            # scalar
+            accessor = make_simple_accessor(fieldname)
+            funcs.append(accessor)
+        elif type(m) in [ types.ListType, types.TupleType ]:
+            # convert to a numpy array
+            arr = numpy.array(m)
+
+            # check the data type of the array
+            if arr.dtype.kind in "bif":
+                # numeric data type
+                funcs.append(make_numpy_array_accessor(fieldname))
+            elif arr.dtype.kind == "O":
+                # compound data type
+                typeAccess = make_lcmtype_accessor(m[0])
+                funcs.append(make_obj_list_accessor(fieldname, typeAccess))
+                #pass
+        elif type(m) in types.StringTypes:
+            # ignore strings
+            pass
+        else:
+            funcs.append(make_obj_accessor(fieldname, make_lcmtype_accessor(m)))
+
+    def flatten(lst, m):
+        for func in funcs:
+            func(lst, m)
+    return flatten
+
+def make_flattener(msg):
+    accessor = make_lcmtype_accessor(msg)
+    def flattener(m):
+        result = []
+        accessor(result, m)
+        return result
+    return flattener
@@ -0,0 +1,188 @@
+"""Binary layout of fixed-size LCM types.
+
+An LCM type is fixed-size if it has no strings, byte arrays or
+variable-length arrays, either directly or in a nested type.  Every encoded
+message of such a type has the same length, and its fields are packed in
+declaration order.  The flattened numeric representation of a message used by
+log_to_mat can then be read straight out of the encoded data with a single
+struct.unpack, without decoding the message into Python objects.
+
+The layout is discovered by encoding a default-constructed message and
+recording the struct formats used by the lcm-gen generated encoder.
+"""
+import io
+import re
+import struct
+import sys
+import types
+
+import numpy
+
+FINGERPRINT_SIZE = 8
+
+class _PackRecorder(object):
+    """Stands in for the struct module inside lcm-gen generated modules, and
+    records the format of every struct.pack call."""
+    def __init__(self):
+        self.formats = []
+
+    def pack(self, fmt, *args):
+        self.formats.append(fmt)
+        return struct.pack(fmt, *args)
+
+    def __getattr__(self, name):
+        return getattr(struct, name)
+
+def _is_lcm_object(value):
+    return hasattr(value, "_encode_one") and hasattr(value, "__slots__")
+
+def _collect_fixed_size_types(value, lcmtypes):
+    """Check that a default-constructed value is fixed-size, collecting all
+    LCM types it contains."""
+    if type(value) in [ types.IntType, types.LongType, types.FloatType,
+            types.BooleanType ]:
+        return True
+    if type(value) in [ types.ListType, types.TupleType ]:
+        # variable-length arrays default to empty lists
+        if not value:
+            return False
+        for item in value:
+            if not _collect_fixed_size_types(item, lcmtypes):
+                return False
+        return True
+    if _is_lcm_object(value):
+        if type(value) not in lcmtypes:
+            lcmtypes.append(type(value))
+        for fieldname in value.__slots__:
+            if not _collect_fixed_size_types(getattr(value, fieldname),
+                    lcmtypes):
+                return False
+        return True
+    # strings, byte arrays, and anything else we don't know about
+    return False
+
+def get_fixed_layout_format(lcmtype):
+    """Compute the struct format of the encoded fields of a fixed-size type.
+
+    @param lcmtype an lcm-gen generated Python class
+
+    @return a big-endian struct format string describing an encoded message
+    after its 8 byte fingerprint, or None if the type is not fixed-size.
+    """
+    try:
+        msg = lcmtype()
+    except Exception:
+        return None
+    lcmtypes = []
+    if not _collect_fixed_size_types(msg, lcmtypes):
+        return None
+    modules = []
+    for t in lcmtypes:
+        module = sys.modules.get(t.__module__)
+        if module is None:
+            return None
+        if module not in modules:
+            modules.append(module)
+        # The encoder of a type checks the fingerprints of the types nested
+        # in it, which packs them the first time, so compute them all now
+        # to keep them out of the recorded formats.
+        try:
+            t._get_packed_fingerprint()
+        except Exception:
+            return None
+
+    recorder = _PackRecorder()
+    patched = [ module for module in modules \
+            if getattr(module, "struct", None) is struct ]
+    if len(patched) != len(modules):
+        return None
+    buf = io.BytesIO()
+    for module in patched:
+        module.struct = recorder
+    try:
+        msg._encode_one(buf)
+    except Exception:
+        return None
+    finally:
+        for module in patched:
+            module.struct = struct
+
+    codes = []
+    for fmt in recorder.formats:
+        if not fmt.startswith(">"):
+            return None
+        codes.append(fmt[1:])
+    fmt = ">" + "".join(codes)
+    try:
+        if struct.calcsize(fmt) != len(buf.getvalue()):
+            # some fields were written without struct.pack
+            return None
+    except struct.error:
+        return None
+    return fmt
+
+def make_struct_flattener(lcmtype):
+    """Create a function that flattens encoded messages of a fixed-size type.
+
+    The returned function takes the encoded message data, including the
+    fingerprint, and returns the flattened list of field values.  It raises
+    ValueError if the data does not have the expected size.
+
+    @return the flattener function, or None if the type is not fixed-size.
+    """
+    fmt = get_fixed_layout_format(lcmtype)
+    if fmt is None:
+        return None
+    unpack_from = struct.Struct(fmt).unpack_from
+    datalen = struct.calcsize(fmt) + FINGERPRINT_SIZE
+
+    def flattener(data):
+        if len(data) != datalen:
+            raise ValueError("expected %d bytes, got %d" % (datalen, len(data)))
+        return list(unpack_from(data, FINGERPRINT_SIZE))
+    return flattener
+
+# struct format codes and the corresponding big-endian numpy types
+_STRUCT_TO_NUMPY = { "b" : ">i1", "B" : ">u1", "?" : ">b1", "h" : ">i2",
+        "H" : ">u2", "i" : ">i4", "I" : ">u4", "q" : ">i8", "Q" : ">u8",
+        "f" : ">f4", "d" : ">f8" }
+
+def make_structured_dtype(lcmtype):
+    """Create a numpy structured dtype matching the encoded fields of a
+    fixed-size type (not including the fingerprint).
+
+    @return a numpy.dtype, or None if the type is not fixed-size.
+    """
+    fmt = get_fixed_layout_format(lcmtype)
+    if fmt is None:
+        return None
+    fields = []
+    for count, code in re.findall(r"(\d*)(\D)", fmt[1:]):
+        if code not in _STRUCT_TO_NUMPY:
+            return None
+        count = int(count or 1)
+        name = "f%d" % len(fields)
+        if count == 1:
+            fields.append((name, _STRUCT_TO_NUMPY[code]))
+        else:
+            fields.append((name, _STRUCT_TO_NUMPY[code], (count,)))
+    dtype = numpy.dtype(fields)
+    if dtype.itemsize != struct.calcsize(fmt):
+        return None
+    return dtype
+
+def unpack_rows(data, dtype):
+    """Decode a buffer of back-to-back encoded messages (without
+    fingerprints) into a matrix of flattened rows.
+
+    @param data a string or buffer whose length is a multiple of
+    dtype.itemsize
+    @param dtype a dtype created by make_structured_dtype()
+
+    @return a float64 numpy array with one row per message.
+    """
+    records = numpy.frombuffer(data, dtype)
+    nrows = len(records)
+    columns = [ records[name].reshape(nrows, -1).astype(numpy.float64) \
+            for name in dtype.names ]
+    return numpy.hstack(columns)
@@ -0,0 +1,139 @@
+"""Checkpoints for converting a log that is still being written.
+
+A Checkpoint records how far log_to_mat got through a log: the offset of
+the first event it didn't convert, the timestamp that the output timestamps
+are relative to, and for each channel the number of rows it wrote.  A later run resumes from the offset and appends
+to the outputs, after cutting them back to what the checkpoint recorded in
+case the previous run was stopped between writing rows and saving the
+checkpoint.
+
+The checkpoint also records a CRC of the start of the log, so that it isn't
+used with a different log of the same name.  Checkpoint files are JSON.
+"""
+import binascii
+import json
+import os
+import sys
+import tempfile
+
+CHECKPOINT_VERSION = 3
+
+_INTEGER_TYPES = (int, long)
+
+# bytes at the start of the log covered by the CRC
+_LOG_HEAD_SIZE = 1 << 16
+
+def get_default_checkpoint_fname(out_fname):
+    return out_fname + ".ckpt"
+
+def _log_head_crc(log_fname, size):
+    f = open(log_fname, "rb")
+    try:
+        return binascii.crc32(f.read(size)) & 0xffffffff
+    finally:
+        f.close()
+
+class Checkpoint(object):
+    def __init__(self, offset=0, start_time=None):
+        # offset of the first event that hasn't been converted
+        self.offset = offset
+        # log timestamp that output timestamps are relative to, or None if
+        # no messages were converted yet
+        self.start_time = start_time
+        # number of rows written, for each channel
+        self.row_counts = {}
+        # -f formats of the channels
+        self.channel_formats = {}
+        # channels ignored for not being of a known type
+        self.unknown_channels = []
+        # messages seen on each channel with --decimate
+        self.decimation_counts = {}
+        # sizes of the per-channel output files, for outputs without row
+        # counts of their own
+        self.output_sizes = {}
+
+    def count_row(self, channel):
+        """Count a row written to the output of a channel."""
+        self.row_counts[channel] = self.row_counts.get(channel, 0) + 1
+
+def _utf8(text):
+    if not isinstance(text, basestring):
+        raise TypeError("invalid string")
+    return text.encode("utf-8")
+
+def _check_integer(value):
+    if not isinstance(value, _INTEGER_TYPES):
+        raise TypeError("invalid integer")
+    return value
+
+def _check_optional_integer(value):
+    if value is not None and not isinstance(value, _INTEGER_TYPES):
+        raise TypeError("invalid integer")
+    return value
+
+def _parse_channel_dict(values, parse_value):
+    """Returns a dict read from JSON, with the channels as keys, and values
+    checked and converted by parse_value."""
+    if not isinstance(values, dict):
+        raise TypeError("invalid channel dictionary")
+    return dict([ (_utf8(channel), parse_value(value)) \
+            for channel, value in values.items() ])
+
+def _parse_checkpoint(contents):
+    """Returns the checkpoint in the contents of a checkpoint file.  Raises
+    ValueError, TypeError or KeyError if they are malformed."""
+    checkpoint = Checkpoint(_check_integer(contents["offset"]),
+            _check_optional_integer(contents["start_time"]))
+    for name in [ "row_counts", "decimation_counts", "output_sizes" ]:
+        setattr(checkpoint, name, _parse_channel_dict(contents[name],
+            _check_integer))
+    checkpoint.channel_formats = _parse_channel_dict(
+            contents["channel_formats"], _utf8)
+    if not isinstance(contents["unknown_channels"], list):
+        raise TypeError("invalid unknown channels")
+    checkpoint.unknown_channels = [ _utf8(channel) \
+            for channel in contents["unknown_channels"] ]
+    return checkpoint
+
+def load_checkpoint(fname, log_fname):
+    """Load a checkpoint file.  Returns None if the file doesn't exist,
+    can't be read or is malformed, or if it doesn't belong to the log."""
+    try:
+        f = open(fname, "rb")
+        try:
+            contents = json.load(f)
+        finally:
+            f.close()
+        if contents.get("version") != CHECKPOINT_VERSION:
+            return None
+        checkpoint = _parse_checkpoint(contents)
+        log_head_crc = _check_integer(contents["log_head_crc"])
+    except Exception:
+        return None
+    log_size = os.path.getsize(log_fname)
+    head_size = min(checkpoint.offset, _LOG_HEAD_SIZE)
+    if log_size < checkpoint.offset or \
+            _log_head_crc(log_fname, head_size) != log_head_crc:
+        sys.stderr.write("checkpoint %s is not for log %s, ignoring it\n" % \
+                (fname, log_fname))
+        return None
+    return checkpoint
+
+def save_checkpoint(checkpoint, fname, log_fname):
+    """Save a checkpoint file, replacing the previous one atomically."""
+    contents = { "version" : CHECKPOINT_VERSION,
+            "log_head_crc" : _log_head_crc(log_fname,
+                min(checkpoint.offset, _LOG_HEAD_SIZE)) }
+    for name in [ "offset", "start_time", "row_counts", "channel_formats",
+            "unknown_channels", "decimation_counts", "output_sizes" ]:
+        contents[name] = getattr(checkpoint, name)
+    text = json.dumps(contents)
+    fd, tmp_fname = tempfile.mkstemp(
+            dir=os.path.dirname(os.path.abspath(fname)))
+    f = os.fdopen(fd, "wb")
+    try:
+        f.write(text)
+    finally:
+        f.close()
+    os.chmod(tmp_fname, 0644)
+    os.rename(tmp_fname, fname)
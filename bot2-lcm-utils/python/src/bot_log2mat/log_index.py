@@ -0,0 +1,161 @@
+"""Sidecar index files for LCM logs.
+
+A LogIndex records the byte offset and timestamp of one event in about
+every interval bytes of a log, and the number of events on each channel.
+It is built by reading through the log once, and saved next to the log so
+that later conversions can seek straight to a time range.  An index is
+rebuilt if the size or modification time of its log changed, or if it
+can't be read.  Index files are JSON.
+"""
+import array
+import bisect
+import json
+import os
+import sys
+import tempfile
+
+LOG_INDEX_VERSION = 2
+
+DEFAULT_INDEX_INTERVAL = 1 << 20
+
+def get_default_index_fname(log_fname):
+    return log_fname + ".idx"
+
+class LogIndex(object):
+    def __init__(self, log_size, log_mtime, offsets, timestamps,
+            channel_counts):
+        self.log_size = log_size
+        self.log_mtime = log_mtime
+        # offsets and timestamps of the indexed events
+        self.offsets = offsets
+        self.timestamps = timestamps
+        # number of events on each channel
+        self.channel_counts = channel_counts
+
+    def get_first_timestamp(self):
+        """Returns the timestamp of the first event, or None if the log is
+        empty."""
+        if not self.timestamps:
+            return None
+        return self.timestamps[0]
+
+    def find_offset(self, timestamp):
+        """Returns the offset of an event at or before the first event with
+        a timestamp greater than or equal to timestamp, assuming that the
+        timestamps in the log increase."""
+        i = bisect.bisect_left(self.timestamps, timestamp)
+        if i == 0:
+            return 0
+        return self.offsets[i - 1]
+
+    def find_end_offset(self, timestamp):
+        """Returns an offset after the last event with a timestamp less than
+        or equal to timestamp, or None if that is the end of the log."""
+        i = bisect.bisect_right(self.timestamps, timestamp)
+        if i == len(self.offsets):
+            return None
+        return self.offsets[i]
+
+def build_log_index(log, log_fname, interval=DEFAULT_INDEX_INTERVAL):
+    """Build an index by reading through a log.
+
+    @param log a log opened for reading, e.g., an lcm.EventLog.  It is left
+    at the end of the log.
+    @param log_fname the file name of the log
+    @param interval index one event in about this many bytes
+    """
+    st = os.stat(log_fname)
+    offsets = array.array("l")
+    timestamps = array.array("l")
+    channel_counts = {}
+    log.seek(0)
+    next_indexed = 0
+    while True:
+        pos = log.tell()
+        e = log.read_next_event()
+        if e is None:
+            break
+        if pos >= next_indexed:
+            offsets.append(pos)
+            timestamps.append(e.timestamp)
+            next_indexed = pos + interval
+        channel_counts[e.channel] = channel_counts.get(e.channel, 0) + 1
+    return LogIndex(st.st_size, st.st_mtime, offsets, timestamps,
+            channel_counts)
+
+def _parse_log_index(contents):
+    """Returns the LogIndex in the contents of an index file.  Raises
+    ValueError, TypeError or KeyError if they are malformed."""
+    log_size = contents["log_size"]
+    log_mtime = contents["log_mtime"]
+    if not isinstance(log_size, (int, long)) or \
+            not isinstance(log_mtime, (int, long, float)):
+        raise TypeError("invalid log size or modification time")
+    offsets = array.array("l", contents["offsets"])
+    timestamps = array.array("l", contents["timestamps"])
+    if len(offsets) != len(timestamps):
+        raise ValueError("different numbers of offsets and timestamps")
+    channel_counts = {}
+    for channel, count in contents["channel_counts"].items():
+        if not isinstance(count, (int, long)):
+            raise TypeError("invalid event count")
+        channel_counts[channel.encode("utf-8")] = count
+    return LogIndex(log_size, log_mtime, offsets, timestamps, channel_counts)
+
+def load_log_index(index_fname, log_fname):
+    """Load an index file.  Returns None if the file doesn't exist, can't
+    be read, is malformed, or is out of date."""
+    try:
+        f = open(index_fname, "rb")
+        try:
+            contents = json.load(f)
+        finally:
+            f.close()
+        if contents.get("version") != LOG_INDEX_VERSION:
+            return None
+        index = _parse_log_index(contents)
+    except Exception:
+        return None
+    st = os.stat(log_fname)
+    if index.log_size != st.st_size or index.log_mtime != st.st_mtime:
+        return None
+    return index
+
+def save_log_index(index, index_fname):
+    """Save an index file.  Failures are reported on stderr, since the
+    index can always be rebuilt."""
+    try:
+        text = json.dumps({ "version" : LOG_INDEX_VERSION,
+            "log_size" : index.log_size,
+            "log_mtime" : index.log_mtime,
+            "offsets" : index.offsets.tolist(),
+            "timestamps" : index.timestamps.tolist(),
+            "channel_counts" : index.channel_counts })
+        fd, tmp_fname = tempfile.mkstemp(
+                dir=os.path.dirname(os.path.abspath(index_fname)))
+        f = os.fdopen(fd, "wb")
+        try:
+            f.write(text)
+        finally:
+            f.close()
+        os.chmod(tmp_fname, 0644)
+        os.rename(tmp_fname, index_fname)
+    except (IOError, OSError, UnicodeError), err:
+        sys.stderr.write("couldn't write log index %s: %s\n" % \
+                (index_fname, err))
+
+def get_log_index(log, log_fname, index_fname=None):
+    """Load the index of a log, building and saving it if needed.
+
+    @param log the log opened for reading, used to build the index
+    @param log_fname the file name of the log
+    @param index_fname the index file name.  Defaults to the log file name
+    with ".idx" appended.
+    """
+    if index_fname is None:
+        index_fname = get_default_index_fname(log_fname)
+    index = load_log_index(index_fname, log_fname)
+    if index is None:
+        index = build_log_index(log, log_fname)
+        save_log_index(index, index_fname)
+    return index
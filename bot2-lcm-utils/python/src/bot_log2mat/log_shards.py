@@ -0,0 +1,82 @@
+"""Splitting LCM log files into shards for parallel processing.
+
+A log can be split into byte ranges at arbitrary offsets; each range then
+starts at the first event whose header begins inside it.  Event headers are
+found by scanning for the LCM log sync word, and checking that the header
+describes an event that ends either at the end of the file or at the start
+of another event.  Message data can contain something that looks like an
+event header, so callers that need to be exact should check that a range
+starts where the previous range's last event ends.
+"""
+import os
+import struct
+
+LOG_SYNC_WORD = 0xEDA1DA01
+_SYNC_BYTES = struct.pack(">I", LOG_SYNC_WORD)
+
+# sync word, event number, timestamp, channel length, data length
+_EVENT_HEADER = struct.Struct(">IqqII")
+EVENT_HEADER_SIZE = _EVENT_HEADER.size
+
+# liblcm refuses to log longer channel names
+MAX_CHANNEL_LENGTH = 256
+
+_SCAN_BLOCK_SIZE = 1 << 16
+
+def _is_event_start(f, pos, file_size):
+    f.seek(pos)
+    header = f.read(EVENT_HEADER_SIZE)
+    if len(header) != EVENT_HEADER_SIZE:
+        return False
+    sync, eventnum, timestamp, channellen, datalen = _EVENT_HEADER.unpack(header)
+    if sync != LOG_SYNC_WORD or channellen > MAX_CHANNEL_LENGTH:
+        return False
+    next_pos = pos + EVENT_HEADER_SIZE + channellen + datalen
+    if next_pos == file_size:
+        return True
+    if next_pos > file_size:
+        return False
+    f.seek(next_pos)
+    return f.read(len(_SYNC_BYTES)) == _SYNC_BYTES
+
+def find_event_start(fname, start, end):
+    """Find the first event in a log file that starts in a byte range.
+
+    @param fname the log file name
+    @param start the start of the byte range
+    @param end the end (exclusive) of the byte range
+
+    @return the offset of the event, or None if no event starts in the
+    range.
+    """
+    file_size = os.path.getsize(fname)
+    end = min(end, file_size)
+    f = open(fname, "rb")
+    try:
+        pos = start
+        while pos < end:
+            f.seek(pos)
+            block = f.read(min(_SCAN_BLOCK_SIZE, end - pos) + \
+                    len(_SYNC_BYTES) - 1)
+            candidate = block.find(_SYNC_BYTES)
+            while candidate >= 0 and pos + candidate < end:
+                if _is_event_start(f, pos + candidate, file_size):
+                    return pos + candidate
+                candidate = block.find(_SYNC_BYTES, candidate + 1)
+            pos += _SCAN_BLOCK_SIZE
+        return None
+    finally:
+        f.close()
+
+def split_byte_ranges(fname, num_shards, start=0, end=None):
+    """Split a log file, or the part of it between the start and end
+    offsets, into num_shards byte ranges of roughly equal size.
+
+    @return a list of (start, end) tuples covering the file or part.
+    """
+    if end is None:
+        end = os.path.getsize(fname)
+    size = end - start
+    num_shards = max(1, min(num_shards, size))
+    bounds = [ start + size * i // num_shards for i in range(num_shards + 1) ]
+    return zip(bounds[:-1], bounds[1:])
@@ -12,6 +12,12 @@ import types
 import numpy
 import re
 import getopt
+import array
+import heapq
+import itertools
+import multiprocessing
+import time
+import signal
 
 # check which version for mio location
 if sys.version_info < (2, 6):
@@ -21,6 +27,22 @@ else:
 
 from lcm import EventLog
 from scan_for_lcmtypes import *
+from stream_writer import MatV73Writer, DEFAULT_CHUNK_ROWS
+from parquet_writer import ParquetWriter
+from text_writer import TextWriter
+from conversion_stats import ConversionStats
+from channel_filter import match_channel, decide_channel, CHANNEL_ACCEPT, \
+        CHANNEL_REJECT, CHANNEL_UNKNOWN_TYPE
+from lcmtype_flatten import make_flattener
+from lcmtype_layout import make_struct_flattener, make_structured_dtype, unpack_rows
+from log_shards import find_event_start, split_byte_ranges
+from log_index import get_log_index, get_default_index_fname
+from log_checkpoint import Checkpoint, load_checkpoint, save_checkpoint, \
+        get_default_checkpoint_fname
+try:
+    from mmap_log import MmapEventLog
+except ImportError:
+    MmapEventLog = None
 
 def usage():
     pname, sname = os.path.split(sys.argv[0])
@@ -31,78 +53,211 @@ def usage():
     -f --format               print the data format to stderr
     -s --seperator=sep        print data with separator [sep] instead of default to ["" ""]
     -c --channelsToProcess=chan        Parse channelsToProcess that match Python regex [chan] defaults to [".*"]
+                              Can be given more than once to parse channels that match any of them
     -i --ignore=chan          Ignore channelsToProcess that match Python regex [chan]
-                              ignores take precedence over includes!
+                              ignores take precedence over includes!  Can be given more than once
     -o --outfile=ofname       output data to [ofname] instead of default [filename.mat or stdout]
-    -l --lcmtype_pkgs=pkgs    load python modules from comma seperated list of packages [pkgs] defaults to ["botlcm"]
+    -l --lcm_packages=pkgs    load python modules from comma seperated list of packages [pkgs] defaults to
+                              all packages on the python path
+    -S --stream               Write a MAT v7.3 (HDF5) file incrementally instead of loading the
+                              whole log into memory.  Requires h5py
+       --parquet=dir          Write each channel to a Parquet file in [dir], with a column per
+                              field, instead of to .mat.  Requires pyarrow.  Ignored with --print,
+                              and disables --jobs and --vectorize
+       --ragged               Save channels whose messages vary in length as a struct with the
+                              values of all messages in one column (ragged_values) and the
+                              length of each message (ragged_lengths), instead of padding them
+                              with zeros.  The generated .m file converts these to cell arrays.
+                              Ignored with --stream
+       --float_format=fmt     With --print, format every value with the %% format [fmt] (e.g.
+                              %%.9g) instead of str()
+       --csv_dir=dir          Print each channel to its own file in [dir], named after the
+                              channel with a .csv extension, without the channel name on each
+                              line.  Implies --print.  The separator defaults to ","
+       --chunk_size=rows      With --stream, number of messages buffered per channel before
+                              writing them out.  With --parquet, the row group size [default %d]
+    -V --vectorize            Decode fixed-size types (e.g. bot_core.pose_t) a whole channel at a
+                              time, by reading the log twice.  Ignored with --print or --jobs
+    -j --jobs=N               Convert the log using N worker processes.  The output is the same as
+                              without --jobs
+       --shard=mode           With --jobs, split the work by [range] of bytes in the log, or by
+                              [channel] [default range]
+       --start=sec            Only convert events at least [sec] seconds after the first event
+       --end=sec              Only convert events at most [sec] seconds after the first event
+       --decimate=[chan:]N    Only convert every [N]th message on channels that match Python
+                              regex [chan] (all channels if [chan] is omitted).  Can be given
+                              more than once; the first match applies.  With --jobs, implies
+                              --shard=channel
+       --stats                Show the message and byte rates and the time left while converting,
+                              and print the messages, bytes, decode and flatten times and output
+                              size of each channel, and the time of each phase, at the end
+       --stats_json=fname     Also save the --stats numbers to [fname] as JSON.  Implies --stats
+       --incremental          Save a checkpoint next to the output, and if there is one from an
+                              earlier run, append only the events logged since then.  Requires
+                              --stream or --csv_dir, and disables --jobs and --vectorize
+       --follow               Like --incremental, but keep waiting for new events at the end of
+                              the log, writing them out and saving the checkpoint about every
+                              %g s, until interrupted
+       --checkpoint=fname     The --incremental checkpoint file [default output name + .ckpt]
+       --index=file           Index file used to seek to --start [default filename.idx].  It is
+                              built the first time it is needed
+       --lcmtypes-cache=file  Cache the results of scanning for LCM types in [file], so that only
+                              changed python files are scanned again.  An empty [file] disables
+                              the cache [default %s]
     -v                        Verbose
 
-    """
+    """ % (DEFAULT_CHUNK_ROWS, FOLLOW_INTERVAL, get_default_lcmtypes_cache())
     sys.exit()
 
-flatteners = {}
+# seconds between checks for new events, and between checkpoints, with
+# --follow
+FOLLOW_INTERVAL = 1.0
+
+def open_log(fname):
+    """Open a log for reading, through mmap if possible."""
+    if MmapEventLog is not None:
+        try:
+            return MmapEventLog(fname)
+        except (EnvironmentError, ValueError):
+            pass
+    return EventLog(fname, "r")
+
 data = {}
 
-def make_simple_accessor(fieldname):
-    return lambda lst, x: lst.append(getattr(x, fieldname))
+class ConversionOptions(object):
+    """The options that decide which messages are converted and how.  They
+    are handed to the worker processes of --jobs explicitly, rather than
+    through the globals they inherit when they are forked."""
+    def __init__(self, fname, type_db, channelsToProcess, channelsToIgnore,
+            decimations, startUtime, endUtime, printOutput, printFormat,
+            separator, floatFormat, verbose, withStats):
+        self.fname = fname
+        self.type_db = type_db
+        self.channelsToProcess = channelsToProcess
+        self.channelsToIgnore = channelsToIgnore
+        # (regex, factor) pairs of --decimate
+        self.decimations = decimations
+        # log timestamps of --start and --end, or None
+        self.startUtime = startUtime
+        self.endUtime = endUtime
+        self.printOutput = printOutput
+        self.printFormat = printFormat
+        self.separator = separator
+        self.floatFormat = floatFormat
+        self.verbose = verbose
+        self.withStats = withStats
+        # the shard of each channel with --jobs --shard=channel, for the
+        # channels that aren't assigned by get_channel_shard()'s hash
+        self.channelShards = {}
 
-def make_numpy_array_accessor(fieldname):
-    return lambda lst, x: lst.extend(numpy.array(getattr(x, fieldname)).ravel())
+class ChannelState(object):
+    """What a conversion has found out about each channel so far."""
+    def __init__(self, showFormats=True):
+        # CHANNEL_ACCEPT, CHANNEL_REJECT or CHANNEL_UNKNOWN_TYPE
+        self.decisions = {}
+        # --decimate factor, and messages seen with it
+        self.decimations = {}
+        self.decimationCounts = {}
+        self.flatteners = {}
+        self.structFlatteners = {}
+        # -f formats
+        self.formats = {}
+        # whether to write the -f formats to stderr as they are found
+        self.showFormats = showFormats
 
-def make_obj_accessor(fieldname, func):
-    return lambda lst, x: func(lst, getattr(x, fieldname))
+# field names of channels saved with --ragged
+RAGGED_VALUES = "ragged_values"
+RAGGED_LENGTHS = "ragged_lengths"
 
-def make_obj_list_accessor(fieldname, func):
-    return lambda lst, x: map(lambda item: func(lst, item), getattr(x, fieldname))
-#    def list_accessor(lst, msg):
-#        msg_lst = getattr(msg, fieldname)
-#        for elem in msg_lst:
-#            func(lst, elem)
-#    return list_accessor
-#    
+def make_ragged(values, lengths):
+    """Store the messages on a channel as one column of the values of all
+    messages, and a column of message lengths."""
+    return { RAGGED_VALUES : numpy.asarray(values, numpy.float64).reshape(-1, 1),
+             RAGGED_LENGTHS : numpy.array(lengths, numpy.float64).reshape(-1, 1) }
 
+class VectorizedChannel(object):
+    """A channel of a fixed-size type that is decoded in a second pass over
+    the log."""
+    def __init__(self, dtype, fingerprint):
+        self.dtype = dtype
+        # fingerprint of the channel's type
+        self.fingerprint = fingerprint
+        # file offsets of the channel's events
+        self.offsets = array.array("l")
 
-def make_lcmtype_accessor(msg):
-    funcs = []
+    def accepts(self, e):
+        """Returns whether the event holds exactly one encoded message of the
+        channel's type, so that it can be decoded in the second pass."""
+        return len(e.data) == 8 + self.dtype.itemsize and \
+                e.data[:8] == self.fingerprint
 
-    for fieldname in getattr(msg, '__slots__'):
-        m = getattr(msg, fieldname)
+def make_vectorized_channel(lcmtype, struct_flattener):
+    if struct_flattener is None:
+        return None
+    dtype = make_structured_dtype(lcmtype)
+    if dtype is None:
+        return None
+    return VectorizedChannel(dtype, lcmtype._get_packed_fingerprint())
 
-        if type(m) in [ types.IntType, types.LongType, types.FloatType,
-                types.BooleanType ]:
-            # scalar
-            accessor = make_simple_accessor(fieldname)
-            funcs.append(accessor)
-        elif type(m) in [ types.ListType, types.TupleType ]:
-            # convert to a numpy array
-            arr = numpy.array(m)
+def read_vectorized_rows(log, vchan, startTime, chunk_rows):
+    """Second pass for a vectorized channel.  Gathers the payloads of the
+    channel's events into one buffer and decodes them all at once, yielding
+    blocks of at most chunk_rows flattened rows (with log timestamps)."""
+    itemsize = vchan.dtype.itemsize
+    for start in xrange(0, len(vchan.offsets), chunk_rows):
+        offsets = vchan.offsets[start:start + chunk_rows]
+        payloads = []
+        timestamps = numpy.empty(len(offsets), numpy.int64)
+        for i, offset in enumerate(offsets):
+            log.seek(offset)
+            e = log.read_next_event()
+            payloads.append(e.data[8:8 + itemsize])
+            timestamps[i] = e.timestamp
+        rows = unpack_rows("".join(payloads), vchan.dtype)
+        times = (timestamps - startTime) / 1e6
+        yield numpy.hstack((rows, times.reshape(-1, 1)))
 
-            # check the data type of the array
-            if arr.dtype.kind in "bif":
-                # numeric data type
-                funcs.append(make_numpy_array_accessor(fieldname))
-            elif arr.dtype.kind == "O":
-                # compound data type
-                typeAccess = make_lcmtype_accessor(m[0])
-                funcs.append(make_obj_list_accessor(fieldname, typeAccess))
-                #pass
-        elif type(m) in types.StringTypes:
-            # ignore strings
-            pass
+def unvectorize_channel(log, chan, vchan, startTime):
+    """Flatten the events gathered so far of a vectorized channel that got a
+    message that can't be vectorized, so that the rest of the channel can be
+    flattened one message at a time.  Leaves the log where it was."""
+    pos = log.tell()
+    for rows in read_vectorized_rows(log, vchan, startTime, chunkSize):
+        if streamOutput:
+            streamWriter.append_rows(chan, rows)
+            if stats is not None:
+                stats.add_output(chan, rows.nbytes)
         else:
-            funcs.append(make_obj_accessor(fieldname, make_lcmtype_accessor(m)))
-
-    def flatten(lst, m):
-        for func in funcs:
-            func(lst, m)
-    return flatten
-
-def make_flattener(msg):
-    accessor = make_lcmtype_accessor(msg)
-    def flattener(m):
-        result = []
-        accessor(result, m)
-        return result
+            data.setdefault(chan, []).extend(rows.tolist())
+    log.seek(pos)
+
+def same_values(a, b, check_types):
+    if len(a) != len(b):
+        return False
+    for x, y in zip(a, b):
+        if check_types and type(x) != type(y):
+            return False
+        if x != y and not (x != x and y != y):
+            return False
+    return True
+
+def make_checked_struct_flattener(lcmtype, encoded, expected, check_types):
+    """Compile a struct flattener for a fixed-size lcmtype, and check that it
+    reproduces the closure flattener's output for one message.  Returns None
+    if the type is not fixed-size or the outputs differ.
+
+    The closure flattener produces numpy scalars for array fields.  If
+    check_types is True, then the struct flattener is only used if it
+    produces values of exactly the same types, e.g., because the values are
+    printed as text."""
+    flattener = make_struct_flattener(lcmtype)
+    if flattener is None:
+        return None
+    try:
+        if not same_values(flattener(encoded), expected, check_types):
+            return None
+    except ValueError:
+        return None
     return flattener
 
 
@@ -166,10 +321,454 @@ def deleteStatusMsg(statMsg):
         sys.stderr.write("\r")
     return ""
 
-longOpts = ["help", "print", "format", "separator", "channelsToProcess", "ignore", "outfile", "lcm_packages"]
+def keep_decimated(channel, state, options):
+    """Count a message on a channel, and check whether it is kept by the
+    --decimate options."""
+    n = state.decimations.get(channel)
+    if n is None:
+        n = 1
+        for regex, factor in options.decimations:
+            if match_channel(regex, channel):
+                n = factor
+                break
+        state.decimations[channel] = n
+    if n == 1:
+        return True
+    count = state.decimationCounts.get(channel, 0)
+    state.decimationCounts[channel] = count + 1
+    return count % n == 0
+
+def get_event_type(e, state, options):
+    """Look up the lcmtype of an event.  Returns None if the event's channel
+    is ignored, or if the event is not of a known type, in which case the rest
+    of its channel is ignored as well."""
+    global statusMsg
+    decision = state.decisions.get(e.channel)
+    if decision is None:
+        decision = decide_channel(e.channel, options.channelsToProcess,
+                options.channelsToIgnore)
+        state.decisions[e.channel] = decision
+        if decision == CHANNEL_REJECT and options.verbose:
+            statusMsg = deleteStatusMsg(statusMsg)
+            sys.stderr.write("ignoring channel %s\n" % e.channel)
+    if decision != CHANNEL_ACCEPT:
+        return None
+
+    packed_fingerprint = e.data[:8]
+    lcmtype = options.type_db.get(packed_fingerprint, None)
+    if not lcmtype:
+        if options.verbose:
+            statusMsg = deleteStatusMsg(statusMsg)
+            sys.stderr.write("ignoring channel %s -not a known LCM type\n" % e.channel)
+        state.decisions[e.channel] = CHANNEL_UNKNOWN_TYPE
+        return None
+    return lcmtype
+
+def get_ignored_channels(state):
+    """Returns the channels that get_event_type() ignored so far."""
+    return [ channel for channel, decision in state.decisions.items() \
+            if decision != CHANNEL_ACCEPT ]
+
+def flatten_event(e, lcmtype, state, options, stats):
+    """Flatten the message of an event, not including the log timestamp.
+    Returns None if the message couldn't be decoded.
+
+    @param stats the ConversionStats to add the decoding time to, or None
+    """
+    global statusMsg
+    # fixed-size types are flattened straight from the encoded data
+    structFlattener = state.structFlatteners.get(e.channel)
+    if structFlattener is not None:
+        try:
+            return structFlattener(e.data)
+        except ValueError:
+            pass
+
+    if stats is not None:
+        decodeStart = time.time()
+    try:
+        msg = lcmtype.decode(e.data)
+    except:
+        statusMsg = deleteStatusMsg(statusMsg)
+        sys.stderr.write("error: couldn't decode msg on channel %s\n" % e.channel)
+        return None
+    if stats is not None:
+        stats.add_decode(e.channel, time.time() - decodeStart)
+
+    if e.channel in state.flatteners:
+        flattener = state.flatteners[e.channel]
+    else:
+        flattener = make_flattener(msg)
+        state.flatteners[e.channel] = flattener
+        if options.printFormat:
+            typeStr, fieldCount = make_lcmtype_string(msg)
+            typeStr.append("%d- log_timestamp" % (fieldCount + 1))
+            
+            typeStr = "\n#%s  %s :\n#[\n#%s\n#]\n" % (e.channel, lcmtype, "\n#".join(typeStr))
+            state.formats[e.channel] = typeStr
+            if state.showFormats:
+                statusMsg = deleteStatusMsg(statusMsg)
+                sys.stderr.write(typeStr)
+        state.structFlatteners[e.channel] = make_checked_struct_flattener(
+                lcmtype, e.data, flattener(msg), options.printOutput)
+
+    a = flattener(msg)
+    #in case the initial flattener didn't work for whatever reason :-/
+    # convert to a numpy array
+    arr = numpy.array(a)
+    # check the data type of the array
+    if not(arr.dtype.kind in "bif"):
+        statusMsg = deleteStatusMsg(statusMsg)
+        sys.stderr.write("WARNING: needed to create new flattener for channel %s\n" % (e.channel))
+        flattener = make_flattener(msg)
+        state.flatteners[e.channel] = flattener
+        a = flattener(msg)
+    return a
+
+class ShardChannel(object):
+    """The flattened messages on one channel in a shard of the log, as
+    returned by a worker process."""
+    def __init__(self, format):
+        self.format = format
+        # file offsets and log timestamps of the messages
+        self.offsets = array.array("l")
+        self.timestamps = array.array("l")
+        # with --print, the fields of each message as text.  Otherwise the
+        # flattened messages, which pack_rows() converts to a zero padded
+        # matrix that is much cheaper to send back from a worker.
+        self.rows = []
+        self.lengths = None
+
+    def pack_rows(self):
+        self.lengths = array.array("l", map(len, self.rows))
+        block = numpy.zeros((len(self.rows), max(self.lengths)))
+        for i, row in enumerate(self.rows):
+            block[i, :len(row)] = row
+        self.rows = block
+
+    def get_rows(self, startTime):
+        """Returns the padded matrix of flattened messages, with the log
+        timestamp following the fields of each message."""
+        n = len(self.lengths)
+        block = numpy.zeros((n, self.rows.shape[1] + 1))
+        block[:, :-1] = self.rows
+        times = (numpy.array(self.timestamps, numpy.int64) - startTime) / 1e6
+        block[numpy.arange(n), numpy.array(self.lengths, numpy.intp)] = times
+        return block
+
+def get_channel_shard(channel, numShards, channelShards):
+    shard = channelShards.get(channel)
+    if shard is not None:
+        return shard
+    return (binascii.crc32(channel) & 0xffffffff) % numShards
+
+def balance_channel_shards(channelCounts, numShards):
+    """Assign channels to shards so that the shards have about the same
+    number of events, biggest channels first.  Returns the shard of each
+    channel."""
+    channelShards = {}
+    totals = [ 0 ] * numShards
+    for count, channel in sorted([ (count, channel) \
+            for channel, count in channelCounts.items() ], reverse=True):
+        shard = totals.index(min(totals))
+        channelShards[channel] = shard
+        totals[shard] += count
+    return channelShards
+
+# the ConversionOptions of a worker process, and the TextWriter that formats
+# its rows with --print
+workerOptions = None
+workerFormatter = None
+
+def init_worker(options):
+    """Set up a worker process of the --jobs pool."""
+    global workerOptions, workerFormatter
+    workerOptions = options
+    workerFormatter = TextWriter(None, options.separator, options.floatFormat)
+
+def convert_shard(shard):
+    """Convert the events that start in a byte range of the log.  Runs in a
+    worker process set up by init_worker().
+
+    @param shard a (start, end, exactStart, channelShard, numChannelShards)
+    tuple.  If exactStart is True, an event starts at the start offset,
+    otherwise the first event in the range is searched for.  If channelShard
+    is not None, only the channels for which get_channel_shard() returns
+    channelShard are converted.
+
+    @return a dictionary of ShardChannels, the list of channels that were
+    ignored in the shard, the offset of the first event in the shard (None
+    if there are no events in the range), the offset at which the shard
+    ended, and the ConversionStats of the shard (None without --stats).
+    """
+    options = workerOptions
+    start, end, exactStart, channelShard, numChannelShards = shard
+
+    # each shard starts from scratch, like a serial conversion of the log
+    state = ChannelState(showFormats=False)
+    shardStats = None
+    if options.withStats:
+        shardStats = ConversionStats()
+
+    channels = {}
+    if exactStart:
+        pos = start
+    else:
+        pos = find_event_start(options.fname, start, end)
+    firstPos = pos
+    if pos is not None:
+        shardLog = open_log(options.fname)
+        shardLog.seek(pos)
+        while pos < end:
+            e = shardLog.read_next_event()
+            if e is None:
+                break
+            eventPos = pos
+            pos = shardLog.tell()
+
+            if options.startUtime is not None and \
+                    e.timestamp < options.startUtime:
+                continue
+            if options.endUtime is not None and \
+                    e.timestamp > options.endUtime:
+                pos = eventPos
+                break
+            if channelShard is not None and \
+                    get_channel_shard(e.channel, numChannelShards,
+                        options.channelShards) != channelShard:
+                continue
+            lcmtype = get_event_type(e, state, options)
+            if lcmtype is None:
+                if shardStats is not None:
+                    shardStats.add_ignored(e.channel, len(e.data))
+                continue
+            if options.decimations and \
+                    not keep_decimated(e.channel, state, options):
+                continue
+            if shardStats is not None:
+                convertStart = time.time()
+            a = flatten_event(e, lcmtype, state, options, shardStats)
+            if a is None:
+                continue
+            if shardStats is not None:
+                shardStats.add_message(e.channel, len(e.data),
+                        time.time() - convertStart)
+
+            chan = channels.get(e.channel)
+            if chan is None:
+                chan = ShardChannel(state.formats.get(e.channel))
+                channels[e.channel] = chan
+            chan.offsets.append(eventPos)
+            chan.timestamps.append(e.timestamp)
+            if options.printOutput:
+                chan.rows.append(workerFormatter.format_values(a))
+            else:
+                chan.rows.append(a)
+        shardLog.close()
+
+    if not options.printOutput:
+        for chan in channels.values():
+            chan.pack_rows()
+    return channels, get_ignored_channels(state), firstPos, pos, shardStats
+
+def write_shard_results(shards, startTime, formatsWritten, parts):
+    """Output the channels converted by a list of consecutive shards.
+    Returns the number of messages."""
+    msgCount = 0
+    merged = {}
+    for channels in shards:
+        for name, chan in channels.items():
+            merged.setdefault(name, []).append(chan)
+            msgCount += len(chan.offsets)
+            if chan.format is not None and name not in formatsWritten:
+                sys.stderr.write(chan.format)
+                formatsWritten.add(name)
+
+    if printOutput:
+        # interleave the channels in log order
+        rows = [ zip(chan.offsets, [ name ] * len(chan.offsets),
+                chan.timestamps, chan.rows) \
+                for name, chans in merged.items() for chan in chans ]
+        for offset, name, timestamp, fields in heapq.merge(*rows):
+            t = textWriter.format_value((timestamp - startTime) / 1e6)
+            if fields:
+                n = textWriter.write_formatted(name, fields + separator + t)
+            else:
+                n = textWriter.write_formatted(name, t)
+            if stats is not None:
+                stats.add_output(name, n)
+    else:
+        for name, chans in merged.items():
+            for chan in chans:
+                if streamOutput:
+                    rows = chan.get_rows(startTime)
+                    streamWriter.append_rows(name, rows)
+                    if stats is not None:
+                        stats.add_output(name, rows.nbytes)
+                else:
+                    parts.setdefault(name, []).append((chan.get_rows(startTime),
+                        chan.lengths))
+    return msgCount
+
+def convert_in_parallel(options, numJobs, shardMode):
+    """Convert the log with a pool of worker processes, merging their
+    results in log order.  Returns the number of messages."""
+    endPos = endOffset
+    if endPos is None:
+        endPos = log.size()
+    if shardMode == "channel":
+        if logIndex is not None:
+            options.channelShards = balance_channel_shards(
+                    logIndex.channel_counts, numJobs)
+        shards = [ (startOffset, endPos, True, i, numJobs) \
+                for i in range(numJobs) ]
+    else:
+        shards = [ (start, end, start == startOffset, None, None) \
+                for start, end in split_byte_ranges(fname, numJobs * 4,
+                    startOffset, endPos) ]
+
+    pool = multiprocessing.Pool(numJobs, init_worker, (options,))
+    ignored = set()
+    pending = []
+    startTime = None
+    formatsWritten = set()
+    parts = {}
+    msgCount = 0
+    nextPos = startOffset
+    results = pool.imap(convert_shard, shards)
+    statusMsg = ""
+    for i, (channels, shardIgnored, firstPos, endPos, shardStats) in enumerate(results):
+        if shardMode != "channel":
+            # make sure that the shard starts where the previous one ended,
+            # in case the worker resynchronized on something in the data
+            # of a message that looks like an event header
+            start, end = shards[i][:2]
+            if nextPos >= end:
+                channels, shardIgnored, endPos, shardStats = {}, [], nextPos, None
+            elif firstPos != nextPos:
+                channels, shardIgnored, firstPos, endPos, shardStats = \
+                        pool.apply(convert_shard, ((nextPos, end, True, None, None),))
+            nextPos = endPos
+
+        # a channel is ignored from the first message of an unknown type on
+        # it onwards
+        for name in channels.keys():
+            if name in ignored:
+                del channels[name]
+                if shardStats is not None:
+                    shardStats.ignore_channel(name)
+        ignored.update(shardIgnored)
+        if shardStats is not None:
+            stats.merge(shardStats)
+        pending.append(channels)
+
+        # byte range shards come back in log order, so the log timestamps
+        # are relative to the first message of the first non-empty shard.
+        # Channel shards all need to be in first.
+        if startTime is None and (shardMode != "channel" or i == len(shards) - 1):
+            firstMessages = [ (chan.offsets[0], chan.timestamps[0]) \
+                    for shardChannels in pending for chan in shardChannels.values() ]
+            if firstMessages:
+                startTime = min(firstMessages)[1]
+        if startTime is not None:
+            msgCount += write_shard_results(pending, startTime,
+                    formatsWritten, parts)
+            pending = []
+        if stats is not None and shardMode != "channel":
+            statusMsg = deleteStatusMsg(statusMsg)
+            statusMsg = stats.get_progress(msgCount, nextPos - startOffset)
+            sys.stderr.write(statusMsg)
+            sys.stderr.flush()
+    pool.close()
+    pool.join()
+    deleteStatusMsg(statusMsg)
+
+    if stats is not None:
+        stats.start_phase("pad")
+    #need to pad variable length messages with zeros...
+    for name, blocks in parts.items():
+        maxLen = max([ max(lengths) for block, lengths in blocks ]) + 1
+        minLen = min([ min(lengths) for block, lengths in blocks ]) + 1
+        if maxLen != minLen and raggedOutput:
+            # the log timestamp follows the fields of each message
+            values = []
+            allLengths = []
+            for block, lengths in blocks:
+                rowLengths = numpy.array(lengths) + 1
+                mask = numpy.arange(block.shape[1]) < rowLengths.reshape(-1, 1)
+                values.append(block[mask])
+                allLengths.append(rowLengths)
+            data[name] = make_ragged(numpy.concatenate(values),
+                    numpy.concatenate(allLengths))
+            continue
+        if maxLen != minLen:
+            sys.stderr.write("padding channel %s with zeros, messages ranged from %d to %d \n" % (name, minLen, maxLen))
+        matrix = numpy.zeros((sum([ len(block) for block, lengths in blocks ]), maxLen))
+        row = 0
+        for block, lengths in blocks:
+            matrix[row:row + len(block), :block.shape[1]] = block
+            row += len(block)
+        data[name] = matrix
+    return msgCount
+
+def write_checkpoint():
+    """Flush the output and save the --incremental checkpoint."""
+    if printOutput:
+        textWriter.flush()
+        checkpoint.output_sizes = textWriter.get_csv_sizes()
+    else:
+        streamWriter.flush()
+    if msgCount > 0 or startTimeFixed:
+        checkpoint.start_time = startTime
+    checkpoint.unknown_channels = [ channel for channel, decision in \
+            channelState.decisions.items() \
+            if decision == CHANNEL_UNKNOWN_TYPE ]
+    checkpoint.decimation_counts = dict(channelState.decimationCounts)
+    checkpoint.channel_formats = dict(channelState.formats)
+    save_checkpoint(checkpoint, checkpointFname, fname)
+
+def stop_following(signum, frame):
+    global stopFollowing
+    stopFollowing = True
+
+def follow_log():
+    """Iterate over the events in the log with --incremental.  With
+    --follow, keep waiting for more events at the end of the log until
+    interrupted, writing a checkpoint whenever the end is reached and about
+    every FOLLOW_INTERVAL seconds while catching up."""
+    global log
+    lastCheckpoint = time.time()
+    while True:
+        while True:
+            # the previous event has been written out when the next one is
+            # asked for, so resume from the start of the next one, which
+            # also holds if the caller stops before converting it
+            checkpoint.offset = log.tell()
+            if follow and time.time() - lastCheckpoint > FOLLOW_INTERVAL:
+                write_checkpoint()
+                lastCheckpoint = time.time()
+            e = log.read_next_event()
+            if e is None:
+                break
+            yield e
+        if not follow or stopFollowing:
+            return
+        write_checkpoint()
+        time.sleep(FOLLOW_INTERVAL)
+        lastCheckpoint = time.time()
+        # reopen the log to see what was added to it
+        log.close()
+        log = open_log(fname)
+        log.seek(checkpoint.offset)
+
+longOpts = ["help", "print", "format", "separator", "channelsToProcess", "ignore", "outfile", "lcm_packages=",
+            "stream", "chunk_size=", "vectorize", "jobs=", "shard=",
+            "lcmtypes-cache=", "start=", "end=", "decimate=", "index=",
+            "parquet=", "ragged", "float_format=", "csv_dir=", "stats",
+            "stats_json=", "incremental", "follow", "checkpoint="]
 
 try:
-    opts, args = getopt.gnu_getopt(sys.argv[1:], "hpvfs:c:i:o:l:", longOpts)
+    opts, args = getopt.gnu_getopt(sys.argv[1:], "hpvfs:c:i:o:l:SVj:", longOpts)
 except getopt.GetoptError, err:
     # print help information and exit:
     print str(err) # will print something like "option -a not recognized"
@@ -178,7 +777,7 @@ if len(args) != 1:
     usage()
 #default options
 fname = args[0]
-lcm_packages = [ "botlcm"]
+lcm_packages = None
 
 outDir, outFname = os.path.split(os.path.abspath(fname))
 outFname = outFname.replace(".", "_")
@@ -189,10 +788,29 @@ printFile = sys.stdout
 verbose = False
 printOutput = False
 printFormat = False
-channelsToIgnore = ""
-checkIgnore = False
-channelsToProcess = ".*"
+channelsToIgnore = []
+channelsToProcess = []
 separator = ' '
+streamOutput = False
+chunkSize = DEFAULT_CHUNK_ROWS
+vectorize = False
+numJobs = 1
+shardMode = "range"
+lcmtypesCache = get_default_lcmtypes_cache()
+startSeconds = None
+endSeconds = None
+decimations = []
+indexFname = get_default_index_fname(fname)
+parquetDir = None
+raggedOutput = False
+floatFormat = None
+csvDir = None
+separatorGiven = False
+stats = None
+statsJsonFname = None
+incremental = False
+follow = False
+checkpointFname = None
 for o, a in opts:
     if o == "-v":
         verbose = True
@@ -204,141 +822,366 @@ for o, a in opts:
         printFormat = True
     elif o in ("-s", "--separator="):
         separator = a
+        separatorGiven = True
     elif o in ("-o", "--outfile="):
         outFname = a
         printFname = a
     elif o in ("-c", "--channelsToProcess="):
-        channelsToProcess = a
+        channelsToProcess.append(a)
     elif o in ("-i", "--ignore="):
-        channelsToIgnore = a
-        checkIgnore = True
-    elif o in ("-l", "--lcm_packages="):
+        channelsToIgnore.append(a)
+    elif o in ("-l", "--lcm_packages"):
         lcm_packages = a.split(",")
+    elif o in ("-S", "--stream"):
+        streamOutput = True
+    elif o == "--chunk_size":
+        chunkSize = int(a)
+    elif o in ("-V", "--vectorize"):
+        vectorize = True
+    elif o in ("-j", "--jobs"):
+        numJobs = int(a)
+    elif o == "--shard":
+        if a not in ("range", "channel"):
+            usage()
+        shardMode = a
+    elif o == "--lcmtypes-cache":
+        lcmtypesCache = a
+    elif o == "--start":
+        startSeconds = float(a)
+    elif o == "--end":
+        endSeconds = float(a)
+    elif o == "--decimate":
+        if ":" in a:
+            chan, factor = a.rsplit(":", 1)
+        else:
+            chan, factor = ".*", a
+        if int(factor) < 1:
+            usage()
+        decimations.append((re.compile(chan), int(factor)))
+    elif o == "--index":
+        indexFname = a
+    elif o == "--parquet":
+        parquetDir = a
+    elif o == "--ragged":
+        raggedOutput = True
+    elif o == "--float_format":
+        try:
+            a % 0.0
+        except (TypeError, ValueError):
+            usage()
+        floatFormat = a
+    elif o == "--csv_dir":
+        csvDir = a
+        printOutput = True
+    elif o == "--stats":
+        stats = ConversionStats()
+    elif o == "--stats_json":
+        statsJsonFname = a
+        if stats is None:
+            stats = ConversionStats()
+    elif o == "--incremental":
+        incremental = True
+    elif o == "--follow":
+        incremental = True
+        follow = True
+    elif o == "--checkpoint":
+        checkpointFname = a
     else:
         assert False, "unhandled option"
 
+if incremental and csvDir is None and \
+        (not streamOutput or printOutput or parquetDir is not None):
+    sys.stderr.write("--incremental and --follow require --stream or --csv_dir\n")
+    usage()
+
 fullPathName = os.path.abspath(outFname)
 dirname = os.path.dirname(fullPathName)
 outBaseName = ".".join(os.path.basename(outFname).split(".")[0:-1])
 fullBaseName = dirname + "/" + outBaseName
 
-type_db = make_lcmtype_dictionary()
+type_db = LcmtypeRegistry(lcm_packages, lcmtypesCache)
+
+channelsToProcess = [ re.compile(regex) for regex in channelsToProcess or [ ".*" ] ]
+channelsToIgnore = [ re.compile(regex) for regex in channelsToIgnore ]
+log = open_log(fname)
+
+# seek to the time range with the log index
+logIndex = None
+startUtime = None
+endUtime = None
+startOffset = 0
+endOffset = None
+if startSeconds is not None or endSeconds is not None:
+    if stats is not None:
+        stats.start_phase("index")
+    logIndex = get_log_index(log, fname, indexFname)
+    firstTimestamp = logIndex.get_first_timestamp()
+    if firstTimestamp is not None:
+        if startSeconds is not None:
+            startUtime = firstTimestamp + int(startSeconds * 1e6)
+            startOffset = logIndex.find_offset(startUtime)
+        if endSeconds is not None:
+            endUtime = firstTimestamp + int(endSeconds * 1e6)
+            endOffset = logIndex.find_end_offset(endUtime)
 
-channelsToProcess = re.compile(channelsToProcess)
-channelsToIgnore = re.compile(channelsToIgnore)
-log = EventLog(fname, "r")
+# resume from the checkpoint of an earlier run
+checkpoint = None
+if incremental:
+    numJobs = 1
+    vectorize = False
+    if checkpointFname is None:
+        if csvDir is not None:
+            checkpointFname = get_default_checkpoint_fname(csvDir.rstrip("/"))
+        else:
+            checkpointFname = get_default_checkpoint_fname(outFname)
+    checkpoint = load_checkpoint(checkpointFname, fname)
+    if checkpoint is not None:
+        sys.stderr.write("resuming from checkpoint %s at offset %d\n" % \
+                (checkpointFname, checkpoint.offset))
+        startOffset = max(startOffset, checkpoint.offset)
+log.seek(startOffset)
+if stats is not None:
+    stats.total_bytes = (endOffset or log.size()) - startOffset
+    stats.start_phase("convert")
 
 if printOutput:
-    sys.stderr.write("opened % s, printing output to %s \n" % (fname, printFname))
-    if printFname == "stdout":
-        printFile = sys.stdout
+    if csvDir is not None:
+        sys.stderr.write("opened % s, printing output to %s \n" % (fname, csvDir))
+        if not os.path.isdir(csvDir):
+            os.makedirs(csvDir)
+        if not separatorGiven:
+            separator = ","
     else:
-        printFile = open(printFname, "w")
+        sys.stderr.write("opened % s, printing output to %s \n" % (fname, printFname))
+        if printFname == "stdout":
+            printFile = sys.stdout
+        else:
+            printFile = open(printFname, "w")
+    textWriter = TextWriter(printFile, separator, floatFormat, csvDir,
+            csv_sizes=checkpoint and checkpoint.output_sizes)
+elif parquetDir is not None:
+    sys.stderr.write("opened % s, outputing to % s\n" % (fname, parquetDir))
+    parquetWriter = ParquetWriter(parquetDir, chunkSize)
+    numJobs = 1
 else:
     sys.stderr.write("opened % s, outputing to % s\n" % (fname, outFname))
+    if streamOutput:
+        streamWriter = MatV73Writer(outFname, chunkSize, checkpoint is not None)
+        if checkpoint is not None:
+            streamWriter.truncate(checkpoint.row_counts)
 
-ignored_channels = []
+options = ConversionOptions(fname, type_db, channelsToProcess,
+        channelsToIgnore, decimations, startUtime, endUtime, printOutput,
+        printFormat, separator, floatFormat, verbose, stats is not None)
+channelState = ChannelState()
+if decimations and numJobs > 1:
+    shardMode = "channel"
 msgCount = 0
 statusMsg = ""
 startTime = 0
+startTimeFixed = False
+stopFollowing = False
+if checkpoint is not None:
+    for channel in checkpoint.unknown_channels:
+        channelState.decisions[channel] = CHANNEL_UNKNOWN_TYPE
+    channelState.decimationCounts.update(checkpoint.decimation_counts)
+    channelState.formats.update(checkpoint.channel_formats)
+    if checkpoint.start_time is not None:
+        startTime = checkpoint.start_time
+        startTimeFixed = True
+elif incremental:
+    checkpoint = Checkpoint(startOffset)
+if follow:
+    signal.signal(signal.SIGINT, stop_following)
+    signal.signal(signal.SIGTERM, stop_following)
+
+if printOutput:
+    parquetDir = None
+vectorize = vectorize and not printOutput and numJobs <= 1 and parquetDir is None
+vectorizedChannels = {}
+nextEventPos = log.tell()
+
+if numJobs > 1:
+    msgCount = convert_in_parallel(options, numJobs, shardMode)
+else:
+    if incremental:
+        events = follow_log()
+    else:
+        events = log
+    for e in events:
+        if incremental and stopFollowing:
+            break
+        if vectorize:
+            eventPos = nextEventPos
+            nextEventPos = log.tell()
+
+        if startUtime is not None and e.timestamp < startUtime:
+            continue
+        if endUtime is not None and e.timestamp > endUtime:
+            break
 
-for e in log:
-    if msgCount == 0: 
-        startTime = e.timestamp
+        if msgCount == 0 and not startTimeFixed:
+            startTime = e.timestamp
         
-    if e.channel in ignored_channels:
-        continue
-    if ((checkIgnore and channelsToIgnore.match(e.channel) and len(channelsToIgnore.match(e.channel).group())==len(e.channel)) \
-         or (not channelsToProcess.match(e.channel))):
-        if verbose:
-            statusMsg = deleteStatusMsg(statusMsg)
-            sys.stderr.write("ignoring channel %s\n" % e.channel)
-        ignored_channels.append(e.channel)
-        continue
+        lcmtype = get_event_type(e, channelState, options)
+        if lcmtype is None:
+            if stats is not None:
+                stats.add_ignored(e.channel, len(e.data))
+            continue
+        if decimations and not keep_decimated(e.channel, channelState, options):
+            continue
 
-    packed_fingerprint = e.data[:8]
-    lcmtype = type_db.get(packed_fingerprint, None)
-    if not lcmtype:
-        if verbose:
-            statusMsg = deleteStatusMsg(statusMsg)
-            sys.stderr.write("ignoring channel %s -not a known LCM type\n" % e.channel)
-        ignored_channels.append(e.channel)
-        continue
-    try:
-        msg = lcmtype.decode(e.data)
-    except:
-        statusMsg = deleteStatusMsg(statusMsg)
-        sys.stderr.write("error: couldn't decode msg on channel %s\n" % e.channel)
-        continue
-    
-    msgCount = msgCount + 1
-    if (msgCount % 5000) == 0:
-        statusMsg = deleteStatusMsg(statusMsg)
-        statusMsg = "read % d messages, % d %% done" % (msgCount, log.tell() / float(log.size())*100)
-        sys.stderr.write(statusMsg)
-        sys.stderr.flush()
+        if parquetDir is not None:
+            if stats is not None:
+                convertStart = time.time()
+            try:
+                msg = lcmtype.decode(e.data)
+            except:
+                statusMsg = deleteStatusMsg(statusMsg)
+                sys.stderr.write("error: couldn't decode msg on channel %s\n" % e.channel)
+                continue
+            if stats is not None:
+                elapsed = time.time() - convertStart
+                stats.add_decode(e.channel, elapsed)
+                stats.add_message(e.channel, len(e.data), elapsed)
+            msgCount = msgCount + 1
+            parquetWriter.append(e.channel, msg, (e.timestamp - startTime) / 1e6)
+            continue
+
+        vchan = vectorizedChannels.get(e.channel)
+        if vchan is not None and not vchan.accepts(e):
+            # e.g., a message of another type, or one that doesn't decode
+            unvectorize_channel(log, e.channel, vchan, startTime)
+            del vectorizedChannels[e.channel]
+            vchan = None
+        if vchan is not None:
+            vchan.offsets.append(eventPos)
+            if stats is not None:
+                stats.add_message(e.channel, len(e.data), 0.0)
+        else:
+            newChannel = e.channel not in channelState.flatteners
+            if stats is not None:
+                convertStart = time.time()
+            a = flatten_event(e, lcmtype, channelState, options, stats)
+            if a is None:
+                continue
+            if stats is not None:
+                stats.add_message(e.channel, len(e.data),
+                        time.time() - convertStart)
     
-    if e.channel in flatteners:
-        flattener = flatteners[e.channel]
-    else:
-        flattener = make_flattener(msg)
-        flatteners[e.channel] = flattener
-        data[e.channel] = []
-        if printFormat:
+        msgCount = msgCount + 1
+        if (msgCount % 5000) == 0:
             statusMsg = deleteStatusMsg(statusMsg)
-            typeStr, fieldCount = make_lcmtype_string(msg)
-            typeStr.append("%d- log_timestamp" % (fieldCount + 1))
-            
-            typeStr = "\n#%s  %s :\n#[\n#%s\n#]\n" % (e.channel, lcmtype, "\n#".join(typeStr))
-            sys.stderr.write(typeStr)
-                
+            if stats is not None:
+                statusMsg = stats.get_progress(msgCount, log.tell() - startOffset)
+            else:
+                statusMsg = "read % d messages, % d %% done" % (msgCount, (log.tell() - startOffset) / float((endOffset or log.size()) - startOffset)*100)
+            sys.stderr.write(statusMsg)
+            sys.stderr.flush()
 
+        if vchan is not None:
+            continue
+        if vectorize and newChannel:
+            vchan = make_vectorized_channel(lcmtype,
+                    channelState.structFlatteners[e.channel])
+            if vchan is not None:
+                vectorizedChannels[e.channel] = vchan
+                vchan.offsets.append(eventPos)
+                continue
 
-    a = flattener(msg)
-    #in case the initial flattener didn't work for whatever reason :-/
-    # convert to a numpy array
-    arr = numpy.array(a)
-    # check the data type of the array
-    if not(arr.dtype.kind in "bif"):
-        statusMsg = deleteStatusMsg(statusMsg)
-        sys.stderr.write("WARNING: needed to create new flattener for channel %s\n" % (e.channel))
-        flattener = make_flattener(msg)
-        flatteners[e.channel] = flattener
-        a = flattener(msg)
+        a.append((e.timestamp - startTime) / 1e6)
+        if printOutput:
+            n = textWriter.write(e.channel, a)
+            if stats is not None:
+                stats.add_output(e.channel, n)
+        elif streamOutput:
+            streamWriter.append(e.channel, a)
+            if stats is not None:
+                stats.add_output(e.channel, 8 * len(a))
+        else:
+            data.setdefault(e.channel, []).append(a)
+        if incremental:
+            checkpoint.count_row(e.channel)
 
-    a.append((e.timestamp - startTime) / 1e6)
-    if printOutput:
-        printFile.write("%s%s%s\n" % (e.channel, separator, separator.join([str(k) for k in a])))
+deleteStatusMsg(statusMsg)
+if incremental:
+    write_checkpoint()
+
+# second pass over the log for vectorized channels
+if stats is not None and vectorizedChannels:
+    stats.start_phase("vectorize")
+for chan, vchan in vectorizedChannels.items():
+    if stats is not None:
+        convertStart = time.time()
+    if streamOutput:
+        for rows in read_vectorized_rows(log, vchan, startTime, chunkSize):
+            streamWriter.append_rows(chan, rows)
+            if stats is not None:
+                stats.add_output(chan, rows.nbytes)
     else:
-        data[e.channel].append(a)
-        
-       
-    
+        blocks = list(read_vectorized_rows(log, vchan, startTime,
+            len(vchan.offsets)))
+        data[chan] = blocks[0]
+    if stats is not None:
+        stats.add_convert_time(chan, time.time() - convertStart)
 
-deleteStatusMsg(statusMsg)
-if not printOutput:
+if stats is not None:
+    if printOutput or parquetDir is not None or streamOutput:
+        stats.start_phase("save")
+    else:
+        stats.start_phase("pad")
+if printOutput:
+    textWriter.close()
+if parquetDir is not None:
+    sys.stderr.write("loaded all %d messages, finishing % s\n" % (msgCount, parquetDir))
+    parquetWriter.close()
+    if stats is not None:
+        for chan in stats.channels:
+            chanFname = parquetWriter.get_fname(chan)
+            if chanFname is not None and os.path.exists(chanFname):
+                stats.add_output(chan, os.path.getsize(chanFname))
+elif streamOutput and not printOutput:
+    sys.stderr.write("loaded all %d messages, finishing % s\n" % (msgCount, outFname))
+    streamWriter.close()
+elif not printOutput:
     #need to pad variable length messages with zeros...
     for chan in data:
+        if isinstance(data[chan], dict):
+            # already saved with --ragged by convert_in_parallel()
+            continue
         lengths = map(len, data[chan])
         maxLen = max(lengths)
         minLen = min(lengths)
-        if maxLen != minLen:
+        if maxLen != minLen and raggedOutput:
+            data[chan] = make_ragged(numpy.fromiter(
+                itertools.chain.from_iterable(data[chan]), numpy.float64,
+                sum(lengths)), lengths)
+        elif maxLen != minLen:
             sys.stderr.write("padding channel %s with zeros, messages ranged from %d to %d \n" % (chan, minLen, maxLen))
-            count = 0
-            for i in data[chan]:
-                pad = numpy.zeros(maxLen - lengths[count])
-                i.extend(pad)
-                count = count + 1
+            matrix = numpy.zeros((len(lengths), maxLen))
+            for i, row in enumerate(data[chan]):
+                matrix[i, :lengths[i]] = row
+            data[chan] = matrix
             
             
     sys.stderr.write("loaded all %d messages, saving to % s\n" % (msgCount, outFname))
+    if stats is not None:
+        for chan, value in data.items():
+            if isinstance(value, dict):
+                nbytes = sum([ column.nbytes for column in value.values() ])
+            elif isinstance(value, list):
+                nbytes = 8 * len(value) * len(value[0])
+            else:
+                nbytes = value.nbytes
+            stats.add_output(chan, nbytes)
+        stats.start_phase("save")
 
     if sys.version_info < (2, 6):
         scipy.io.mio.savemat(outFname, data)
     else:
         scipy.io.matlab.mio.savemat(outFname, data, oned_as='row')
 
-    
+if not printOutput and parquetDir is None:
     mfile = open(dirname + "/" + outBaseName + ".m", "w")
     loadFunc = """function [d imFnames]=%s()
 full_fname = '%s';
@@ -350,8 +1193,26 @@ else
 end
 d = load(filename);
 """ % (outBaseName, outFname, fullPathName)
+    if raggedOutput:
+        loadFunc += """
+%% channels saved with --ragged hold the values of all messages in one
+%% column; convert them to cell arrays with one row vector per message
+channels = fieldnames(d);
+for i = 1:numel(channels)
+    c = d.(channels{i});
+    if isstruct(c) && isfield(c, '%s')
+        d.(channels{i}) = mat2cell(c.%s', 1, c.%s')';
+    end
+end
+""" % (RAGGED_VALUES, RAGGED_VALUES, RAGGED_LENGTHS)
 
     
     
     mfile.write(loadFunc);
     mfile.close()
+
+if stats is not None:
+    stats.end_phase()
+    sys.stderr.write(stats.format_table())
+    if statsJsonFname is not None:
+        stats.save_json(statsJsonFname)
@@ -0,0 +1,100 @@
+"""Memory-mapped reader for LCM log files.
+
+MmapEventLog reads a log file through mmap instead of lcm.EventLog.  Event
+headers are parsed in place with struct.unpack_from, and the data of each
+event is a buffer object that refers to the mapped file, so reading an
+event doesn't copy its data.  The interface is the subset of lcm.EventLog
+used for reading logs: iteration, read_next_event(), seek(), tell() and
+size().  To seek to a timestamp, look up its offset in a log_index.LogIndex.
+"""
+import mmap
+import struct
+
+from log_shards import LOG_SYNC_WORD
+
+_SYNC_BYTES = struct.pack(">I", LOG_SYNC_WORD)
+
+# sync word, event number, timestamp, channel length, data length
+_EVENT_HEADER = struct.Struct(">IqqII")
+
+class LogEvent(object):
+    """An event read from a log.  data is a buffer that refers to the
+    mapped log file, and is only valid until the log is closed."""
+    __slots__ = [ "eventnum", "timestamp", "channel", "data" ]
+
+    def __init__(self, eventnum, timestamp, channel, data):
+        self.eventnum = eventnum
+        self.timestamp = timestamp
+        self.channel = channel
+        self.data = data
+
+class MmapEventLog(object):
+    def __init__(self, fname):
+        """Open a log file for reading.
+
+        Raises EnvironmentError or ValueError if the file can't be mapped,
+        e.g., because it is empty.
+        """
+        self._file = open(fname, "rb")
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0,
+                    access=mmap.ACCESS_READ)
+        except:
+            self._file.close()
+            raise
+        self._size = len(self._map)
+        self._pos = 0
+
+    def __iter__(self):
+        while True:
+            e = self.read_next_event()
+            if e is None:
+                return
+            yield e
+
+    def read_next_event(self):
+        """Read the event at the current position, skipping over any
+        corrupted data before it.
+
+        @return a LogEvent, or None at the end of the log.
+        """
+        mm = self._map
+        pos = self._pos
+        header_size = _EVENT_HEADER.size
+        while True:
+            if pos + header_size > self._size:
+                self._pos = self._size
+                return None
+            sync, eventnum, timestamp, channellen, datalen = \
+                    _EVENT_HEADER.unpack_from(mm, pos)
+            if sync == LOG_SYNC_WORD:
+                break
+            # resynchronize, like liblcm does
+            pos = mm.find(_SYNC_BYTES, pos + 1)
+            if pos < 0:
+                self._pos = self._size
+                return None
+
+        channel_pos = pos + header_size
+        data_pos = channel_pos + channellen
+        end = data_pos + datalen
+        if end > self._size:
+            # truncated event at the end of the log
+            self._pos = self._size
+            return None
+        self._pos = end
+        return LogEvent(eventnum, timestamp, mm[channel_pos:data_pos],
+                buffer(mm, data_pos, datalen))
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, pos):
+        self._pos = pos
+
+    def size(self):
+        return self._size
+
+    def close(self):
+        self._map.close()
+        self._file.close()
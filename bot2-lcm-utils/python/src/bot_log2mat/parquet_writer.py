@@ -0,0 +1,272 @@
+"""Columnar Parquet output for log_to_mat.
+
+ParquetWriter writes the messages on each channel to their own Parquet
+file, with one column per field instead of one flattened row per message.
+Nested types become dotted column names (e.g. "pose.pos"), arrays become
+list columns, strings are dictionary encoded, and byte arrays are binary
+columns.  Arrays of nested types become one list column per field of the
+nested type.  Nothing is padded or dropped.
+
+The columns of a channel are worked out from the types of the fields, as
+listed by lcm-gen in __typenames__ and __dimensions__, and from the values
+in the first row group of messages, which are buffered until there are
+row_group_size of them.  With types generated by older versions of lcm-gen,
+which don't list them, the type of an array that is empty in all of the
+messages can't be known, so the messages are buffered until it isn't, or
+the end of the log, when it is assumed to be an array of numbers.
+
+Channel names are made into file names by replacing the characters that
+can't be in one, and if two channels end up with the same name, the file of
+the second one gets a number appended to it.
+"""
+import os
+import re
+import sys
+import types
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+DEFAULT_ROW_GROUP_SIZE = 10000
+
+def _is_lcm_object(value):
+    return hasattr(value, "_encode_one") and hasattr(value, "__slots__")
+
+def _identity(value):
+    return value
+
+class _Column(object):
+    def __init__(self, name, get, arrow_type, dictionary=False):
+        self.name = name
+        # extracts the column value from a message
+        self.get = get
+        self.arrow_type = arrow_type
+        self.dictionary = dictionary
+
+def _scalar_type(samples):
+    kinds = set([ type(value) for value in samples ])
+    if not kinds:
+        return None
+    if kinds == set([ types.BooleanType ]):
+        return pyarrow.bool_()
+    if kinds <= set([ types.BooleanType, types.IntType, types.LongType ]):
+        return pyarrow.int64()
+    if kinds <= set([ types.BooleanType, types.IntType, types.LongType,
+            types.FloatType ]):
+        return pyarrow.float64()
+    if kinds == set([ types.UnicodeType ]):
+        return pyarrow.string()
+    if kinds == set([ types.StringType ]):
+        # lcm-gen decodes byte arrays to str, and strings to unicode
+        return pyarrow.binary()
+    return None
+
+# arrow types of the primitive LCM types, by name.  Integers are all widened
+# to int64, as they are when the type is worked out from the values.
+# Arrays of bytes are binary instead.
+_LCM_ARROW_TYPES = { "int8_t" : "int64", "int16_t" : "int64",
+        "int32_t" : "int64", "int64_t" : "int64", "byte" : "int64",
+        "float" : "float64", "double" : "float64", "boolean" : "bool_",
+        "string" : "string" }
+
+def _get_lcmtype(typename):
+    """Look up a generated LCM type by its full name (e.g., bot_core.pose_t).
+    Returns None if it isn't loaded."""
+    package, _, name = typename.rpartition(".")
+    module = sys.modules.get(package or name)
+    return getattr(module, name, None)
+
+def _make_field_getter(fieldname, get):
+    return lambda value: get(getattr(value, fieldname))
+
+def _make_list_getter(get):
+    return lambda value: [ get(item) for item in value ]
+
+def _make_columns(name, samples, top_level, typename=None, ndims=None,
+        guess=False):
+    """Create the columns for a field.
+
+    @param name the column name of the field
+    @param samples values of the field in some messages
+    @param top_level whether the field is outside of any array
+    @param typename the LCM type name of the field, or of its items if it is
+    an array, or None if the generated type doesn't list it
+    @param ndims the number of dimensions of the field if it is an array,
+    or 0, or None if the generated type doesn't list it
+    @param guess whether to assume that an array that is empty in all of the
+    samples is an array of numbers, if its type isn't known
+
+    @return a list of _Columns whose get functions take the field value, or
+    None if they can't be worked out from the samples yet.
+    """
+    # lcm-gen decodes byte arrays to str
+    if typename == "byte" and ndims == 1:
+        return [ _Column(name, _identity, pyarrow.binary()) ]
+
+    if (samples and type(samples[0]) in [ types.ListType, types.TupleType ]) \
+            or (not samples and ndims):
+        items = [ item for value in samples for item in value ]
+        if not items and typename is None:
+            if not guess:
+                return None
+            # no way to tell what's in an array that is always empty (e.g.,
+            # planar_lidar_t.intensities), so assume numbers
+            return [ _Column(name, _identity,
+                pyarrow.list_(pyarrow.float64())) ]
+        columns = _make_columns(name, items, False, typename,
+                ndims and ndims - 1, guess)
+        if columns is None:
+            return None
+        for column in columns:
+            column.get = _make_list_getter(column.get)
+            column.arrow_type = pyarrow.list_(column.arrow_type)
+            column.dictionary = False
+        return columns
+
+    lcmtype = None
+    if samples and _is_lcm_object(samples[0]):
+        lcmtype = type(samples[0])
+    elif typename is not None and typename not in _LCM_ARROW_TYPES:
+        lcmtype = _get_lcmtype(typename)
+        if lcmtype is None:
+            sys.stderr.write("WARNING: can't write field %s to Parquet\n" % \
+                    name)
+            return []
+    if lcmtype is not None:
+        typenames = getattr(lcmtype, "__typenames__", None)
+        dimensions = getattr(lcmtype, "__dimensions__", None)
+        columns = []
+        for i, fieldname in enumerate(lcmtype.__slots__):
+            subname = name and "%s.%s" % (name, fieldname) or fieldname
+            subsamples = [ getattr(value, fieldname) for value in samples ]
+            subtypename = None
+            subndims = None
+            if typenames is not None and dimensions is not None:
+                subtypename = typenames[i]
+                subndims = len(dimensions[i] or [])
+            subcolumns = _make_columns(subname, subsamples, top_level,
+                    subtypename, subndims, guess)
+            if subcolumns is None:
+                return None
+            for column in subcolumns:
+                column.get = _make_field_getter(fieldname, column.get)
+                columns.append(column)
+        return columns
+
+    if typename in _LCM_ARROW_TYPES:
+        arrow_type = getattr(pyarrow, _LCM_ARROW_TYPES[typename])()
+    elif not samples:
+        return None
+    else:
+        arrow_type = _scalar_type(samples)
+    if arrow_type is None:
+        sys.stderr.write("WARNING: can't write field %s to Parquet\n" % name)
+        return []
+    return [ _Column(name, _identity, arrow_type,
+        top_level and arrow_type == pyarrow.string()) ]
+
+def get_channel_fname(out_dir, channel, extension=".parquet"):
+    """Returns the output file name for a channel."""
+    return os.path.join(out_dir, re.sub(r"[^\w.-]", "_", channel) + extension)
+
+class _ChannelWriter(object):
+    def __init__(self, fname, row_group_size):
+        self.fname = fname
+        self.row_group_size = row_group_size
+        self.messages = []
+        self.timestamps = []
+        self.columns = None
+        self.writer = None
+
+    def write(self, final=False):
+        """Write out the buffered messages, unless the columns can't be
+        worked out from them yet and more are coming."""
+        if not self.messages:
+            return
+        if self.columns is None:
+            self.columns = _make_columns("", self.messages, True,
+                    guess=final)
+            if self.columns is None:
+                return
+        arrays = []
+        names = []
+        for column in self.columns:
+            values = [ column.get(msg) for msg in self.messages ]
+            array = pyarrow.array(values, type=column.arrow_type)
+            if column.dictionary:
+                array = array.dictionary_encode()
+            arrays.append(array)
+            names.append(column.name)
+        arrays.append(pyarrow.array(self.timestamps, type=pyarrow.float64()))
+        names.append("log_timestamp")
+        table = pyarrow.Table.from_arrays(arrays, names=names)
+        if self.writer is None:
+            self.writer = pyarrow.parquet.ParquetWriter(self.fname,
+                    table.schema)
+        self.writer.write_table(table, row_group_size=self.row_group_size)
+        del self.messages[:]
+        del self.timestamps[:]
+
+    def close(self):
+        self.write(True)
+        if self.writer is not None:
+            self.writer.close()
+
+class ParquetWriter(object):
+    """Writes decoded messages to one Parquet file per channel, in a
+    directory.  Each row group holds row_group_size messages."""
+    def __init__(self, out_dir, row_group_size=DEFAULT_ROW_GROUP_SIZE):
+        if pyarrow is None:
+            raise ImportError("Parquet output requires pyarrow")
+        if row_group_size < 1:
+            raise ValueError("row_group_size must be positive")
+        if not os.path.isdir(out_dir):
+            os.makedirs(out_dir)
+        self.out_dir = out_dir
+        self.row_group_size = row_group_size
+        self._channels = {}
+        # the channels written to each file, by file name
+        self._fname_channels = {}
+
+    def _make_fname(self, channel):
+        """Pick the file for a new channel, numbering it if another
+        channel's file has the same name."""
+        fname = get_channel_fname(self.out_dir, channel)
+        base, extension = os.path.splitext(fname)
+        n = 1
+        while fname in self._fname_channels:
+            n += 1
+            fname = "%s-%d%s" % (base, n, extension)
+        self._fname_channels[fname] = channel
+        return fname
+
+    def get_fname(self, channel):
+        """Returns the file that the messages on a channel are written to,
+        or None if there weren't any."""
+        writer = self._channels.get(channel)
+        return writer and writer.fname
+
+    def append(self, channel, msg, timestamp):
+        """Queue a decoded message for a channel.
+
+        @param channel the channel name
+        @param msg the decoded message
+        @param timestamp the log timestamp of the message, in seconds
+        """
+        writer = self._channels.get(channel)
+        if writer is None:
+            writer = _ChannelWriter(self._make_fname(channel),
+                    self.row_group_size)
+            self._channels[channel] = writer
+        writer.messages.append(msg)
+        writer.timestamps.append(timestamp)
+        if len(writer.messages) % self.row_group_size == 0:
+            writer.write()
+
+    def close(self):
+        """Write out all buffered messages and close the files."""
+        for writer in self._channels.values():
+            writer.close()
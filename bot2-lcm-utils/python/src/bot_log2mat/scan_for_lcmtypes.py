@@ -3,12 +3,224 @@ import re
 import os
 import sys
 import pyclbr
+import binascii
+import json
+import tempfile
 
-def find_lcmtypes():
+LCMTYPES_CACHE_VERSION = 2
+
+def get_default_lcmtypes_cache():
+    """Returns the default file name of the LCM type cache."""
+    cache_dir = os.environ.get("XDG_CACHE_HOME",
+            os.path.join(os.path.expanduser("~"), ".cache"))
+    return os.path.join(cache_dir, "bot_log2mat", "lcmtypes.cache")
+
+def _utf8(text):
+    if isinstance(text, unicode):
+        return text.encode("utf-8")
+    return text
+
+def _parse_cache_entry(entry):
+    """Returns the key and the value of a cache entry read from JSON.
+    Raises ValueError or TypeError if the entry is malformed."""
+    dir_name, full_fname, mtime, size, modname, fingerprint = entry
+    for text in [ dir_name, full_fname ]:
+        if not isinstance(text, basestring):
+            raise TypeError("invalid file name")
+    if not isinstance(mtime, (int, long, float)) or \
+            not isinstance(size, (int, long)):
+        raise TypeError("invalid modification time or size")
+    if modname is not None and not isinstance(modname, basestring):
+        raise TypeError("invalid module name")
+    if fingerprint is not None:
+        fingerprint = binascii.unhexlify(fingerprint)
+        if len(fingerprint) != 8:
+            raise ValueError("invalid fingerprint")
+    if modname is not None:
+        modname = _utf8(modname)
+    return (_utf8(dir_name), _utf8(full_fname)), \
+            (mtime, size, modname, fingerprint)
+
+class LcmtypeCache(object):
+    """On-disk cache of the results of scanning for LCM types.
+
+    For every python file that was scanned, the cache records the file's
+    modification time and size, the name of the LCM type module it contains
+    (or None if it doesn't contain one), and the packed fingerprint of the
+    type once it is known.  Entries are keyed by sys.path entry and file
+    name, so that one cache file can be shared between different python
+    paths.  Files whose modification time or size changed are scanned again.
+    The cache is stored as JSON, and ignored if it is malformed.
+    """
+    def __init__(self, fname):
+        self.fname = fname
+        self._entries = {}
+        self._seen = set()
+        # sys.path entries scanned in full, rather than for some packages
+        self._full_scan_dirs = set()
+        self._pruned = False
+        self._keys_by_modname = {}
+        self._modified = False
+        try:
+            f = open(fname, "rb")
+            try:
+                contents = json.load(f)
+            finally:
+                f.close()
+            if contents.get("version") == LCMTYPES_CACHE_VERSION:
+                self._entries = dict([ _parse_cache_entry(entry) \
+                        for entry in contents["entries"] ])
+        except Exception:
+            # missing, unreadable, malformed, or from an incompatible version
+            self._entries = {}
+
+    def lookup(self, dir_name, full_fname, st):
+        """Look up a file.
+
+        @param dir_name the sys.path entry the file was found under
+        @param full_fname the file name
+        @param st the result of os.stat() on the file
+
+        @return a (modname, fingerprint) tuple, or None if the file changed
+        since it was cached.
+        """
+        key = (dir_name, full_fname)
+        self._seen.add(key)
+        entry = self._entries.get(key)
+        if entry is None or entry[0] != st.st_mtime or entry[1] != st.st_size:
+            return None
+        modname, fingerprint = entry[2:]
+        if modname is not None:
+            self._keys_by_modname.setdefault(modname, key)
+        return modname, fingerprint
+
+    def get_fingerprint(self, modname):
+        """Returns the cached packed fingerprint of a scanned LCM type
+        module, or None if it isn't known."""
+        key = self._keys_by_modname.get(modname)
+        if key is None:
+            return None
+        return self._entries[key][3]
+
+    def add(self, dir_name, full_fname, st, modname):
+        """Record the result of scanning a file.  modname is None if the
+        file does not contain an LCM type."""
+        key = (dir_name, full_fname)
+        self._entries[key] = (st.st_mtime, st.st_size, modname, None)
+        if modname is not None:
+            self._keys_by_modname.setdefault(modname, key)
+        self._modified = True
+
+    def set_fingerprint(self, modname, fingerprint):
+        """Record the packed fingerprint of a scanned LCM type module."""
+        key = self._keys_by_modname.get(modname)
+        if key is None:
+            return
+        entry = self._entries[key]
+        if entry[3] != fingerprint:
+            self._entries[key] = entry[:3] + (fingerprint,)
+            self._modified = True
+
+    def set_scanned_in_full(self, dir_name):
+        """Record that every file under a sys.path entry was looked up, so
+        that the entries of files that weren't can be dropped."""
+        self._full_scan_dirs.add(dir_name)
+
+    def _prune(self):
+        """Drop the entries for files that no longer exist: those not looked
+        up under sys.path entries that were scanned in full, and elsewhere
+        those whose files are gone."""
+        for key in self._entries.keys():
+            if key in self._seen:
+                continue
+            if key[0] in self._full_scan_dirs or not os.path.exists(key[1]):
+                del self._entries[key]
+                self._modified = True
+
+    def save(self):
+        """Write the cache back to disk, dropping entries for files that
+        no longer exist the first time."""
+        if not self._pruned:
+            self._prune()
+            self._pruned = True
+        if not self._modified:
+            return
+        cache_dir = os.path.dirname(os.path.abspath(self.fname))
+        try:
+            if not os.path.isdir(cache_dir):
+                os.makedirs(cache_dir)
+            # write to a temporary file and rename it, so that processes
+            # sharing the cache never see a partially written file
+            text = json.dumps({ "version" : LCMTYPES_CACHE_VERSION,
+                "entries" : [ [ dir_name, full_fname, mtime, size, modname,
+                    fingerprint and binascii.hexlify(fingerprint) ] \
+                        for (dir_name, full_fname), \
+                        (mtime, size, modname, fingerprint) \
+                        in self._entries.items() ] })
+            fd, tmp_fname = tempfile.mkstemp(dir=cache_dir)
+            f = os.fdopen(fd, "wb")
+            try:
+                f.write(text)
+            finally:
+                f.close()
+            os.chmod(tmp_fname, 0644)
+            os.rename(tmp_fname, self.fname)
+        except (IOError, OSError, UnicodeError), err:
+            sys.stderr.write("couldn't write LCM type cache %s: %s\n" % \
+                    (self.fname, err))
+            return
+        self._modified = False
+
+def _is_lcmtype_module(full_fname, modname, mod_basename):
+    # quick regex test -- check if the file contains the 
+    # word "_get_packed_fingerprint"
+    try: 
+        contents = open(full_fname, "r").read()
+    except IOError:
+        return False
+    if not re.search("_get_packed_fingerprint", contents):
+        return False
+
+    # More thorough check to see if the file corresponds to a
+    # LCM type module genereated by lcm-gen.  Parse the 
+    # file using pyclbr, and check if it contains a class
+    # with the right name and methods
+    try:
+        klass = pyclbr.readmodule(modname)[mod_basename]
+        return "decode" in klass.methods and \
+               "_get_packed_fingerprint" in klass.methods
+    except ImportError:
+        return False
+    except KeyError:
+        return False
+
+def _in_packages(python_package, packages):
+    for package in packages:
+        if python_package == package or \
+                python_package.startswith(package + "."):
+            return True
+    return False
+
+def _may_contain_packages(python_package, packages):
+    for package in packages:
+        if package.startswith(python_package + ".") or \
+                _in_packages(python_package, [ package ]):
+            return True
+    return False
+
+def find_lcmtypes(cache=None, packages=None):
+    """Find the LCM type modules on sys.path.
+
+    @param cache an optional LcmtypeCache.  Files that haven't changed since
+    they were cached are not scanned again.
+    @param packages an optional list of python package names.  If given,
+    only these packages and their subpackages are scanned.
+
+    @return a list of module names.
+    """
     alpha_chars = set("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ")
     valid_chars = set("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_")
     lcmtypes = []
-    regex = re.compile("_get_packed_fingerprint")
     
     dirs_to_check = sys.path
 
@@ -19,6 +231,9 @@ def find_lcmtypes():
 
             python_package = ".".join(subdirs)
 
+            if packages is not None and not _in_packages(python_package, packages):
+                files = []
+
             for fname in files:
                 if not fname.endswith(".py"):
                     continue
@@ -34,44 +249,46 @@ def find_lcmtypes():
                 if not valid_modname:
                     continue
 
-                # quick regex test -- check if the file contains the 
-                # word "_get_packed_fingerprint"
                 full_fname = os.path.join(root, fname)
-		try: 
-               	    contents = open(full_fname, "r").read()
-		except IOError:
-                    continue
-                if not regex.search(contents):
-                    continue
-                
-                # More thorough check to see if the file corresponds to a
-                # LCM type module genereated by lcm-gen.  Parse the 
-                # file using pyclbr, and check if it contains a class
-                # with the right name and methods
                 if python_package:
                     modname = "%s.%s" % (python_package, mod_basename)
                 else:
                     modname = mod_basename
-                try:
-                    klass = pyclbr.readmodule(modname)[mod_basename]
-                    if "decode" in klass.methods and \
-                       "_get_packed_fingerprint" in klass.methods:
 
+                if cache is None:
+                    if _is_lcmtype_module(full_fname, modname, mod_basename):
                         lcmtypes.append(modname)
-                except ImportError:
                     continue
-                except KeyError:
+
+                try:
+                    st = os.stat(full_fname)
+                except OSError:
                     continue
+                entry = cache.lookup(dir_name, full_fname, st)
+                if entry is None:
+                    if not _is_lcmtype_module(full_fname, modname, mod_basename):
+                        modname = None
+                    cache.add(dir_name, full_fname, st, modname)
+                else:
+                    modname = entry[0]
+                if modname is not None:
+                    lcmtypes.append(modname)
 
             # only recurse into subdirectories that correspond to python 
             # packages (i.e., they contain a file named "__init__.py")
             subdirs_to_traverse = [ subdir_name for subdir_name in dirs \
                     if os.path.exists(os.path.join(root, subdir_name, "__init__.py")) ]
+            if packages is not None:
+                subdirs_to_traverse = [ subdir_name \
+                        for subdir_name in subdirs_to_traverse \
+                        if _may_contain_packages(".".join(subdirs + [ subdir_name ]), packages) ]
             del dirs[:]
             dirs.extend(subdirs_to_traverse)
+        if cache is not None and packages is None:
+            cache.set_scanned_in_full(dir_name)
     return lcmtypes
 
-def make_lcmtype_dictionary():
+def make_lcmtype_dictionary(cache_fname=None):
     """Create a dictionary of LCM types keyed by fingerprint.
 
     Searches the specified python package directories for modules 
@@ -82,8 +299,14 @@ def make_lcmtype_dictionary():
     The primary use for this dictionary is to automatically identify and 
     decode an LCM message.
 
+    @param cache_fname optional file name of an LcmtypeCache, which is
+    used to skip scanning files that haven't changed since the last call,
+    and updated.
     """
-    lcmtypes = find_lcmtypes()
+    cache = None
+    if cache_fname:
+        cache = LcmtypeCache(cache_fname)
+    lcmtypes = find_lcmtypes(cache)
 
     result = {}
 
@@ -95,10 +318,120 @@ def make_lcmtype_dictionary():
             klass = getattr(mod, type_basename)
             fingerprint = klass._get_packed_fingerprint()
             result[fingerprint] = klass
+            if cache is not None:
+                cache.set_fingerprint(lcmtype_name, fingerprint)
             #print "importing %s" % lcmtype_name
         except:
             print "Error importing %s" % lcmtype_name
+    if cache is not None:
+        cache.save()
     return result
+
+def _import_lcmtype(lcmtype_name):
+    try:
+        __import__(lcmtype_name)
+        mod = sys.modules[lcmtype_name]
+        return getattr(mod, lcmtype_name.split(".")[-1])
+    except:
+        print "Error importing %s" % lcmtype_name
+        return None
+
+class LcmtypeRegistry(object):
+    """A lazily populated dictionary of LCM types keyed by fingerprint.
+
+    Like make_lcmtype_dictionary(), but LCM type modules are only imported
+    when their fingerprint is first looked up.  Fingerprints are taken from
+    the LcmtypeCache if one is given.  Looking up a fingerprint that isn't in
+    the cache imports the modules whose fingerprints are not cached, one at a
+    time, until it is found.  If it still isn't found, the modules whose
+    fingerprints are cached but weren't imported yet are imported as well,
+    since a cached fingerprint is stale if a type nested in the type changed
+    without the type's own file changing.
+    """
+    def __init__(self, packages=None, cache_fname=None):
+        """
+        @param packages an optional list of python packages to search for
+        LCM types, instead of all of sys.path
+        @param cache_fname optional file name of an LcmtypeCache
+        """
+        self._cache = None
+        if cache_fname:
+            self._cache = LcmtypeCache(cache_fname)
+        self._types = {}
+        self._modnames_by_fingerprint = {}
+        self._unresolved = []
+        # modules with cached fingerprints, which may not be imported yet
+        self._unimported = []
+        self._imported = set()
+        for lcmtype_name in find_lcmtypes(self._cache, packages):
+            fingerprint = None
+            if self._cache is not None:
+                fingerprint = self._cache.get_fingerprint(lcmtype_name)
+            if fingerprint is None:
+                self._unresolved.append(lcmtype_name)
+            else:
+                self._modnames_by_fingerprint.setdefault(fingerprint,
+                        lcmtype_name)
+                self._unimported.append(lcmtype_name)
+        self._save_cache()
+
+    def _save_cache(self):
+        if self._cache is not None:
+            self._cache.save()
+
+    def _add(self, lcmtype_name):
+        self._imported.add(lcmtype_name)
+        klass = _import_lcmtype(lcmtype_name)
+        if klass is None:
+            return None
+        try:
+            fingerprint = klass._get_packed_fingerprint()
+        except:
+            print "Error importing %s" % lcmtype_name
+            return None
+        self._types.setdefault(fingerprint, klass)
+        if self._cache is not None:
+            self._cache.set_fingerprint(lcmtype_name, fingerprint)
+        return fingerprint
+
+    def get(self, fingerprint, default=None):
+        """Look up the LCM type class for a packed fingerprint, importing its
+        module if needed.
+
+        @return the class, or default if no LCM type has the fingerprint.
+        """
+        klass = self._types.get(fingerprint)
+        if klass is not None:
+            return klass
+
+        lcmtype_name = self._modnames_by_fingerprint.pop(fingerprint, None)
+        if lcmtype_name is not None:
+            # the cached fingerprint is stale if a nested type changed
+            if self._add(lcmtype_name) == fingerprint:
+                self._save_cache()
+                return self._types[fingerprint]
+
+        imported = lcmtype_name is not None
+        while self._unresolved and fingerprint not in self._types:
+            self._add(self._unresolved.pop(0))
+            imported = True
+        while self._unimported and fingerprint not in self._types:
+            lcmtype_name = self._unimported.pop()
+            if lcmtype_name not in self._imported:
+                self._add(lcmtype_name)
+                imported = True
+        if imported:
+            self._save_cache()
+        return self._types.get(fingerprint, default)
+
+    def __contains__(self, fingerprint):
+        return self.get(fingerprint) is not None
+
+    def __getitem__(self, fingerprint):
+        klass = self.get(fingerprint)
+        if klass is None:
+            raise KeyError(fingerprint)
+        return klass
  
 if __name__ == "__main__":
     import binascii
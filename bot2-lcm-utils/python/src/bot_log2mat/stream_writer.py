@@ -0,0 +1,139 @@
+"""Streaming MAT-file output for log_to_mat.
+
+MatV73Writer writes each channel as a MATLAB double matrix with one row per
+message, in the HDF5-based MAT v7.3 format.  Rows are buffered per channel
+and flushed to disk every chunk_rows rows, so memory use is bounded by the
+chunk size and the number of channels rather than by the length of the log.
+"""
+import os
+import time
+
+import numpy
+
+try:
+    import h5py
+except ImportError:
+    h5py = None
+
+DEFAULT_CHUNK_ROWS = 10000
+
+# MAT v7.3 files are HDF5 files with a 512 byte user block that starts with a
+# MAT-file header.
+MAT_V73_USERBLOCK_SIZE = 512
+
+def _mat_v73_header():
+    text = "MATLAB 7.3 MAT-file, Platform: GLNXA64, Created on: %s HDF5 schema 1.00 ." % \
+            time.strftime("%a %b %d %H:%M:%S %Y")
+    text = text.ljust(116)
+    # 8 byte subsystem data offset, version 0x0200, endian indicator
+    return text.encode("ascii") + b"\0" * 8 + b"\x00\x02IM"
+
+class MatV73Writer(object):
+    """Incrementally writes per-channel matrices to a MAT v7.3 file.
+
+    Messages shorter than the longest message on a channel are padded with
+    zeros, matching the behavior of the in-memory savemat path.
+    """
+    def __init__(self, fname, chunk_rows=DEFAULT_CHUNK_ROWS, append=False):
+        """
+        @param fname the MAT-file name
+        @param chunk_rows the number of rows buffered per channel
+        @param append whether to add rows to the channels in an existing
+        file, instead of replacing it
+        """
+        if h5py is None:
+            raise ImportError("streaming MAT v7.3 output requires h5py")
+        if chunk_rows < 1:
+            raise ValueError("chunk_rows must be positive")
+        self.fname = fname
+        self.chunk_rows = chunk_rows
+        if append and os.path.exists(fname):
+            self._file = h5py.File(fname, "r+")
+        else:
+            self._file = h5py.File(fname, "w",
+                    userblock_size=MAT_V73_USERBLOCK_SIZE)
+        self._pending = {}
+
+    def append(self, channel, row):
+        """Queue one flattened message for a channel."""
+        rows = self._pending.get(channel)
+        if rows is None:
+            rows = []
+            self._pending[channel] = rows
+        rows.append(row)
+        if len(rows) >= self.chunk_rows:
+            self._flush(channel)
+
+    def append_rows(self, channel, block):
+        """Write a 2D array of flattened messages for a channel."""
+        if channel in self._pending:
+            self._flush(channel)
+        if len(block):
+            self._write_block(channel, block)
+
+    def _flush(self, channel):
+        rows = self._pending[channel]
+        if not rows:
+            return
+        ncols = max([ len(row) for row in rows ])
+        block = numpy.zeros((len(rows), ncols))
+        for i, row in enumerate(rows):
+            block[i, :len(row)] = row
+        self._write_block(channel, block)
+        del rows[:]
+
+    def _write_block(self, channel, block):
+        nrows, ncols = block.shape
+
+        if self._file is None:
+            self._file = h5py.File(self.fname, "r+")
+
+        # MATLAB stores matrices column-major, so an nrows x ncols matrix is
+        # an ncols x nrows HDF5 dataset.
+        if channel in self._file:
+            dset = self._file[channel]
+        else:
+            dset = self._file.create_dataset(channel, shape=(ncols, 0),
+                    maxshape=(None, None), dtype="f8",
+                    chunks=(ncols, min(self.chunk_rows, 4096)), fillvalue=0)
+            dset.attrs["MATLAB_class"] = numpy.string_("double")
+        start = dset.shape[1]
+        dset.resize((max(dset.shape[0], ncols), start + nrows))
+        dset[:ncols, start:] = block.T
+
+    def truncate(self, row_counts):
+        """Cut the channels in the file back to a number of rows each, e.g.
+        to resume writing from a checkpoint.  Channels that aren't in
+        row_counts are removed."""
+        for channel in self._file.keys():
+            rows = row_counts.get(channel, 0)
+            if rows == 0:
+                del self._file[channel]
+            elif self._file[channel].shape[1] > rows:
+                dset = self._file[channel]
+                dset.resize((dset.shape[0], rows))
+
+    def flush(self):
+        """Write out all buffered rows, leaving a complete MAT-file that
+        more rows can be added to.  The file is closed until more rows are
+        written, so that it can be read in the meantime."""
+        for channel in self._pending:
+            self._flush(channel)
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self._write_header()
+
+    def _write_header(self):
+        out = open(self.fname, "r+b")
+        out.write(_mat_v73_header())
+        out.close()
+
+    def close(self):
+        """Flush all buffered rows and finish writing the MAT-file."""
+        for channel in self._pending:
+            self._flush(channel)
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self._write_header()
@@ -0,0 +1,114 @@
+"""Buffered text output for log_to_mat --print.
+
+TextWriter formats each flattened message with a single % operation on a
+format string built once per row length, instead of calling str() on every
+value, and collects the formatted lines so that they are written out in
+large blocks.  Without a float format the values are formatted with str(),
+as before.  The output is either one interleaved stream, with the channel
+name at the start of each line, or one file per channel.
+"""
+from parquet_writer import get_channel_fname
+
+DEFAULT_BUFFER_ROWS = 10000
+
+class TextWriter(object):
+    def __init__(self, out, separator, float_format=None, csv_dir=None,
+            buffer_rows=DEFAULT_BUFFER_ROWS, csv_sizes=None):
+        """
+        @param out the file for the interleaved output.  Not used if csv_dir
+        is given.
+        @param separator the separator between values
+        @param float_format an optional % format for every value, e.g.
+        "%.9g"
+        @param csv_dir an optional directory to write one file per channel
+        to, named after the channel
+        @param buffer_rows the number of lines buffered before writing
+        @param csv_sizes optional sizes of the files in csv_dir to append
+        to, by channel.  The files are cut back to these sizes first, and
+        the files of other channels are replaced.
+        """
+        self.out = out
+        self.separator = separator
+        self.float_format = float_format
+        self.csv_dir = csv_dir
+        self.buffer_rows = buffer_rows
+        self._row_formats = {}
+        self._lines = []
+        self._channel_lines = {}
+        self._channel_files = {}
+        self._csv_sizes = csv_sizes or {}
+
+    def format_values(self, values):
+        """Format a list of values, without the channel name."""
+        if self.float_format is None:
+            return self.separator.join([ str(k) for k in values ])
+        row_format = self._row_formats.get(len(values))
+        if row_format is None:
+            row_format = self.separator.join([ self.float_format ] * len(values))
+            self._row_formats[len(values)] = row_format
+        return row_format % tuple(values)
+
+    def format_value(self, value):
+        if self.float_format is None:
+            return str(value)
+        return self.float_format % value
+
+    def write(self, channel, values):
+        """Write a flattened message.  Returns the length of the line."""
+        return self.write_formatted(channel, self.format_values(values))
+
+    def write_formatted(self, channel, text):
+        """Write a message formatted with format_values().  Returns the
+        length of the line."""
+        if self.csv_dir is None:
+            line = "%s%s%s\n" % (channel, self.separator, text)
+            self._lines.append(line)
+            if len(self._lines) >= self.buffer_rows:
+                self._flush_lines()
+            return len(line)
+        lines = self._channel_lines.get(channel)
+        if lines is None:
+            lines = []
+            self._channel_lines[channel] = lines
+        lines.append(text + "\n")
+        if len(lines) >= self.buffer_rows:
+            self._flush_channel(channel)
+        return len(text) + 1
+
+    def _flush_lines(self):
+        self.out.write("".join(self._lines))
+        del self._lines[:]
+
+    def _flush_channel(self, channel):
+        f = self._channel_files.get(channel)
+        if f is None:
+            f = open(get_channel_fname(self.csv_dir, channel, ".csv"), "a")
+            f.truncate(self._csv_sizes.get(channel, 0))
+            self._channel_files[channel] = f
+        lines = self._channel_lines[channel]
+        f.write("".join(lines))
+        del lines[:]
+
+    def flush(self):
+        """Write out all buffered lines."""
+        self._flush_lines()
+        self.out.flush()
+        for channel in self._channel_lines:
+            self._flush_channel(channel)
+        for f in self._channel_files.values():
+            f.flush()
+
+    def get_csv_sizes(self):
+        """Returns the sizes of the files written to csv_dir, by channel,
+        including files appended to that weren't written this time."""
+        sizes = dict(self._csv_sizes)
+        for channel, f in self._channel_files.items():
+            sizes[channel] = f.tell()
+        return sizes
+
+    def close(self):
+        """Write out all buffered lines, and close the per-channel files.
+        The interleaved output file is flushed but not closed."""
+        self.flush()
+        for f in self._channel_files.values():
+            f.close()
@@ -1,6 +1,9 @@
 package bot_lcmgl;
 
 import java.io.*;
+import java.security.*;
+import java.util.*;
+import java.util.zip.Deflater;
 
 import lcm.lcm.LCM;
 
@@ -13,6 +16,30 @@ public class LCMGL
     String _name = "unnamed";
     int _scene = 0;
     int _sequence = 0;
+    int _textureCount = 0;
+    // see setTextureResendInterval()
+    int _textureResendInterval = 0;
+    // scenes that the textures were last sent in, by hash
+    HashMap<Long, Integer> _texturesSent = new HashMap<Long, Integer>();
+
+    // display lists, see newList()
+    static class DisplayList
+    {
+        long key;
+        int version;
+        byte[] data = new byte[0];
+        // whether the list was sent, and the scene it was last sent in
+        boolean sent = false;
+        int sentScene;
+    }
+    int _listResendInterval = 50;
+    HashMap<String, DisplayList> _lists = new HashMap<String, DisplayList>();
+    // the name of the list being recorded, and the scene's operations and
+    // texture count while it is
+    String _recording = null;
+    ByteArrayOutputStream _sceneBouts;
+    DataOutputStream _sceneOuts;
+    int _sceneTextureCount;
 
     final static int LCMGL_BEGIN         = 4;
     final static int LCMGL_END           = 5;
@@ -43,6 +70,12 @@ public class LCMGL
     final static int LCMGL_MULT_MATRIXF  = 30;
     final static int LCMGL_MULT_MATRIXD  = 31;
     final static int LCMGL_MATERIALF     = 32;
+    final static int LCMGL_TEX_2D        = 36;
+    final static int LCMGL_TEX_DRAW_QUAD = 37;
+    final static int LCMGL_TEX_2D_KEYED  = 43;
+    final static int LCMGL_TEX_2D_CACHED = 44;
+    final static int LCMGL_LIST_DEFINE   = 45;
+    final static int LCMGL_LIST_CALL     = 46;
 
     public LCMGL(LCM lcm, String name)
     {
@@ -146,6 +179,14 @@ public class LCMGL
         _scene++;
         _sequence++;
         _bouts.reset();
+
+        _textureCount = 0;
+        // forget the textures that have to be sent again
+        Iterator<Integer> it = _texturesSent.values().iterator();
+        while (it.hasNext()) {
+            if (_scene - it.next() >= _textureResendInterval)
+                it.remove();
+        }
     }
 
     public synchronized void glBegin(int mode) { add1i(LCMGL_BEGIN, mode); }
@@ -246,6 +287,254 @@ public class LCMGL
         } catch(IOException xcp) {}
     }
 
+    // texture formats, the OpenGL values as in the C client
+    public static final int LUMINANCE = 0x1909;
+    public static final int RGB = 0x1907;
+    public static final int RGBA = 0x1908;
+
+    static final int UNSIGNED_BYTE = 0x1401;
+
+    public static final int COMPRESS_NONE = 0;
+    public static final int COMPRESS_ZLIB = 1;
+
+    /**
+     * Makes texture2d() send a texture that didn't change since an earlier
+     * scene as a reference to the earlier one, which the renderer keeps,
+     * instead of sending all of its pixels again.  The pixels are sent
+     * again once every <code>scenes</code> scenes.  The default, 0, sends
+     * the pixels of every texture in every scene.
+     */
+    public synchronized void setTextureResendInterval(int scenes)
+    {
+        _textureResendInterval = scenes;
+    }
+
+    private static long textureKey(byte[] data, int width, int height, int format)
+    {
+        try {
+            MessageDigest md5 = MessageDigest.getInstance("MD5");
+            ByteArrayOutputStream bouts = new ByteArrayOutputStream();
+            DataOutputStream outs = new DataOutputStream(bouts);
+            outs.writeInt(width);
+            outs.writeInt(height);
+            outs.writeInt(format);
+            outs.writeInt(UNSIGNED_BYTE);
+            md5.update(bouts.toByteArray());
+            md5.update(data);
+            return new DataInputStream(new ByteArrayInputStream(md5.digest())).readLong();
+        } catch(NoSuchAlgorithmException xcp) {
+            throw new RuntimeException(xcp);
+        } catch(IOException xcp) {
+            throw new RuntimeException(xcp);
+        }
+    }
+
+    /**
+     * Creates a texture from height rows of width pixels with one byte per
+     * component, without padding between rows.
+     *
+     * @param format LUMINANCE, RGB or RGBA
+     * @param compression COMPRESS_NONE or COMPRESS_ZLIB
+     * @return the texture ID, which is valid until switchBuffers() is called
+     */
+    public synchronized int texture2d(byte[] data, int width, int height,
+            int format, int compression)
+    {
+        int subpixels;
+        switch (format) {
+            case LUMINANCE: subpixels = 1; break;
+            case RGB: subpixels = 3; break;
+            case RGBA: subpixels = 4; break;
+            default: throw new IllegalArgumentException("invalid texture format");
+        }
+        if (compression != COMPRESS_NONE && compression != COMPRESS_ZLIB)
+            throw new IllegalArgumentException("invalid texture compression");
+        int bytesPerRow = width * subpixels;
+        if (data.length != bytesPerRow * height)
+            throw new IllegalArgumentException("expected " + bytesPerRow * height +
+                    " bytes of texture data, got " + data.length);
+
+        int texId = ++_textureCount;
+        try {
+            // lists are kept by the renderer anyway, so their textures
+            // aren't cached
+            if (_textureResendInterval > 0 && _recording == null) {
+                long key = textureKey(data, width, height, format);
+                if (_texturesSent.containsKey(key)) {
+                    _outs.writeByte(LCMGL_TEX_2D_CACHED);
+                    _outs.writeInt(texId);
+                    _outs.writeLong(key);
+                    return texId;
+                }
+                _texturesSent.put(key, _scene);
+                _outs.writeByte(LCMGL_TEX_2D_KEYED);
+                _outs.writeLong(key);
+            }
+
+            _outs.writeByte(LCMGL_TEX_2D);
+            _outs.writeInt(texId);
+            _outs.writeInt(width);
+            _outs.writeInt(height);
+            _outs.writeInt(format);
+            _outs.writeInt(UNSIGNED_BYTE);
+            _outs.writeInt(compression);
+            _outs.writeInt(data.length);
+            if (compression == COMPRESS_NONE) {
+                _outs.write(data);
+            } else {
+                // each row is compressed on its own, as the C client does
+                Deflater deflater = new Deflater(Deflater.BEST_SPEED);
+                byte[] buf = new byte[bytesPerRow + bytesPerRow / 100 + 64];
+                for (int row = 0; row < height; row++) {
+                    deflater.reset();
+                    deflater.setInput(data, row * bytesPerRow, bytesPerRow);
+                    deflater.finish();
+                    int len = 0;
+                    while (!deflater.finished()) {
+                        if (len == buf.length)
+                            buf = Arrays.copyOf(buf, buf.length * 2);
+                        len += deflater.deflate(buf, len, buf.length - len);
+                    }
+                    _outs.writeInt(len);
+                    _outs.write(buf, 0, len);
+                }
+                deflater.end();
+            }
+        } catch(IOException xcp) {}
+        return texId;
+    }
+
+    /**
+     * Draws a texture created by texture2d() on a quad, with the active
+     * color.  The corners are {x, y, z} arrays.
+     */
+    public synchronized void textureDrawQuad(int texId,
+            double[] topLeft, double[] botLeft,
+            double[] botRight, double[] topRight)
+    {
+        if (texId > _textureCount || texId <= 0)
+            throw new IllegalArgumentException("invalid texture ID");
+        try {
+            _outs.writeByte(LCMGL_TEX_DRAW_QUAD);
+            _outs.writeInt(texId);
+            for (double[] corner : new double[][] { topLeft, botLeft, botRight, topRight }) {
+                _outs.writeDouble(corner[0]);
+                _outs.writeDouble(corner[1]);
+                _outs.writeDouble(corner[2]);
+            }
+        } catch(IOException xcp) {}
+    }
+
+    /**
+     * Returns the key of a display list, the 64 bit FNV-1a hash of the
+     * client name, a zero byte and the list name.
+     */
+    private static long listKey(String clientName, String listName)
+    {
+        byte[] bytes;
+        try {
+            bytes = (clientName + "\0" + listName).getBytes("UTF-8");
+        } catch(UnsupportedEncodingException xcp) {
+            throw new RuntimeException(xcp);
+        }
+        long key = 0xcbf29ce484222325L;
+        for (byte b : bytes) {
+            key ^= b & 0xff;
+            key *= 0x100000001b3L;
+        }
+        return key;
+    }
+
+    /**
+     * Starts recording a display list.  The operations up to endList() are
+     * kept by the client instead of being added to the scene, and
+     * callList() draws them.  A list is sent to the renderer with the
+     * first scene that draws it, and again once every list resend interval
+     * scenes.  Other scenes only refer to it, so that geometry that seldom
+     * changes isn't sent with every scene.  Recording a list again with a
+     * new version replaces it.  Lists can't be recorded inside lists.
+     */
+    public synchronized void newList(String name, int version)
+    {
+        if (_recording != null)
+            throw new IllegalStateException("already recording list " + _recording);
+        DisplayList list = new DisplayList();
+        list.key = listKey(_name, name);
+        list.version = version;
+        _lists.put(name, list);
+
+        _recording = name;
+        _sceneBouts = _bouts;
+        _sceneOuts = _outs;
+        _sceneTextureCount = _textureCount;
+        _bouts = new ByteArrayOutputStream();
+        _outs = new DataOutputStream(_bouts);
+        _textureCount = 0;
+    }
+
+    public synchronized void endList()
+    {
+        if (_recording == null)
+            throw new IllegalStateException("not recording a list");
+        _lists.get(_recording).data = _bouts.toByteArray();
+        _recording = null;
+        _bouts = _sceneBouts;
+        _outs = _sceneOuts;
+        _textureCount = _sceneTextureCount;
+        _sceneBouts = null;
+        _sceneOuts = null;
+    }
+
+    /**
+     * Returns whether the list was recorded with the given version, so that
+     * it doesn't have to be recorded again.
+     */
+    public synchronized boolean hasList(String name, int version)
+    {
+        DisplayList list = _lists.get(name);
+        return list != null && !name.equals(_recording) && list.version == version;
+    }
+
+    /** Draws a recorded display list. */
+    public synchronized void callList(String name)
+    {
+        DisplayList list = _lists.get(name);
+        if (list == null || name.equals(_recording))
+            throw new IllegalArgumentException("invalid list " + name);
+        try {
+            if (!list.sent || (_listResendInterval > 0 &&
+                    _scene - list.sentScene >= _listResendInterval)) {
+                _outs.writeByte(LCMGL_LIST_DEFINE);
+                _outs.writeLong(list.key);
+                _outs.writeInt(list.version);
+                _outs.writeInt(list.data.length);
+                _outs.write(list.data);
+                list.sent = true;
+                list.sentScene = _scene;
+            }
+            _outs.writeByte(LCMGL_LIST_CALL);
+            _outs.writeLong(list.key);
+            _outs.writeInt(list.version);
+        } catch(IOException xcp) {}
+    }
+
+    /**
+     * Sets the number of scenes after which a display list is sent again.
+     * 0 sends each list only once, or when resendLists() is called.  The
+     * default is 50.
+     */
+    public synchronized void setListResendInterval(int scenes)
+    {
+        _listResendInterval = scenes;
+    }
+
+    /** Sends every display list again the next time it is drawn. */
+    public synchronized void resendLists()
+    {
+        for (DisplayList list : _lists.values())
+            list.sent = false;
+    }
+
     public static void main(String args[])
     {
         LCM lcm = LCM.getSingleton();
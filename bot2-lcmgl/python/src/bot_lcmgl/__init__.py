@@ -1,4 +1,3 @@
-from data_t import data_t
-
-from lcmgl import *
 from .data_t import data_t
+
+from .lcmgl import *
@@ -0,0 +1,316 @@
+"""Encode throughput of the Python lcmgl client.
+
+Draws vertex-heavy, text-heavy and texture-heavy scenes as fast as possible
+and prints the primitives drawn per second, with the scenes published to a
+stand-in for lcm.LCM that only counts the messages, so that the numbers are
+the cost of encoding them.
+
+Before timing anything, the messages of a fixed set of scenes are checked
+against digests of the messages that the Python 2 client published for
+them, so that the same check also shows that the encoder running the
+benchmark (e.g. under Python 3) has the same wire format.
+
+usage: python -m bot_lcmgl.benchmark [options]
+"""
+import binascii
+import getopt
+import hashlib
+import sys
+import timeit
+
+import bot_lcmgl
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# seconds each scene is drawn for, by default
+DEFAULT_SECONDS = 2.0
+
+# digests of the messages published for the golden scenes by the Python 2
+# client, without the fingerprint at the start of each message, which is
+# checked separately.  Compressed textures aren't covered, since zlib
+# implementations don't all compress the same data to the same bytes.
+_GOLDEN_DIGESTS = {
+    "vertices" : "96b98ad829744fbfef96cfb596ec1f54",
+    "text" : "f292df75533ea8306413e53268284814",
+    "textures" : "19649e9c58b347cf7d319414c56ef914",
+    "wire" : "ac83e7efc8e75f9aff2d9fc5cc614a76",
+}
+
+# the fingerprint of bot_lcmgl.data_t, as lcm-gen computes it from
+# bot_lcmgl_data_t.lcm
+_DATA_T_FINGERPRINT = "c9f0a88256b8dd9b"
+
+class _Publisher(object):
+    """Stand-in for lcm.LCM that counts the messages published, and keeps
+    them if asked to."""
+    def __init__(self, keep=False):
+        self.messages = 0
+        self.bytes = 0
+        self.published = [] if keep else None
+
+    def publish(self, channel, data):
+        self.messages += 1
+        self.bytes += len(data)
+        if self.published is not None:
+            # the client reuses the memory of the messages it published
+            self.published.append((channel, bytes(data)))
+
+def _make_texture(width, height, subpixels, seed):
+    return bytes(bytearray((i * 7 + i // (width * subpixels) * 3 + seed) & 0xff
+        for i in range(width * height * subpixels)))
+
+class _VertexScene(object):
+    """Colored points, drawn one vertex at a time, or with points() if
+    use_numpy is set."""
+    def __init__(self, nvertices=10000, use_numpy=False):
+        self.nvertices = nvertices
+        self.use_numpy = use_numpy
+        self.points = [ (i * 0.25, (i % 100) * 0.5, (i % 7) * 0.125) \
+                for i in range(nvertices) ]
+        self.colors = [ ((i % 256) / 255.0, 0.5, 1 - (i % 64) / 64.0) \
+                for i in range(nvertices) ]
+        if use_numpy:
+            self.points = numpy.array(self.points)
+            self.colors = numpy.array(self.colors)
+
+    def draw(self, g):
+        """Draw a scene, without calling switch_buffer().  Returns the
+        number of primitives drawn."""
+        if self.use_numpy:
+            g.points(self.points, colors=self.colors)
+            return self.nvertices
+        glColor3f = g.glColor3f
+        glVertex3d = g.glVertex3d
+        g.glBegin(bot_lcmgl.GL_POINTS)
+        for (r, gr, b), (x, y, z) in zip(self.colors, self.points):
+            glColor3f(r, gr, b)
+            glVertex3d(x, y, z)
+        g.glEnd()
+        return self.nvertices
+
+class _TextScene(object):
+    """Labels drawn at different places."""
+    def __init__(self, nlabels=1000):
+        self.labels = [ ("object %d" % i, i * 0.5, (i % 10) * 2.0, 1.0) \
+                for i in range(nlabels) ]
+
+    def draw(self, g):
+        g.glColor3f(1, 1, 1)
+        for text, x, y, z in self.labels:
+            g.text(x, y, z, text, bot_lcmgl.LCMGL_TEXT_DROP_SHADOW)
+        return len(self.labels)
+
+class _TextureScene(object):
+    """RGB textures, each drawn as a quad."""
+    def __init__(self, ntextures=8, width=128, height=128,
+            compression=bot_lcmgl.LCMGL_COMPRESS_NONE):
+        self.width = width
+        self.height = height
+        self.compression = compression
+        self.textures = [ _make_texture(width, height, 3, i) \
+                for i in range(ntextures) ]
+
+    def draw(self, g):
+        for i, data in enumerate(self.textures):
+            tex_id = g.texture2d(data, self.width, self.height,
+                    bot_lcmgl.LCMGL_RGB, self.compression)
+            g.textureDrawQuad(tex_id, (i, 1, 0), (i, 0, 0), (i + 1, 0, 0),
+                    (i + 1, 1, 0))
+        return len(self.textures)
+
+class _WireScene(object):
+    """Every operation of the client once, in scenes split over several
+    messages, with cached textures and display lists."""
+    def __init__(self):
+        self.texture = _make_texture(16, 8, 4, 1)
+        self.luminance = _make_texture(5, 3, 1, 2)
+
+    def make_client(self, lcm):
+        return bot_lcmgl.lcmgl(u"wire \xe9", lcm, max_message_size=256,
+                texture_resend_interval=2, list_resend_interval=2)
+
+    def draw(self, g):
+        s = g.scene
+        g.glPushMatrix()
+        g.glLoadIdentity()
+        g.glTranslated(1, 2, s)
+        g.glRotated(30, 0, 0, 1)
+        g.glScalef(1, 2, 0.5)
+        g.glEnable(bot_lcmgl.GL_LIGHTING)
+        g.glMaterialf(bot_lcmgl.GL_FRONT, bot_lcmgl.GL_DIFFUSE, 0, 0.75, 0,
+                1)
+        g.glNormal3f(0, 0, 1)
+        g.glPointSize(3)
+        g.glLineWidth(1.5)
+        g.glBegin(bot_lcmgl.GL_LINES)
+        g.glColor4f(1, 0, 0, 0.5)
+        g.glVertex2f(0, s)
+        g.glVertex2d(1, s)
+        g.glVertex3f(0, 1, s)
+        g.glVertex3d(1, 1, s)
+        g.glEnd()
+        g.points([ (0, 0, s), (1, 0, s) ], 2, [ (0, 1, 0), (0, 0, 1) ])
+        g.colors_vertices([ (1, 1, 1, 1) ], [ (0.5, 0.5, s) ])
+        g.vertices3d([ (0.25, 0.75, s) ])
+        g.glDisable(bot_lcmgl.GL_LIGHTING)
+        g.circle(0, 0, s, 1)
+        g.disk(0, 0, s, 0.5, 1)
+        g.sphere(0, 0, s, 1, 8, 6)
+        g.cylinder(0, 0, s, 1, 0.5, 2, 8, 2)
+        g.text(0, 0, s, "scene %d" % s,
+                bot_lcmgl.LCMGL_TEXT_ANCHOR_LEFT)
+        tex_id = g.texture2d(self.texture, 16, 8, bot_lcmgl.LCMGL_RGBA,
+                bot_lcmgl.LCMGL_COMPRESS_NONE)
+        g.textureDrawQuad(tex_id, (0, 1, 0), (0, 0, 0), (1, 0, 0), (1, 1, 0))
+        if not g.has_list("grid", 1):
+            g.new_list("grid", 1)
+            g.glBegin(bot_lcmgl.GL_LINES)
+            for i in range(4):
+                g.glVertex3d(i, 0, 0)
+                g.glVertex3d(i, 3, 0)
+            g.glEnd()
+            g.texture2d(self.luminance, 5, 3, bot_lcmgl.LCMGL_LUMINANCE,
+                    bot_lcmgl.LCMGL_COMPRESS_NONE)
+            g.end_list()
+        g.call_list("grid")
+        g.glPopMatrix()
+        return 1
+
+def _golden_scenes():
+    """Returns the scenes checked against the Python 2 client, by name."""
+    return { "vertices" : _VertexScene(500),
+            "text" : _TextScene(50),
+            "textures" : _TextureScene(2, 16, 16),
+            "wire" : _WireScene() }
+
+def _digest(scene):
+    """Returns the MD5 digest of the messages published for three scenes,
+    without their fingerprints, and the set of fingerprints they start
+    with."""
+    lcm = _Publisher(keep=True)
+    if hasattr(scene, "make_client"):
+        g = scene.make_client(lcm)
+    else:
+        g = bot_lcmgl.lcmgl("golden", lcm)
+    for i in range(3):
+        scene.draw(g)
+        g.switch_buffer()
+    digest = hashlib.md5()
+    fingerprints = set()
+    for channel, data in lcm.published:
+        fingerprints.add(binascii.hexlify(data[:8]).decode("ascii"))
+        digest.update(channel.encode("ascii"))
+        digest.update(data[8:])
+    return digest.hexdigest(), fingerprints
+
+def check_golden(out=sys.stdout):
+    """Compare the messages published for the golden scenes with those of
+    the Python 2 client.  Returns whether they are the same."""
+    ok = True
+    fingerprint = binascii.hexlify(
+            bot_lcmgl.data_t._get_packed_fingerprint()).decode("ascii")
+    if fingerprint != _DATA_T_FINGERPRINT:
+        out.write("bot_lcmgl.data_t has fingerprint %s, expected %s\n" % \
+                (fingerprint, _DATA_T_FINGERPRINT))
+        ok = False
+    scenes = _golden_scenes()
+    if numpy is not None:
+        # points() encodes the same bytes as the vertex scene
+        scenes["vertices (numpy)"] = _VertexScene(500, use_numpy=True)
+    for name in sorted(scenes):
+        expected = _GOLDEN_DIGESTS[name.split()[0]]
+        digest, fingerprints = _digest(scenes[name])
+        if digest != expected:
+            out.write("%s: messages differ from the Python 2 client "
+                    "(%s, expected %s)\n" % (name, digest, expected))
+            ok = False
+        if fingerprints != set([ _DATA_T_FINGERPRINT ]):
+            out.write("%s: messages have fingerprints %s, expected %s\n" % \
+                    (name, ", ".join(sorted(fingerprints)),
+                        _DATA_T_FINGERPRINT))
+            ok = False
+    return ok
+
+def run_scene(scene, seconds):
+    """Draw and publish the scene over and over for the given number of
+    seconds.  Returns the number of scenes, primitives and bytes published,
+    and the seconds taken."""
+    lcm = _Publisher()
+    g = bot_lcmgl.lcmgl("benchmark", lcm)
+    timer = timeit.default_timer
+    nscenes = 0
+    nprimitives = 0
+    start = timer()
+    while True:
+        nprimitives += scene.draw(g)
+        g.switch_buffer()
+        nscenes += 1
+        elapsed = timer() - start
+        if elapsed >= seconds and nscenes >= 3:
+            return nscenes, nprimitives, lcm.bytes, elapsed
+
+def benchmark_scenes():
+    """Returns the (name, primitive, scene) tuples that are timed."""
+    scenes = [ ("vertices", "vertices", _VertexScene()) ]
+    if numpy is not None:
+        scenes.append(("vertices (numpy)", "vertices",
+            _VertexScene(use_numpy=True)))
+    scenes += [ ("text", "labels", _TextScene()),
+            ("textures", "textures", _TextureScene()),
+            ("textures (zlib)", "textures",
+                _TextureScene(compression=bot_lcmgl.LCMGL_COMPRESS_ZLIB)) ]
+    return scenes
+
+def usage():
+    sys.stderr.write("""usage: %s [options]
+
+Times drawing lcmgl scenes, published to a stand-in for LCM, after checking
+that the client encodes the same messages as the Python 2 client.
+
+    -h --help          print this message
+    -s --seconds=sec   draw each scene for [sec] seconds [default %g]
+    -c --check         only check the messages against the Python 2 client
+""" % (sys.argv[0], DEFAULT_SECONDS))
+    sys.exit(1)
+
+def main():
+    try:
+        opts, args = getopt.gnu_getopt(sys.argv[1:], "hs:c",
+                [ "help", "seconds=", "check" ])
+    except getopt.GetoptError as err:
+        sys.stderr.write("%s\n" % err)
+        usage()
+    seconds = DEFAULT_SECONDS
+    check_only = False
+    for o, a in opts:
+        if o in ("-h", "--help"):
+            usage()
+        elif o in ("-s", "--seconds"):
+            seconds = float(a)
+        elif o in ("-c", "--check"):
+            check_only = True
+    if args:
+        usage()
+
+    if not check_golden(sys.stderr):
+        sys.exit(1)
+    sys.stdout.write("messages match the Python 2 client\n")
+    if check_only:
+        return
+
+    sys.stdout.write("Python %d.%d.%d, %s numpy\n\n" % \
+            (sys.version_info[:3] + ("without" if numpy is None else "with",)))
+    sys.stdout.write("%-18s %7s %12s %-9s %10s %9s\n" % ("scene", "scenes",
+        "primitives/s", "", "ms/scene", "MB/s"))
+    for name, primitive, scene in benchmark_scenes():
+        nscenes, nprimitives, nbytes, elapsed = run_scene(scene, seconds)
+        sys.stdout.write("%-18s %7d %12.0f %-9s %10.3f %9.1f\n" % (name,
+            nscenes, nprimitives / elapsed, primitive,
+            elapsed * 1000 / nscenes, nbytes / elapsed / 1e6))
+        sys.stdout.flush()
+
+if __name__ == "__main__":
+    main()
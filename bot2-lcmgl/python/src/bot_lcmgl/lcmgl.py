@@ -1,6 +1,22 @@
-import cStringIO as StringIO
 import bot_lcmgl.data_t as data_t
+import collections
+import hashlib
 import struct
+import threading
+import zlib
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+try:
+    # Python 2's lcm publishes anything with the buffer interface
+    _lcmgl_message = buffer
+except NameError:
+    # Python 3's lcm only publishes bytes
+    def _lcmgl_message(data, offset, size):
+        return bytes(memoryview(data)[offset:offset + size])
 
 LCMGL_GL_BEGIN         = 4
 LCMGL_GL_END           = 5
@@ -38,6 +54,13 @@ LCMGL_TEXTURE2D        = 36
 LCMGL_TEXTURE_DRAW_QUAD= 37
 LCMGL_SPHERE           = 38
 LCMGL_CYLINDER         = 39
+LCMGL_GL_MATRIX_MODE   = 40  # nyi
+LCMGL_GL_ORTHO         = 41  # nyi
+LCMGL_SCALE_TO_VIEWER_AR = 42  # nyi
+LCMGL_TEXTURE2D_KEYED  = 43
+LCMGL_TEXTURE2D_CACHED = 44
+LCMGL_LIST_DEFINE      = 45
+LCMGL_LIST_CALL        = 46
 
 # text flags
 LCMGL_TEXT_DROP_SHADOW                   = 1
@@ -53,12 +76,37 @@ LCMGL_TEXT_ANCHOR_VCENTER                = 512
 LCMGL_TEXT_NORMALIZED_SCREEN_COORDINATES = 1024
 LCMGL_TEXT_MONOSPACED                    = 2048
 
-# texture constants
-LCMGL_LUMINANCE = 0
-LCMGL_RGB = 1
-LCMGL_RGBA = 2
+# texture constants, the OpenGL values as in the C client
+LCMGL_LUMINANCE = 0x1909
+LCMGL_RGB = 0x1907
+LCMGL_RGBA = 0x1908
+
+LCMGL_UNSIGNED_BYTE = 0x1401
+LCMGL_BYTE = 0x1400
+LCMGL_UNSIGNED_SHORT = 0x1403
+LCMGL_SHORT = 0x1402
+LCMGL_UNSIGNED_INT = 0x1405
+LCMGL_INT = 0x1404
+LCMGL_FLOAT = 0x1406
 
 LCMGL_COMPRESS_NONE = 0
+LCMGL_COMPRESS_ZLIB = 1
+
+_LCMGL_FORMAT_SUBPIXELS = { LCMGL_LUMINANCE : 1, LCMGL_RGB : 3,
+        LCMGL_RGBA : 4 }
+# bytes per subpixel, as lcmgl_decode.c splits rows
+_LCMGL_TYPE_SIZES = { LCMGL_UNSIGNED_BYTE : 1, LCMGL_BYTE : 1,
+        LCMGL_UNSIGNED_SHORT : 1, LCMGL_SHORT : 1, LCMGL_UNSIGNED_INT : 4,
+        LCMGL_INT : 4, LCMGL_FLOAT : 4 }
+
+# The messages of a scene that switch_buffer() split have sequence numbers
+# -1 - index, where index counts the messages of the scene from 0, and has
+# LCMGL_LAST_FRAGMENT set for the last message.  A scene sent as a single
+# message has a sequence number >= 0.
+LCMGL_LAST_FRAGMENT = 0x40000000
+
+# initial size of the buffer that the operations are encoded into
+_LCMGL_INITIAL_ALLOC = 1 << 16
 
 # redefine OpenGL constants
 GL_POINTS         = 0x0000
@@ -101,45 +149,273 @@ GL_EMISSION = 0x1600
 
 for n in range(1, 9):
     args = ", ".join(["a%d" % i for i in range(n)])
-    exec """
+    exec("""
 def _lcmgl_make_encode_%d(cmd, fmt):
     st = struct.Struct(">B%%s" %% fmt)
+    size = st.size
     def encode(self, %s):
-        self.data.write(st.pack(cmd, %s))
-        self.datalen += st.size
+        pos = self._pos
+        if pos + size > len(self.data):
+            self._grow(size)
+        st.pack_into(self.data, pos, cmd, %s)
+        self._pos = pos + size
     return encode
-""" % (n, args, args)
+""" % (n, args, args))
 
 def _lcmgl_make_encode_0(cmd):
-    data = struct.pack("B", cmd)
     def encode(self):
-        self.data.write(data)
-        self.datalen += 1
+        pos = self._pos
+        if pos == len(self.data):
+            self._grow(1)
+        self.data[pos] = cmd
+        self._pos = pos + 1
     return encode
     
+def _lcmgl_as_rows(values, ncols, name):
+    """Convert an N x ncols array, or a flat array of N * ncols values, to
+    an N x ncols numpy array of doubles."""
+    values = numpy.asarray(values, numpy.float64)
+    if values.ndim == 1:
+        values = values.reshape(-1, ncols)
+    if values.ndim != 2 or values.shape[1] != ncols:
+        raise ValueError("%s must be an N x %d array" % (name, ncols))
+    return values
+
+def _lcmgl_rows_dtype(commands):
+    """Returns the numpy dtype of the commands for one row, as encoded by
+    _lcmgl_encode_rows()."""
+    fields = []
+    for i, (cmd, fmt, values) in enumerate(commands):
+        fields.append(("cmd%d" % i, "u1"))
+        fields.append(("args%d" % i, ">" + fmt, (values.shape[1],)))
+    return numpy.dtype(fields)
+
+def _lcmgl_encode_rows(commands, buf, offset):
+    """Encode commands for each row of some arrays at once.
+
+    @param commands a list of (cmd, fmt, values) tuples, where fmt is the
+    struct format character of the arguments of cmd (e.g. "d"), and values
+    is an N x k array with the k arguments of cmd for each of N rows.
+    @param buf a bytearray to write the commands to, with room for them
+    @param offset where to write the commands in buf
+
+    Writes the commands for the first row, followed by the commands for the
+    second row, and so on, encoded as by the gl* methods.
+    """
+    records = numpy.frombuffer(buf, _lcmgl_rows_dtype(commands),
+            len(commands[0][2]), offset)
+    for i, (cmd, fmt, values) in enumerate(commands):
+        records["cmd%d" % i] = cmd
+        records["args%d" % i] = values
+
+def _lcmgl_utf8(s):
+    """Encode a string as UTF-8, unless it is bytes already."""
+    if isinstance(s, bytes):
+        return s
+    return s.encode("utf-8")
+
+def _lcmgl_list_key(client_name, list_name):
+    """Returns the key of a display list, the 64 bit FNV-1a hash of the
+    client name, a zero byte and the list name."""
+    key = 0xcbf29ce484222325
+    for c in bytearray(_lcmgl_utf8(client_name) + b"\0" +
+            _lcmgl_utf8(list_name)):
+        key = ((key ^ c) * 0x100000001b3) & 0xffffffffffffffff
+    return key
+
+class _lcmgl_list(object):
+    def __init__(self, key, version):
+        self.key = key
+        self.version = version
+        self.data = b""
+        # the scene the list was last sent in, or None
+        self.sent_scene = None
+
 class lcmgl:
-    def __init__(self, name, lcm):
+    def __init__(self, name, lcm, max_message_size=None,
+            texture_resend_interval=None, list_resend_interval=50,
+            publish_queue_size=None, drop_oldest=True):
+        """
+        @param max_message_size if given, switch_buffer() splits scenes
+        larger than this many bytes over several messages.  The renderer
+        only draws a split scene once it has all of its messages.
+        @param texture_resend_interval if given, texture2d() sends a
+        texture that didn't change since an earlier scene as a reference to
+        the earlier one, which the renderer keeps, and only sends its pixels
+        again once every texture_resend_interval scenes.
+        @param list_resend_interval the number of scenes after which a
+        display list is sent again, or 0 to send each list only once, or
+        when resend_lists() is called
+        @param publish_queue_size if given, switch_buffer() doesn't publish
+        the scene itself, but queues it for a background thread to publish,
+        so that it never waits for LCM.  At most this many scenes are
+        queued, and scenes that don't fit are dropped and counted in
+        dropped_scenes.  The textures and display lists are sent again
+        after a scene is dropped, since it may have held the only copy of
+        them.  close() publishes the queued scenes and stops the thread.
+        @param drop_oldest whether to drop the oldest queued scene when the
+        queue is full (the default), or the new scene
+        """
         self.lcm = lcm
-        self.data = StringIO.StringIO()
-        self.datalen = 0
+        self.max_message_size = max_message_size
+        self.texture_resend_interval = texture_resend_interval
+        # scenes that the textures were last sent in, by hash
+        self._textures_sent = {}
+        self.list_resend_interval = list_resend_interval
+        self._lists = {}
+        # the name of the list being recorded, and the scene's operations
+        # and texture count while it is
+        self._recording = None
+        self._scene_data = None
+        self._scene_pos = 0
+        self._scene_ntextures = 0
         self.scene = 1
         self.name = name
         self.ntextures = 0
 
-    def switch_buffer(self):
-        d = self.data.getvalue()
+        self.publish_queue_size = publish_queue_size
+        self.drop_oldest = drop_oldest
+        # scenes not published because the queue was full
+        self.dropped_scenes = 0
+        # scenes waiting for the publisher thread, each a list of messages
+        self._queue = collections.deque()
+        self._queue_cond = threading.Condition()
+        self._closed = False
+        # an exception from publishing a queued scene, raised by the next
+        # switch_buffer() or close()
+        self._publish_error = None
+        self._publish_thread = None
+        if publish_queue_size:
+            self._publish_thread = threading.Thread(target=self._publish_loop,
+                    name="lcmgl publisher")
+            self._publish_thread.daemon = True
+            self._publish_thread.start()
+
+        # The operations are encoded into self.data, which is kept from one
+        # scene to the next, after room for the header of the encoded
+        # data_t, so that switch_buffer() can publish the message without
+        # copying them.  self._pos is where the next operation goes.
+        encoded_name = _lcmgl_utf8(name)
+        self._encoded_name = encoded_name
+        self._header = struct.Struct(">8sI%dsxiii" % len(encoded_name))
+        self.data = bytearray(_LCMGL_INITIAL_ALLOC)
+        self._pos = self._header.size
+
+    def _grow(self, size):
+        """Make room for size more bytes in self.data."""
+        alloc = len(self.data)
+        while alloc < self._pos + size:
+            alloc *= 2
+        self.data.extend(bytearray(alloc - len(self.data)))
+
+    def _write(self, data):
+        pos = self._pos
+        if pos + len(data) > len(self.data):
+            self._grow(len(data))
+        self.data[pos:pos + len(data)] = data
+        self._pos = pos + len(data)
+
+    def _pack_header(self, offset, sequence, datalen):
+        """Encode the header of a data_t, up to its data, at offset in
+        self.data."""
+        self._header.pack_into(self.data, offset,
+                data_t._get_packed_fingerprint(), len(self._encoded_name) + 1,
+                self._encoded_name, self.scene, sequence, datalen)
+
+    def _send(self, messages, message):
+        """Publish a message now, or add a copy of it to the messages of a
+        scene to queue."""
+        if messages is None:
+            self.lcm.publish("LCMGL", message)
+        else:
+            messages.append(bytes(message))
+
+    def _queue_scene(self, messages):
+        with self._queue_cond:
+            dropped = len(self._queue) >= self.publish_queue_size
+            if dropped:
+                self.dropped_scenes += 1
+                if self.drop_oldest:
+                    self._queue.popleft()
+            if not dropped or self.drop_oldest:
+                self._queue.append(messages)
+                self._queue_cond.notify()
+        if dropped:
+            # The dropped scene may have held the only copy of a texture or
+            # list that the queued and later scenes refer to, so send them
+            # all again.
+            self._textures_sent.clear()
+            self.resend_lists()
+
+    def _publish_loop(self):
+        while True:
+            with self._queue_cond:
+                while not self._queue and not self._closed:
+                    self._queue_cond.wait()
+                if not self._queue:
+                    return
+                scene = self._queue.popleft()
+            try:
+                for message in scene:
+                    self.lcm.publish("LCMGL", message)
+            except Exception as e:
+                self._publish_error = e
+
+    def _raise_publish_error(self):
+        error = self._publish_error
+        if error is not None:
+            self._publish_error = None
+            raise error
+
+    def close(self):
+        """With publish_queue_size, wait for the queued scenes to be
+        published and stop the publisher thread.  switch_buffer()
+        publishes scenes itself afterwards."""
+        if self._publish_thread is None:
+            return
+        with self._queue_cond:
+            self._closed = True
+            self._queue_cond.notify()
+        self._publish_thread.join()
+        self._publish_thread = None
+        self._raise_publish_error()
 
-        msg = data_t()
-        msg.name = self.name
-        msg.scene = self.scene
-        msg.sequence = 0
-        msg.datalen = len(d)
-        msg.data = d
-        self.lcm.publish("LCMGL", msg.encode())
+    def switch_buffer(self):
+        header_size = self._header.size
+        datalen = self._pos - header_size
+        max_size = self.max_message_size
+        # the messages of the scene, if it is queued instead of published.
+        # They are copied since self.data is reused.
+        messages = None
+        if self._publish_thread is not None:
+            messages = []
+        if not max_size or datalen <= max_size:
+            self._pack_header(0, 0, datalen)
+            self._send(messages, _lcmgl_message(self.data, 0, self._pos))
+        else:
+            nfragments = (datalen + max_size - 1) // max_size
+            for i in range(nfragments):
+                index = i
+                if i == nfragments - 1:
+                    index |= LCMGL_LAST_FRAGMENT
+                # the header of each fragment goes over the end of the
+                # previous one, which was already published or copied
+                start = header_size + i * max_size
+                length = min(max_size, self._pos - start)
+                self._pack_header(start - header_size, -1 - index, length)
+                self._send(messages, _lcmgl_message(self.data,
+                    start - header_size, header_size + length))
+        if messages is not None:
+            self._queue_scene(messages)
 
         self.ntextures = 0
-        self.data = StringIO.StringIO()
+        self._pos = header_size
         self.scene += 1
+        # forget the textures that have to be sent again
+        for key, scene in list(self._textures_sent.items()):
+            if self.scene - scene >= self.texture_resend_interval:
+                del self._textures_sent[key]
+        self._raise_publish_error()
 
     glBegin        = _lcmgl_make_encode_1(LCMGL_GL_BEGIN, "I")
     glEnd          = _lcmgl_make_encode_0(LCMGL_GL_END)
@@ -178,37 +454,125 @@ class lcmgl:
     # cylinder(x, y, z, r_base, r_top, height, slices, stacks)
     cylinder       = _lcmgl_make_encode_8(LCMGL_CYLINDER, "ddddddII")
 
+    # Bulk versions of glVertex3d() and glColor*().  These take N x 3 (or
+    # N x 4 for RGBA colors) numpy arrays, or anything numpy.asarray()
+    # accepts, and encode exactly the same bytes as calling the gl* methods
+    # once per row, without the per call overhead.
+
+    def vertices3d(self, points):
+        """glVertex3d() for each row of an N x 3 array of points."""
+        if numpy is None:
+            for x, y, z in points:
+                self.glVertex3d(x, y, z)
+            return
+        points = _lcmgl_as_rows(points, 3, "points")
+        self._write_rows([ (LCMGL_GL_VERTEX3D, "d", points) ])
+
+    def colors_vertices(self, colors, points):
+        """glColor3f() or glColor4f() followed by glVertex3d() for each row
+        of an N x 3 or N x 4 array of colors and an N x 3 array of
+        points."""
+        if numpy is None:
+            for color, (x, y, z) in zip(colors, points):
+                if len(color) == 4:
+                    self.glColor4f(*color)
+                else:
+                    self.glColor3f(*color)
+                self.glVertex3d(x, y, z)
+            return
+        points = _lcmgl_as_rows(points, 3, "points")
+        colors = numpy.asarray(colors, numpy.float64)
+        if colors.ndim == 2 and colors.shape[1] == 4:
+            color_cmd = LCMGL_GL_COLOR4F
+        else:
+            colors = _lcmgl_as_rows(colors, 3, "colors")
+            color_cmd = LCMGL_GL_COLOR3F
+        if len(colors) != len(points):
+            raise ValueError("colors and points must have the same length")
+        self._write_rows([ (color_cmd, "f", colors),
+            (LCMGL_GL_VERTEX3D, "d", points) ])
+
+    def points(self, points, size=None, colors=None):
+        """Draw an N x 3 array of points as GL_POINTS, optionally of a
+        given size and with an N x 3 or N x 4 array of colors."""
+        if size is not None:
+            self.glPointSize(size)
+        self.glBegin(GL_POINTS)
+        if colors is None:
+            self.vertices3d(points)
+        else:
+            self.colors_vertices(colors, points)
+        self.glEnd()
+
+    def _write_rows(self, commands):
+        size = _lcmgl_rows_dtype(commands).itemsize * len(commands[0][2])
+        if not size:
+            return
+        if self._pos + size > len(self.data):
+            self._grow(size)
+        _lcmgl_encode_rows(commands, self.data, self._pos)
+        self._pos += size
+
     def text(self, x, y, z, text, flags = 0):
         font = 0
-        self.data.write(struct.pack(">BIIdddI", LCMGL_TEXT_LONG, font, flags, x, y, z, len(text)))
-        self.data.write(text)
-        self.datalen += 37 + len(text)
+        text = _lcmgl_utf8(text)
+        self._write(struct.pack(">BIIdddI", LCMGL_TEXT_LONG, font, flags, x, y, z, len(text)))
+        self._write(text)
+
+    def texture2d(self, data, width, height, format, compression,
+            type=LCMGL_UNSIGNED_BYTE):
+        """Create a texture, valid until switch_buffer() is called.
+
+        @param data the pixels, as a byte string of height rows without
+        padding
+        @param format LCMGL_LUMINANCE, LCMGL_RGB or LCMGL_RGBA
+        @param compression LCMGL_COMPRESS_NONE or LCMGL_COMPRESS_ZLIB
+        @param type the type of the pixel components, e.g.
+        LCMGL_UNSIGNED_BYTE
+
+        @return the texture ID
+        """
+        if format not in _LCMGL_FORMAT_SUBPIXELS:
+            raise ValueError("Invalid format")
+        if type not in _LCMGL_TYPE_SIZES:
+            raise ValueError("Invalid type")
+        if compression not in [ LCMGL_COMPRESS_NONE, LCMGL_COMPRESS_ZLIB ]:
+            raise ValueError("Invalid compression value")
+        bytes_per_row = width * _LCMGL_FORMAT_SUBPIXELS[format] * \
+                _LCMGL_TYPE_SIZES[type]
+        datalen = bytes_per_row * height
+        if len(data) != datalen:
+            raise ValueError("Expected %d bytes of texture data, got %d" % \
+                    (datalen, len(data)))
 
-    def texture2d(self, data, width, height, format, compression):
         self.ntextures += 1
         tex_id = self.ntextures
 
-        if format not in [ LCMGL_LUMINANCE, LCMGL_RGB, LCMGL_RGBA ]:
-            raise ValueError("Invalid format")
-#        bytes_per_pixel = 1
-#        if format == LCMGL_LUMINANCE:
-#            bytes_per_pixel = 1
-#        elif format == LCMGL_RGB:
-#            bytes_per_pixel = 3
-#        elif format == LCMGL_RGBA:
-#            bytes_per_pixel = 4
-#        else:
-#        bytes_per_row = width * bytes_per_pixel
-#        datalen = bytes_per_row * height
-
+        # lists are kept by the renderer anyway, so their textures aren't
+        # cached
+        if self.texture_resend_interval and self._recording is None:
+            header = struct.pack(">IIII", width, height, format, type)
+            key = struct.unpack(">Q",
+                    hashlib.md5(header + data).digest()[:8])[0]
+            if key in self._textures_sent:
+                self._write(struct.pack(">BIQ", LCMGL_TEXTURE2D_CACHED,
+                    tex_id, key))
+                return tex_id
+            self._textures_sent[key] = self.scene
+            self._write(struct.pack(">BQ", LCMGL_TEXTURE2D_KEYED, key))
+
+        self._write(struct.pack(">BIIIIIII", LCMGL_TEXTURE2D, tex_id,
+            width, height, format, type, compression, datalen))
         if compression == LCMGL_COMPRESS_NONE:
-            data_tosend = data
+            self._write(data)
         else:
-            raise ValueError("Invalid compression value")
-
-        self.data.write(struct.pack(">BIIIIII", LCMGL_TEXTURE2D, tex_id,
-            width, height, format, compression, len(data_tosend)))
-        self.data.write(data_tosend)
+            # each row is compressed on its own, as the C client does
+            for row in range(height):
+                start = row * bytes_per_row
+                compressed = zlib.compress(data[start:start + bytes_per_row],
+                        1)
+                self._write(struct.pack(">I", len(compressed)))
+                self._write(compressed)
 
         return tex_id
 
@@ -218,20 +582,77 @@ class lcmgl:
 
         if tex_id > self.ntextures or tex_id <= 0:
             raise ValueError("Invalid texture ID")
-        self.data.write(struct.pack(">BIdddddddddddd", LCMGL_TEXTURE_DRAW_QUAD,
+        self._write(struct.pack(">BIdddddddddddd", LCMGL_TEXTURE_DRAW_QUAD,
             tex_id,
             top_left_xyz[0], top_left_xyz[1], top_left_xyz[2], 
             bot_left_xyz[0], bot_left_xyz[1], bot_left_xyz[2], 
             bot_right_xyz[0], bot_right_xyz[1], bot_right_xyz[2], 
             top_right_xyz[0], top_right_xyz[1], top_right_xyz[2]))
 
+    # Display lists.  The operations between new_list() and end_list() are
+    # kept by the client instead of being added to the scene, and
+    # call_list() draws them.  A list is sent to the renderer with the
+    # first scene that draws it, and again once every list_resend_interval
+    # scenes.  Other scenes only refer to it, so that geometry that seldom
+    # changes isn't sent with every scene.
+
+    def new_list(self, name, version):
+        """Start recording a display list, replacing any earlier version.
+        Lists can't be recorded inside lists."""
+        if self._recording is not None:
+            raise ValueError("Already recording list %s" % self._recording)
+        self._lists[name] = _lcmgl_list(_lcmgl_list_key(self.name, name),
+                version)
+        self._recording = name
+        self._scene_data = self.data
+        self._scene_pos = self._pos
+        self._scene_ntextures = self.ntextures
+        self.data = bytearray(_LCMGL_INITIAL_ALLOC)
+        self._pos = 0
+        self.ntextures = 0
+
+    def end_list(self):
+        if self._recording is None:
+            raise ValueError("Not recording a list")
+        self._lists[self._recording].data = bytes(self.data[:self._pos])
+        self._recording = None
+        self.data = self._scene_data
+        self._pos = self._scene_pos
+        self.ntextures = self._scene_ntextures
+        self._scene_data = None
+
+    def has_list(self, name, version):
+        """Returns whether the list was recorded with the given version,
+        so that it doesn't have to be recorded again."""
+        dlist = self._lists.get(name)
+        return dlist is not None and name != self._recording and \
+                dlist.version == version
+
+    def call_list(self, name):
+        """Draw a recorded display list."""
+        dlist = self._lists.get(name)
+        if dlist is None or name == self._recording:
+            raise ValueError("Invalid list %s" % name)
+        if dlist.sent_scene is None or (self.list_resend_interval and
+                self.scene - dlist.sent_scene >= self.list_resend_interval):
+            self._write(struct.pack(">BQII", LCMGL_LIST_DEFINE, dlist.key,
+                dlist.version, len(dlist.data)))
+            self._write(dlist.data)
+            dlist.sent_scene = self.scene
+        self._write(struct.pack(">BQI", LCMGL_LIST_CALL, dlist.key,
+            dlist.version))
+
+    def resend_lists(self):
+        """Send every display list again the next time it is drawn."""
+        for dlist in self._lists.values():
+            dlist.sent_scene = None
+
 
 if __name__ == "__main__":
-    import array
     import math
     import lcm
     lcm = lcm.LCM()
-    a = array.array('B')
+    a = bytearray()
     width = 100
     height = 100
     g = lcmgl('lcmgl_texture', lcm)
@@ -239,9 +660,9 @@ if __name__ == "__main__":
         for x in range(width):
             v = math.sin(x / 5.) + math.cos(y / 5.)
             a.append(int(v * 50 + 127))
-    img_data = a.tostring()
-    print len(img_data)
-    tex_id = g.texture2d(img_data, width, height, LCMGL_LUMINANCE, LCMGL_COMPRESS_NONE)
+    img_data = bytes(a)
+    print(len(img_data))
+    tex_id = g.texture2d(img_data, width, height, LCMGL_LUMINANCE, LCMGL_COMPRESS_ZLIB)
     g.glColor3f(0, 0, 1)
     g.textureDrawQuad(tex_id, 
             (-10, 10, 0),
@@ -7,6 +7,7 @@
 #include <time.h>
 #include <sys/time.h>
 #include <zlib.h> //for texture compression //TODO: is this portable?
+#include <glib.h>
 
 #include "lcmtypes/bot_lcmgl_data_t.h"
 
@@ -43,12 +44,44 @@ struct lcmgl
 
     int32_t scene;
     int32_t sequence;
+    int     max_message_size;
 
     uint8_t *data;
     int     datalen;
     int     data_alloc;
 
     uint32_t texture_count;
+
+    // hashes of the textures whose pixels were sent, and the scenes they
+    // were last sent in
+    int texture_resend_interval;
+    int ntextures_sent;
+    uint64_t *textures_sent_keys;
+    int32_t *textures_sent_scenes;
+
+    // display lists, see bot_lcmgl_new_list
+    int list_resend_interval;
+    int nlists;
+    struct lcmgl_list *lists;
+    // the list being recorded, if any, and the scene's operations and
+    // texture count while it is
+    struct lcmgl_list *recording;
+    uint8_t *scene_data;
+    int     scene_datalen;
+    int     scene_data_alloc;
+    uint32_t scene_texture_count;
+};
+
+struct lcmgl_list
+{
+    char *name;
+    uint64_t key;
+    int version;
+    uint8_t *data;
+    int datalen;
+    // whether the list was sent, and the scene it was last sent in
+    int sent;
+    int32_t sent_scene;
 };
 
 union bot_lcmgl_bytefloat
@@ -70,6 +103,8 @@ static inline void ensure_space(bot_lcmgl_t *lcmgl, int needed)
 
     // grow our buffer.
     int new_alloc = lcmgl->data_alloc * 2;
+    while (lcmgl->datalen + needed >= new_alloc)
+        new_alloc *= 2;
     lcmgl->data = realloc(lcmgl->data, new_alloc);
     lcmgl->data_alloc = new_alloc;
 }
@@ -139,17 +174,49 @@ void bot_lcmgl_switch_buffer(bot_lcmgl_t *lcmgl)
 
     ld.name     = lcmgl->name;
     ld.scene    = lcmgl->scene;
-    ld.sequence = lcmgl->sequence;
-    ld.datalen  = lcmgl->datalen;
-    ld.data     = lcmgl->data;
 
-    bot_lcmgl_data_t_publish(lcmgl->lcm, lcmgl->channel_name, &ld);
+    int max_size = lcmgl->max_message_size;
+    if (max_size <= 0 || lcmgl->datalen <= max_size) {
+        ld.sequence = lcmgl->sequence;
+        ld.datalen  = lcmgl->datalen;
+        ld.data     = lcmgl->data;
+
+        bot_lcmgl_data_t_publish(lcmgl->lcm, lcmgl->channel_name, &ld);
+    } else {
+        // split the scene, numbering the messages as described at
+        // BOT_LCMGL_LAST_FRAGMENT
+        int nfragments = (lcmgl->datalen + max_size - 1) / max_size;
+        for (int i = 0; i < nfragments; i++) {
+            int index = i;
+            ld.datalen = max_size;
+            if (i == nfragments - 1) {
+                index |= BOT_LCMGL_LAST_FRAGMENT;
+                ld.datalen = lcmgl->datalen - i * max_size;
+            }
+            ld.sequence = -1 - index;
+            ld.data     = lcmgl->data + i * max_size;
+
+            bot_lcmgl_data_t_publish(lcmgl->lcm, lcmgl->channel_name, &ld);
+        }
+    }
 
     lcmgl->sequence = 0;
     lcmgl->datalen = 0;
 
     lcmgl->texture_count = 0;
 
+    // forget the textures that have to be sent again in the next scene
+    int nkept = 0;
+    for (int i = 0; i < lcmgl->ntextures_sent; i++) {
+        if (lcmgl->scene + 1 - lcmgl->textures_sent_scenes[i] <
+                lcmgl->texture_resend_interval) {
+            lcmgl->textures_sent_keys[nkept] = lcmgl->textures_sent_keys[i];
+            lcmgl->textures_sent_scenes[nkept] = lcmgl->textures_sent_scenes[i];
+            nkept++;
+        }
+    }
+    lcmgl->ntextures_sent = nkept;
+
     lcmgl->scene++;
 }
 
@@ -167,15 +234,36 @@ bot_lcmgl_t *bot_lcmgl_init(lcm_t *lcm, const char *name)
 
     lcmgl->texture_count = 0;
 
+    lcmgl->list_resend_interval = 50;
+
     // XXX sanitize BOT_LCMGL channel name?
     snprintf(lcmgl->channel_name, 128, "LCMGL_%s", lcmgl->name);
 
     return lcmgl;
 }
 
+void bot_lcmgl_set_max_message_size(bot_lcmgl_t *lcmgl, int max_message_size)
+{
+    lcmgl->max_message_size = max_message_size;
+}
+
+void bot_lcmgl_set_texture_resend_interval(bot_lcmgl_t *lcmgl, int scenes)
+{
+    lcmgl->texture_resend_interval = scenes;
+}
+
 void bot_lcmgl_destroy (bot_lcmgl_t *lcmgl)
 {
     free (lcmgl->data);
+    free (lcmgl->textures_sent_keys);
+    free (lcmgl->textures_sent_scenes);
+    for (int i = 0; i < lcmgl->nlists; i++) {
+        free (lcmgl->lists[i].name);
+        free (lcmgl->lists[i].data);
+    }
+    free (lcmgl->lists);
+    if (lcmgl->recording)
+        free (lcmgl->scene_data);
     memset (lcmgl->name, 0, strlen (lcmgl->name));
     free (lcmgl->name);
     free (lcmgl->channel_name);
@@ -634,6 +722,71 @@ void bot_lcmgl_scale_to_viewer_ar(bot_lcmgl_t *lcmgl){
 
 // texture API
 
+// 64 bit FNV-1a hash
+static uint64_t
+_fnv_hash(uint64_t hash, const void *data, int datalen)
+{
+    const uint8_t *p = (const uint8_t*) data;
+    for (int i = 0; i < datalen; i++) {
+        hash ^= p[i];
+        hash *= 0x100000001b3ULL;
+    }
+    return hash;
+}
+
+// The same key as the Python and Java clients compute, so that the
+// renderer's texture cache is shared by all of them: the first 8 bytes of the
+// MD5 digest of the big-endian width, height, format and type, followed by
+// the pixels.
+static uint64_t
+_texture_key(const void *data, int width, int height, int row_stride,
+        int bytes_per_row, bot_lcmgl_texture_format_t format,
+        bot_lcmgl_texture_type_t type)
+{
+    uint32_t values[4] = { width, height, format, type };
+    uint8_t header[sizeof(values)];
+    for (int i = 0; i < 4; i++) {
+        header[i*4]   = values[i] >> 24;
+        header[i*4+1] = values[i] >> 16;
+        header[i*4+2] = values[i] >> 8;
+        header[i*4+3] = values[i];
+    }
+    GChecksum *md5 = g_checksum_new(G_CHECKSUM_MD5);
+    g_checksum_update(md5, header, sizeof(header));
+    for(int row=0; row<height; row++)
+        g_checksum_update(md5, (const guchar*)data + row * row_stride,
+                bytes_per_row);
+    guint8 digest[16];
+    gsize digest_len = sizeof(digest);
+    g_checksum_get_digest(md5, digest, &digest_len);
+    g_checksum_free(md5);
+
+    uint64_t key = 0;
+    for (int i = 0; i < 8; i++)
+        key = (key << 8) | digest[i];
+    return key;
+}
+
+// Returns 1 if the pixels of the texture with the given hash don't have to
+// be sent in this scene, and otherwise records that they are sent.
+static int
+_texture_was_sent(bot_lcmgl_t *lcmgl, uint64_t key)
+{
+    for (int i = 0; i < lcmgl->ntextures_sent; i++) {
+        if (lcmgl->textures_sent_keys[i] == key)
+            return 1;
+    }
+    int n = lcmgl->ntextures_sent + 1;
+    lcmgl->textures_sent_keys = realloc(lcmgl->textures_sent_keys,
+            n * sizeof(uint64_t));
+    lcmgl->textures_sent_scenes = realloc(lcmgl->textures_sent_scenes,
+            n * sizeof(int32_t));
+    lcmgl->textures_sent_keys[n-1] = key;
+    lcmgl->textures_sent_scenes[n-1] = lcmgl->scene;
+    lcmgl->ntextures_sent = n;
+    return 0;
+}
+
 int 
 bot_lcmgl_texture2d(bot_lcmgl_t *lcmgl, const void *data, 
         int width, int height, int row_stride,
@@ -641,13 +794,9 @@ bot_lcmgl_texture2d(bot_lcmgl_t *lcmgl, const void *data,
         bot_lcmgl_texture_type_t type,
         bot_lcmgl_compress_mode_t compression)
 {
-    bot_lcmgl_encode_u8(lcmgl, BOT_LCMGL_TEX_2D);
-
     uint32_t tex_id = lcmgl->texture_count + 1;
     lcmgl->texture_count ++;
 
-    bot_lcmgl_encode_u32(lcmgl, tex_id);
-
     int subpix_per_pixel = 1;
     switch(format) {
         case BOT_LCMGL_LUMINANCE:
@@ -681,6 +830,22 @@ bot_lcmgl_texture2d(bot_lcmgl_t *lcmgl, const void *data,
     int bytes_per_row = width * subpix_per_pixel * bytes_per_subpixel;
     int datalen = bytes_per_row * height;
 
+    // lists are kept by the renderer anyway, so their textures aren't cached
+    if (lcmgl->texture_resend_interval > 0 && !lcmgl->recording) {
+        uint64_t key = _texture_key(data, width, height, row_stride,
+                bytes_per_row, format, type);
+        if (_texture_was_sent(lcmgl, key)) {
+            bot_lcmgl_encode_u8(lcmgl, BOT_LCMGL_TEX_2D_CACHED);
+            bot_lcmgl_encode_u32(lcmgl, tex_id);
+            bot_lcmgl_encode_u64(lcmgl, key);
+            return tex_id;
+        }
+        bot_lcmgl_encode_u8(lcmgl, BOT_LCMGL_TEX_2D_KEYED);
+        bot_lcmgl_encode_u64(lcmgl, key);
+    }
+    bot_lcmgl_encode_u8(lcmgl, BOT_LCMGL_TEX_2D);
+    bot_lcmgl_encode_u32(lcmgl, tex_id);
+
     bot_lcmgl_encode_u32(lcmgl, width);
     bot_lcmgl_encode_u32(lcmgl, height);
     bot_lcmgl_encode_u32(lcmgl, format);
@@ -757,3 +922,118 @@ bot_lcmgl_texture_draw_quad(bot_lcmgl_t *lcmgl, int texture_id,
     bot_lcmgl_encode_double(lcmgl, y_top_right);
     bot_lcmgl_encode_double(lcmgl, z_top_right);
 }
+
+// display list API
+
+static struct lcmgl_list *
+_find_list(bot_lcmgl_t *lcmgl, const char *name)
+{
+    for (int i = 0; i < lcmgl->nlists; i++) {
+        if (!strcmp(lcmgl->lists[i].name, name))
+            return &lcmgl->lists[i];
+    }
+    return NULL;
+}
+
+void
+bot_lcmgl_new_list(bot_lcmgl_t *lcmgl, const char *name, int version)
+{
+    if (lcmgl->recording) {
+        fprintf(stderr, "%s -- WARNING: already recording a list\n", __FUNCTION__);
+        return;
+    }
+
+    struct lcmgl_list *list = _find_list(lcmgl, name);
+    if (!list) {
+        lcmgl->nlists++;
+        lcmgl->lists = realloc(lcmgl->lists,
+                lcmgl->nlists * sizeof(struct lcmgl_list));
+        list = &lcmgl->lists[lcmgl->nlists-1];
+        memset(list, 0, sizeof(struct lcmgl_list));
+        list->name = strdup(name);
+        uint8_t zero = 0;
+        list->key = _fnv_hash(0xcbf29ce484222325ULL, lcmgl->name,
+                strlen(lcmgl->name));
+        list->key = _fnv_hash(list->key, &zero, 1);
+        list->key = _fnv_hash(list->key, name, strlen(name));
+    }
+    free(list->data);
+    list->data = NULL;
+    list->datalen = 0;
+    list->version = version;
+    list->sent = 0;
+
+    // record into a buffer of its own
+    lcmgl->recording = list;
+    lcmgl->scene_data = lcmgl->data;
+    lcmgl->scene_datalen = lcmgl->datalen;
+    lcmgl->scene_data_alloc = lcmgl->data_alloc;
+    lcmgl->scene_texture_count = lcmgl->texture_count;
+    lcmgl->data_alloc = 1024;
+    lcmgl->data = malloc(lcmgl->data_alloc);
+    lcmgl->datalen = 0;
+    lcmgl->texture_count = 0;
+}
+
+void
+bot_lcmgl_end_list(bot_lcmgl_t *lcmgl)
+{
+    struct lcmgl_list *list = lcmgl->recording;
+    if (!list) {
+        fprintf(stderr, "%s -- WARNING: not recording a list\n", __FUNCTION__);
+        return;
+    }
+    list->data = lcmgl->data;
+    list->datalen = lcmgl->datalen;
+
+    lcmgl->recording = NULL;
+    lcmgl->data = lcmgl->scene_data;
+    lcmgl->datalen = lcmgl->scene_datalen;
+    lcmgl->data_alloc = lcmgl->scene_data_alloc;
+    lcmgl->texture_count = lcmgl->scene_texture_count;
+}
+
+int
+bot_lcmgl_has_list(bot_lcmgl_t *lcmgl, const char *name, int version)
+{
+    struct lcmgl_list *list = _find_list(lcmgl, name);
+    return list && list != lcmgl->recording && list->version == version;
+}
+
+void
+bot_lcmgl_call_list(bot_lcmgl_t *lcmgl, const char *name)
+{
+    struct lcmgl_list *list = _find_list(lcmgl, name);
+    if (!list || list == lcmgl->recording) {
+        fprintf(stderr, "%s -- WARNING: invalid list %s\n", __FUNCTION__, name);
+        return;
+    }
+
+    if (!list->sent || (lcmgl->list_resend_interval > 0 &&
+            lcmgl->scene - list->sent_scene >= lcmgl->list_resend_interval)) {
+        bot_lcmgl_encode_u8(lcmgl, BOT_LCMGL_LIST_DEFINE);
+        bot_lcmgl_encode_u64(lcmgl, list->key);
+        bot_lcmgl_encode_u32(lcmgl, list->version);
+        bot_lcmgl_encode_u32(lcmgl, list->datalen);
+        bot_lcmgl_encode_raw(lcmgl, list->datalen, list->data);
+        list->sent = 1;
+        list->sent_scene = lcmgl->scene;
+    }
+
+    bot_lcmgl_encode_u8(lcmgl, BOT_LCMGL_LIST_CALL);
+    bot_lcmgl_encode_u64(lcmgl, list->key);
+    bot_lcmgl_encode_u32(lcmgl, list->version);
+}
+
+void
+bot_lcmgl_set_list_resend_interval(bot_lcmgl_t *lcmgl, int scenes)
+{
+    lcmgl->list_resend_interval = scenes;
+}
+
+void
+bot_lcmgl_resend_lists(bot_lcmgl_t *lcmgl)
+{
+    for (int i = 0; i < lcmgl->nlists; i++)
+        lcmgl->lists[i].sent = 0;
+}
@@ -47,6 +47,18 @@ void bot_lcmgl_destroy(bot_lcmgl_t *lcmgl);
  */
 void bot_lcmgl_switch_buffer(bot_lcmgl_t *lcmgl);
 
+/**
+ * bot_lcmgl_set_max_message_size:
+ *
+ * Makes bot_lcmgl_switch_buffer split scenes with more than
+ * @max_message_size bytes of queued operations over several messages, so
+ * that large scenes aren't sent as one huge message, which is easily lost
+ * over UDP multicast.  The renderer only draws a split scene once it has
+ * received all of its messages.  The default, 0, sends every scene as one
+ * message.
+ */
+void bot_lcmgl_set_max_message_size(bot_lcmgl_t *lcmgl, int max_message_size);
+
 /* ================ OpenGL functions ===========
  *
  * These functions map directly to the OpenGL API, and all arguments should
@@ -306,6 +318,18 @@ int bot_lcmgl_texture2d(bot_lcmgl_t *lcmgl, const void *data,
         bot_lcmgl_texture_type_t type,
         bot_lcmgl_compress_mode_t compression);
 
+/**
+ * bot_lcmgl_set_texture_resend_interval:
+ *
+ * Makes bot_lcmgl_texture2d send a texture whose contents didn't change
+ * since an earlier scene as a reference to the earlier one, which the
+ * renderer keeps, instead of sending all of its pixels again.  The pixels
+ * are sent again once every @scenes scenes, for renderers that started
+ * later or lost the message.  The default, 0, sends the pixels of every
+ * texture in every scene.
+ */
+void bot_lcmgl_set_texture_resend_interval(bot_lcmgl_t *lcmgl, int scenes);
+
 /**
  * Renders the specified texture with the active OpenGL color.
  */
@@ -315,8 +339,70 @@ void bot_lcmgl_texture_draw_quad(bot_lcmgl_t *lcmgl, int texture_id,
         double x_bot_right, double y_bot_right, double z_bot_right,
         double x_top_right, double y_top_right, double z_top_right);
 
+// display list API
+
+/**
+ * bot_lcmgl_new_list:
+ *
+ * Starts recording a named display list.  The operations up to
+ * bot_lcmgl_end_list are kept by the client instead of being added to the
+ * scene.  The list is drawn by bot_lcmgl_call_list, which sends it to the
+ * renderer once and then only refers to it, so that geometry that seldom
+ * changes isn't sent with every scene.  Recording a list again with a new
+ * @version replaces it.  Lists can't be recorded inside lists.
+ */
+void bot_lcmgl_new_list(bot_lcmgl_t *lcmgl, const char *name, int version);
+
+/**
+ * bot_lcmgl_end_list:
+ *
+ * Ends the recording started by bot_lcmgl_new_list.
+ */
+void bot_lcmgl_end_list(bot_lcmgl_t *lcmgl);
+
+/**
+ * bot_lcmgl_has_list:
+ *
+ * @return: 1 if the client has recorded the list with the given @version,
+ * so that it doesn't have to be recorded again, otherwise 0.
+ */
+int bot_lcmgl_has_list(bot_lcmgl_t *lcmgl, const char *name, int version);
+
+/**
+ * bot_lcmgl_call_list:
+ *
+ * Draws a recorded display list.  The list itself is sent with the first
+ * scene that draws it, and again once every list resend interval scenes
+ * for renderers that started later or lost the message.
+ */
+void bot_lcmgl_call_list(bot_lcmgl_t *lcmgl, const char *name);
+
+/**
+ * bot_lcmgl_set_list_resend_interval:
+ *
+ * Sets the number of scenes after which a display list is sent again.  0
+ * sends each list only once, or when bot_lcmgl_resend_lists is called.  The
+ * default is 50.
+ */
+void bot_lcmgl_set_list_resend_interval(bot_lcmgl_t *lcmgl, int scenes);
+
+/**
+ * bot_lcmgl_resend_lists:
+ *
+ * Sends every display list again the next time it is drawn.
+ */
+void bot_lcmgl_resend_lists(bot_lcmgl_t *lcmgl);
+
 /* ======================== */
 
+/*
+ * The messages of a scene that was split by bot_lcmgl_switch_buffer have
+ * sequence numbers -1 - index, where index counts the messages of the scene
+ * from 0, and has BOT_LCMGL_LAST_FRAGMENT set for the last message.  A scene
+ * sent as a single message has a sequence number >= 0.
+ */
+#define BOT_LCMGL_LAST_FRAGMENT 0x40000000
+
 enum _bot_lcmgl_enum_t 
 {
     BOT_LCMGL_BEGIN=4,
@@ -357,7 +443,21 @@ enum _bot_lcmgl_enum_t
     BOT_LCMGL_CYLINDER,
     BOT_LCMGL_MATRIX_MODE,
     BOT_LCMGL_ORTHO,
-    BOT_LCMGL_SCALE_TO_VIEWER_AR
+    BOT_LCMGL_SCALE_TO_VIEWER_AR,
+    // followed by a 64 bit hash of the texture contents and a whole
+    // BOT_LCMGL_TEX_2D command.  The renderer keeps the texture under the hash.
+    // The hash is the first 8 bytes of the MD5 digest of the big-endian 32
+    // bit width, height, format and type, followed by the pixels.
+    BOT_LCMGL_TEX_2D_KEYED,
+    // a texture ID followed by the hash of a texture that was sent with
+    // BOT_LCMGL_TEX_2D_KEYED in this or an earlier scene
+    BOT_LCMGL_TEX_2D_CACHED,
+    // followed by a 64 bit key, a 32 bit version, and the length and
+    // operations of a display list.  The key is the 64 bit FNV-1a hash of
+    // the client name, a zero byte and the list name.
+    BOT_LCMGL_LIST_DEFINE,
+    // followed by the key and version of a display list to draw
+    BOT_LCMGL_LIST_CALL
 };
 
 /**
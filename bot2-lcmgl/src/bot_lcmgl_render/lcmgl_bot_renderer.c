@@ -1,17 +1,33 @@
+#include <limits.h>
+#include <string.h>
+
 #include <lcm/lcm.h>
 
 #include <bot_core/bot_core.h>
 #include <bot_vis/bot_vis.h>
 #include <lcmtypes/bot_lcmgl_data_t.h>
 
+#include "../bot_lcmgl_client/lcmgl.h"
 #include "lcmgl_decode.h"
 #include "lcmgl_bot_renderer.h"
 
+// messages of a split scene with a larger index are dropped, so that a
+// corrupt or hostile message can't make the renderer allocate its fragment
+// array for up to 2^30 messages
+#define MAX_FRAGMENT_INDEX 65535
+
 typedef struct
 {
     GPtrArray *backbuffer;
     GPtrArray *frontbuffer;
     int enabled;
+
+    // messages received so far of a scene that was split over several
+    // messages, by index.  See BOT_LCMGL_LAST_FRAGMENT.
+    GPtrArray *fragments;
+    int32_t fragment_scene;
+    // number of messages in the scene, or 0 until the last one arrives
+    int nfragments;
 } lcmgl_channel_t;
 
 typedef struct _BotLcmglRenderer {
@@ -63,6 +79,70 @@ static void my_draw( BotViewer *viewer, BotRenderer *renderer )
     g_list_free (keys);
 }
 
+static void clear_fragments(lcmgl_channel_t *chan)
+{
+    for (int i = 0; i < chan->fragments->len; i++) {
+        bot_lcmgl_data_t *fragment = g_ptr_array_index(chan->fragments, i);
+        if (fragment)
+            bot_lcmgl_data_t_destroy(fragment);
+    }
+    g_ptr_array_set_size(chan->fragments, 0);
+    chan->nfragments = 0;
+}
+
+// Adds a message of a split scene.  Returns the whole scene once all of its
+// messages have been received, or NULL.
+static bot_lcmgl_data_t *add_fragment(lcmgl_channel_t *chan,
+        const bot_lcmgl_data_t *msg)
+{
+    int index = -1 - msg->sequence;
+    int last = index & BOT_LCMGL_LAST_FRAGMENT;
+    index &= ~BOT_LCMGL_LAST_FRAGMENT;
+    if (index > MAX_FRAGMENT_INDEX)
+        return NULL;
+
+    // a message of another scene, so the one being received is incomplete.
+    // The scene number going backwards most likely means that the client
+    // was restarted, so the older scene isn't kept waiting for the rest of
+    // its messages either.
+    if (chan->fragments->len && chan->fragment_scene != msg->scene)
+        clear_fragments(chan);
+    chan->fragment_scene = msg->scene;
+
+    if (index >= chan->fragments->len)
+        g_ptr_array_set_size(chan->fragments, index + 1);
+    if (g_ptr_array_index(chan->fragments, index))
+        return NULL;
+    g_ptr_array_index(chan->fragments, index) = bot_lcmgl_data_t_copy(msg);
+    if (last)
+        chan->nfragments = index + 1;
+
+    if (!chan->nfragments || chan->fragments->len != chan->nfragments)
+        return NULL;
+    int datalen = 0;
+    for (int i = 0; i < chan->nfragments; i++) {
+        bot_lcmgl_data_t *fragment = g_ptr_array_index(chan->fragments, i);
+        if (!fragment || fragment->datalen > INT_MAX - datalen)
+            return NULL;
+        datalen += fragment->datalen;
+    }
+
+    bot_lcmgl_data_t *scene =
+        (bot_lcmgl_data_t*) calloc(1, sizeof(bot_lcmgl_data_t));
+    scene->name = strdup(msg->name);
+    scene->scene = msg->scene;
+    scene->datalen = datalen;
+    scene->data = (uint8_t*) malloc(datalen);
+    int pos = 0;
+    for (int i = 0; i < chan->nfragments; i++) {
+        bot_lcmgl_data_t *fragment = g_ptr_array_index(chan->fragments, i);
+        memcpy(scene->data + pos, fragment->data, fragment->datalen);
+        pos += fragment->datalen;
+    }
+    clear_fragments(chan);
+    return scene;
+}
+
 static void on_lcmgl_data (const lcm_recv_buf_t *rbuf, const char *channel,
         const bot_lcmgl_data_t *_msg, void *user_data )
 {
@@ -75,6 +155,7 @@ static void on_lcmgl_data (const lcm_recv_buf_t *rbuf, const char *channel,
         chan->enabled=1;
         //chan->backbuffer = g_ptr_array_new();
         chan->frontbuffer = g_ptr_array_new();
+        chan->fragments = g_ptr_array_new();
         g_hash_table_insert(self->channels, strdup(_msg->name), chan);
         bot_gtk_param_widget_add_booleans (self->pw,
                 0, strdup(_msg->name), 1, NULL);
@@ -104,10 +185,26 @@ static void on_lcmgl_data (const lcm_recv_buf_t *rbuf, const char *channel,
     }
 #endif
 
+    bot_lcmgl_data_t *scene;
+    if (_msg->sequence >= 0) {
+        // a whole scene replaces any split scene being received
+        clear_fragments(chan);
+        scene = bot_lcmgl_data_t_copy(_msg);
+    } else {
+        // never draw part of a split scene
+        scene = add_fragment(chan, _msg);
+        if (!scene)
+            return;
+    }
+    // scenes may be replaced before they are drawn, or never be drawn if
+    // the channel is disabled, so register their display lists and keep
+    // their textures right away
+    bot_lcmgl_receive(scene->data, scene->datalen);
+
     for (int i = 0; i < chan->frontbuffer->len; i++)
         bot_lcmgl_data_t_destroy(g_ptr_array_index(chan->frontbuffer, i));
     g_ptr_array_set_size (chan->frontbuffer, 0);
-    g_ptr_array_add(chan->frontbuffer, bot_lcmgl_data_t_copy(_msg));
+    g_ptr_array_add(chan->frontbuffer, scene);
     bot_viewer_request_redraw( self->viewer );
 }
 
@@ -142,7 +239,7 @@ static void on_clear_button(GtkWidget *button, BotLcmglRenderer *self)
         for (int i = 0; i < chan->frontbuffer->len; i++)
             bot_lcmgl_data_t_destroy(g_ptr_array_index(chan->frontbuffer, i));
         g_ptr_array_set_size(chan->frontbuffer, 0);
-
+        clear_fragments(chan);
     }
     g_list_free(keys);
 
@@ -138,14 +138,483 @@ static void gl_box(double xyz[3], double dim[3])
     glEnd();
 }
 
+// Skips the part of a BOT_LCMGL_TEX_2D command after the texture ID.
+// Returns -1 if the data ends before the texture does.
+static int _skip_texture(lcmgl_decoder_t *ldec)
+{
+    if (ldec->datalen - ldec->datapos < 24)
+        return -1;
+    lcmgl_decode_u32(ldec); // width
+    uint32_t height = lcmgl_decode_u32(ldec);
+    ldec->datapos += 8; // format, type
+    uint32_t compression = lcmgl_decode_u32(ldec);
+    uint32_t raw_datalen = lcmgl_decode_u32(ldec);
+    if (compression == BOT_LCMGL_COMPRESS_ZLIB) {
+        for (int row = 0; row < height; row++) {
+            if (ldec->datalen - ldec->datapos < 4)
+                return -1;
+            uint32_t compressed_size = lcmgl_decode_u32(ldec);
+            if (ldec->datalen - ldec->datapos < compressed_size)
+                return -1;
+            ldec->datapos += compressed_size;
+        }
+    } else {
+        if (ldec->datalen - ldec->datapos < raw_datalen)
+            return -1;
+        ldec->datapos += raw_datalen;
+    }
+    return 0;
+}
+
 #ifdef USE_BOT_VIS
 typedef struct {
     int lcmgl_tex_id;
     BotGlTexture *tex;
+    // whether tex belongs to the texture cache instead of the scene
+    int cached;
 } _lcmgl_texture_t;
+
+// Textures sent with BOT_LCMGL_TEX_2D_KEYED, by the hash of their contents.
+// They are kept across scenes and redraws, so that an unchanged texture is
+// neither sent nor uploaded again.
+typedef struct {
+    uint64_t key;
+    BotGlTexture *tex;
+    int size;
+    // _texture_cache_clock when the texture was last used
+    uint64_t last_used;
+} _lcmgl_cached_texture_t;
+
+#define TEXTURE_CACHE_MAX_SIZE (256 * 1024 * 1024)
+
+static _lcmgl_cached_texture_t *_texture_cache = NULL;
+static int _texture_cache_len = 0;
+static int _texture_cache_size = 0;
+// counts the calls to bot_lcmgl_decode
+static uint64_t _texture_cache_clock = 0;
+
+static int _texture_cache_index(uint64_t key)
+{
+    for (int i = 0; i < _texture_cache_len; i++) {
+        if (_texture_cache[i].key == key)
+            return i;
+    }
+    return -1;
+}
+
+static _lcmgl_cached_texture_t *_texture_cache_find(uint64_t key)
+{
+    int i = _texture_cache_index(key);
+    if (i < 0)
+        return NULL;
+    _texture_cache[i].last_used = _texture_cache_clock;
+    return &_texture_cache[i];
+}
+
+// Adds a texture to the cache, first removing the least recently used
+// textures, other than the ones used by the data being decoded, to keep the
+// cache within TEXTURE_CACHE_MAX_SIZE.
+static void _texture_cache_add(uint64_t key, BotGlTexture *tex, int size)
+{
+    while (_texture_cache_size + size > TEXTURE_CACHE_MAX_SIZE) {
+        int oldest = -1;
+        for (int i = 0; i < _texture_cache_len; i++) {
+            if (_texture_cache[i].last_used != _texture_cache_clock &&
+                    (oldest < 0 || _texture_cache[i].last_used <
+                     _texture_cache[oldest].last_used))
+                oldest = i;
+        }
+        if (oldest < 0)
+            break;
+        bot_gl_texture_free(_texture_cache[oldest].tex);
+        _texture_cache_size -= _texture_cache[oldest].size;
+        _texture_cache[oldest] = _texture_cache[--_texture_cache_len];
+    }
+
+    _texture_cache_len++;
+    _texture_cache = realloc(_texture_cache,
+            _texture_cache_len * sizeof(_lcmgl_cached_texture_t));
+    _lcmgl_cached_texture_t *entry = &_texture_cache[_texture_cache_len-1];
+    entry->key = key;
+    entry->tex = tex;
+    entry->size = size;
+    entry->last_used = _texture_cache_clock;
+    _texture_cache_size += size;
+}
+
+// Textures sent with BOT_LCMGL_TEX_2D_KEYED that aren't in the texture cache
+// yet, copied by bot_lcmgl_receive from the data received, oldest first.
+// The scene that sent a texture may never be drawn, so a texture is kept
+// here until a scene that uses it is drawn, which uploads it to the cache.
+typedef struct {
+    uint64_t key;
+    // the BOT_LCMGL_TEX_2D command after the texture ID
+    uint8_t *data;
+    int datalen;
+} _lcmgl_pending_texture_t;
+
+#define PENDING_TEXTURES_MAX_SIZE (64 * 1024 * 1024)
+
+static _lcmgl_pending_texture_t *_pending_textures = NULL;
+static int _npending_textures = 0;
+static int _pending_textures_size = 0;
+
+static int _pending_texture_index(uint64_t key)
+{
+    for (int i = 0; i < _npending_textures; i++) {
+        if (_pending_textures[i].key == key)
+            return i;
+    }
+    return -1;
+}
+
+static void _pending_texture_remove(int i)
+{
+    free(_pending_textures[i].data);
+    _pending_textures_size -= _pending_textures[i].datalen;
+    _npending_textures--;
+    memmove(&_pending_textures[i], &_pending_textures[i+1],
+            (_npending_textures - i) * sizeof(_lcmgl_pending_texture_t));
+}
+
+// Keeps a copy of a texture, first removing the oldest textures to keep the
+// pending textures within PENDING_TEXTURES_MAX_SIZE.
+static void _pending_texture_add(uint64_t key, const uint8_t *data,
+        int datalen)
+{
+    if (datalen > PENDING_TEXTURES_MAX_SIZE)
+        return;
+    while (_pending_textures_size + datalen > PENDING_TEXTURES_MAX_SIZE)
+        _pending_texture_remove(0);
+
+    _npending_textures++;
+    _pending_textures = realloc(_pending_textures,
+            _npending_textures * sizeof(_lcmgl_pending_texture_t));
+    _lcmgl_pending_texture_t *entry = &_pending_textures[_npending_textures-1];
+    entry->key = key;
+    entry->data = malloc(datalen ? datalen : 1);
+    memcpy(entry->data, data, datalen);
+    entry->datalen = datalen;
+    _pending_textures_size += datalen;
+}
+
+// Decodes the part of a BOT_LCMGL_TEX_2D command after the texture ID, and
+// returns the texture.  Sets *size to the size of the pixels.
+static BotGlTexture *_decode_texture(lcmgl_decoder_t *ldec, int *size)
+{
+    uint32_t width = lcmgl_decode_u32(ldec);
+    uint32_t height = lcmgl_decode_u32(ldec);
+    uint32_t format = lcmgl_decode_u32(ldec);
+    uint32_t type = lcmgl_decode_u32(ldec);
+
+    int subpix_per_pixel = 1;
+    GLenum gl_format = format;
+    switch(format) {
+        case BOT_LCMGL_LUMINANCE:
+            subpix_per_pixel = 1;
+            break;
+        case BOT_LCMGL_RGB:
+            subpix_per_pixel = 3;
+            break;
+        case BOT_LCMGL_RGBA:
+            subpix_per_pixel = 4;
+            break;
+    }
+
+    GLenum gl_type = type;
+    int bytes_per_subpixel = 1;
+    switch (type) {
+          case BOT_LCMGL_UNSIGNED_BYTE:
+          case BOT_LCMGL_BYTE:
+              bytes_per_subpixel = 1;
+              break;
+          case BOT_LCMGL_UNSIGNED_SHORT:
+          case BOT_LCMGL_SHORT:
+              bytes_per_subpixel = 1;
+              break;
+          case BOT_LCMGL_UNSIGNED_INT:
+          case BOT_LCMGL_INT:
+          case BOT_LCMGL_FLOAT:
+              bytes_per_subpixel = 4;
+              break;
+    }
+
+
+    int bytes_per_row = width * subpix_per_pixel * bytes_per_subpixel;
+    int max_data_size = height * bytes_per_row;
+
+
+    *size = max_data_size;
+    int compression = lcmgl_decode_u32(ldec);
+    int raw_datalen = lcmgl_decode_u32(ldec);
+
+    void *data_uncompressed = NULL;
+    int free_uncompressed_data = 0;
+    switch (compression) {
+    case BOT_LCMGL_COMPRESS_NONE:
+      data_uncompressed = &ldec->data[ldec->datapos];
+      ldec->datapos += raw_datalen;
+      break;
+    case BOT_LCMGL_COMPRESS_ZLIB:
+    {
+      data_uncompressed = malloc(raw_datalen);
+      free_uncompressed_data = 1;
+
+      for (int row = 0; row < height; row++) {
+        void *row_start = (uint8_t*) data_uncompressed + row * bytes_per_row;
+        uint32_t compressed_size = lcmgl_decode_u32(ldec);
+        uLong uncompressed_size = bytes_per_row;
+        uLong uncompress_return = uncompress((Bytef *) row_start, (uLong *) &uncompressed_size,
+            (Bytef *) &ldec->data[ldec->datapos], (uLong) compressed_size);
+        if (uncompress_return != Z_OK || bytes_per_row != uncompressed_size) {
+          fprintf(stderr, "ERROR uncompressing the texture2D, ret = %lu\n", uncompress_return);
+          exit(1);
+        }
+        ldec->datapos += compressed_size;
+      }
+    }
+    break;
+    }
+
+    BotGlTexture *tex = bot_gl_texture_new(width, height, max_data_size);
+    bot_gl_texture_upload(tex, gl_format, gl_type,
+            bytes_per_row, data_uncompressed);
+
+    if (free_uncompressed_data)
+      free(data_uncompressed);
+
+    return tex;
+}
+
+static void _add_texture(_lcmgl_texture_t ***textures, int *ntextures,
+        uint32_t id, BotGlTexture *gl_tex, int cached)
+{
+    _lcmgl_texture_t *tex = (_lcmgl_texture_t*)malloc(sizeof(_lcmgl_texture_t));
+    tex->lcmgl_tex_id = id;
+    tex->tex = gl_tex;
+    tex->cached = cached;
+
+    (*ntextures)++;
+    *textures = realloc(*textures, *ntextures * sizeof(_lcmgl_texture_t));
+    (*textures)[*ntextures-1] = tex;
+
+    if(id != *ntextures) {
+        // TODO emit warning...
+    }
+}
+#endif
+
+// Display lists defined with BOT_LCMGL_LIST_DEFINE, by key.  They are
+// registered by bot_lcmgl_receive, and kept until they are defined again with
+// another version.
+typedef struct {
+    uint64_t key;
+    uint32_t version;
+    uint8_t *data;
+    int datalen;
+    // whether the list is being drawn, so that it can't call itself
+    int drawing;
+} _lcmgl_list_t;
+
+// the depth of lists called by lists that are drawn
+#define MAX_LIST_DEPTH 16
+
+static _lcmgl_list_t *_lists = NULL;
+static int _nlists = 0;
+
+static _lcmgl_list_t *_find_list(uint64_t key)
+{
+    for (int i = 0; i < _nlists; i++) {
+        if (_lists[i].key == key)
+            return &_lists[i];
+    }
+    return NULL;
+}
+
+static void _define_list(uint64_t key, uint32_t version, uint8_t *data,
+        int datalen)
+{
+    _lcmgl_list_t *list = _find_list(key);
+    if (list && list->version == version && list->datalen == datalen &&
+            !memcmp(list->data, data, datalen))
+        return;
+    if (!list) {
+        _nlists++;
+        _lists = realloc(_lists, _nlists * sizeof(_lcmgl_list_t));
+        list = &_lists[_nlists-1];
+        list->key = key;
+        list->data = NULL;
+        list->drawing = 0;
+    }
+    list->version = version;
+    list->data = realloc(list->data, datalen ? datalen : 1);
+    memcpy(list->data, data, datalen);
+    list->datalen = datalen;
+}
+
+// Returns the size of the operands of an opcode whose operands have a fixed
+// size, or -1.
+static int _fixed_operands_size(uint8_t opcode)
+{
+    switch (opcode) {
+    case BOT_LCMGL_END:
+    case BOT_LCMGL_LOAD_IDENTITY:
+    case BOT_LCMGL_PUSH_MATRIX:
+    case BOT_LCMGL_POP_MATRIX:
+    case BOT_LCMGL_NOP:
+    case BOT_LCMGL_POP_ATTRIB:
+    case BOT_LCMGL_SCALE_TO_VIEWER_AR:
+        return 0;
+    case BOT_LCMGL_BEGIN:
+    case BOT_LCMGL_POINTSIZE:
+    case BOT_LCMGL_LINE_WIDTH:
+    case BOT_LCMGL_ENABLE:
+    case BOT_LCMGL_DISABLE:
+    case BOT_LCMGL_PUSH_ATTRIB:
+    case BOT_LCMGL_DEPTH_FUNC:
+    case BOT_LCMGL_MATRIX_MODE:
+        return 4;
+    case BOT_LCMGL_VERTEX2F:
+        return 2 * 4;
+    case BOT_LCMGL_VERTEX3F:
+    case BOT_LCMGL_NORMAL3F:
+    case BOT_LCMGL_SCALEF:
+    case BOT_LCMGL_COLOR3F:
+        return 3 * 4;
+    case BOT_LCMGL_COLOR4F:
+        return 4 * 4;
+    case BOT_LCMGL_VERTEX2D:
+        return 2 * 8;
+    case BOT_LCMGL_VERTEX3D:
+    case BOT_LCMGL_TRANSLATED:
+        return 3 * 8;
+    case BOT_LCMGL_ROTATED:
+        return 4 * 8;
+    case BOT_LCMGL_ORTHO:
+        return 6 * 8;
+    case BOT_LCMGL_MULT_MATRIXF:
+        return 16 * 4;
+    case BOT_LCMGL_MULT_MATRIXD:
+        return 16 * 8;
+    case BOT_LCMGL_MATERIALF:
+        return 4 + 4 + 4 * 4;
+    case BOT_LCMGL_BOX:
+        return 3 * 8 + 3 * 4;
+    case BOT_LCMGL_RECT:
+        return 3 * 8 + 2 * 8 + 1;
+    case BOT_LCMGL_CIRCLE:
+        return 3 * 8 + 4;
+    case BOT_LCMGL_SPHERE:
+        return 3 * 8 + 8 + 4 + 4;
+    case BOT_LCMGL_DISK:
+        return 3 * 8 + 4 + 4;
+    case BOT_LCMGL_CYLINDER:
+        return 3 * 8 + 3 * 8 + 4 + 4;
+    case BOT_LCMGL_TEX_DRAW_QUAD:
+        return 4 + 4 * 3 * 8;
+    case BOT_LCMGL_TEX_2D_CACHED:
+        return 4 + 8;
+    case BOT_LCMGL_LIST_CALL:
+        return 8 + 4;
+    default:
+        return -1;
+    }
+}
+
+// Registers the display lists defined in a block of data, and in the lists
+// themselves, and keeps the textures sent with BOT_LCMGL_TEX_2D_KEYED that
+// aren't cached yet, without executing any OpenGL commands.  Stops at an unknown
+// opcode or at the end of truncated data.
+static void _scan(uint8_t *data, int datalen, int depth)
+{
+    lcmgl_decoder_t ldec;
+    ldec.data = data;
+    ldec.datalen = datalen;
+    ldec.datapos = 0;
+
+    while (ldec.datapos < ldec.datalen) {
+        uint8_t opcode = lcmgl_decode_u8(&ldec);
+        int size = _fixed_operands_size(opcode);
+        if (size >= 0) {
+            ldec.datapos += size;
+            continue;
+        }
+        switch (opcode) {
+        case BOT_LCMGL_TEXT:
+        case BOT_LCMGL_TEXT_LONG:
+        {
+            // font, flags, position and length
+            int header = (opcode == BOT_LCMGL_TEXT ? 1 + 1 : 4 + 4) + 3 * 8;
+            if (ldec.datalen - ldec.datapos < header + 4)
+                return;
+            ldec.datapos += header;
+            ldec.datapos += lcmgl_decode_u32(&ldec);
+            break;
+        }
+        case BOT_LCMGL_TEX_2D:
+            ldec.datapos += 4;
+            if (_skip_texture(&ldec) < 0)
+                return;
+            break;
+        case BOT_LCMGL_TEX_2D_KEYED:
+            if (ldec.datalen - ldec.datapos < 8 + 1 + 4)
+                return;
+        {
+            uint64_t key = lcmgl_decode_u64(&ldec);
+            if (lcmgl_decode_u8(&ldec) != BOT_LCMGL_TEX_2D)
+                return;
+            ldec.datapos += 4;
+            int start = ldec.datapos;
+            if (_skip_texture(&ldec) < 0)
+                return;
+#ifdef USE_BOT_VIS
+            if (_texture_cache_index(key) < 0 &&
+                    _pending_texture_index(key) < 0)
+                _pending_texture_add(key, &ldec.data[start],
+                        ldec.datapos - start);
+#else
+            (void) key; (void) start;
 #endif
+            break;
+        }
+        case BOT_LCMGL_LIST_DEFINE:
+        {
+            if (ldec.datalen - ldec.datapos < 8 + 4 + 4)
+                return;
+            uint64_t key = lcmgl_decode_u64(&ldec);
+            uint32_t version = lcmgl_decode_u32(&ldec);
+            uint32_t list_datalen = lcmgl_decode_u32(&ldec);
+            if (ldec.datalen - ldec.datapos < list_datalen)
+                return;
+            uint8_t *list_data = &ldec.data[ldec.datapos];
+            _define_list(key, version, list_data, list_datalen);
+            if (depth < MAX_LIST_DEPTH)
+                _scan(list_data, list_datalen, depth + 1);
+            ldec.datapos += list_datalen;
+            break;
+        }
+        default:
+            return;
+        }
+    }
+}
+
+void bot_lcmgl_receive(uint8_t *data, int datalen)
+{
+    _scan(data, datalen, 0);
+}
+
+static void _decode(uint8_t *data, int datalen, int depth);
 
 void bot_lcmgl_decode(uint8_t *data, int datalen)
+{
+#ifdef USE_BOT_VIS
+    _texture_cache_clock++;
+#endif
+    _decode(data, datalen, 0);
+}
+
+static void _decode(uint8_t *data, int datalen, int depth)
 {
     lcmgl_decoder_t ldec;
     ldec.data = data;
@@ -560,96 +1029,69 @@ void bot_lcmgl_decode(uint8_t *data, int datalen)
         {
 #ifdef USE_BOT_VIS
             uint32_t id = lcmgl_decode_u32(&ldec);
-            uint32_t width = lcmgl_decode_u32(&ldec);
-            uint32_t height = lcmgl_decode_u32(&ldec);
-            uint32_t format = lcmgl_decode_u32(&ldec);
-            uint32_t type = lcmgl_decode_u32(&ldec);
-
-            int subpix_per_pixel = 1;
-            GLenum gl_format = format;
-            switch(format) {
-                case BOT_LCMGL_LUMINANCE:
-                    subpix_per_pixel = 1;
-                    break;
-                case BOT_LCMGL_RGB:
-                    subpix_per_pixel = 3;
-                    break;
-                case BOT_LCMGL_RGBA:
-                    subpix_per_pixel = 4;
-                    break;
-            }
-
-            GLenum gl_type = type;
-            int bytes_per_subpixel = 1;
-            switch (type) {
-                  case BOT_LCMGL_UNSIGNED_BYTE:
-                  case BOT_LCMGL_BYTE:
-                      bytes_per_subpixel = 1;
-                      break;
-                  case BOT_LCMGL_UNSIGNED_SHORT:
-                  case BOT_LCMGL_SHORT:
-                      bytes_per_subpixel = 1;
-                      break;
-                  case BOT_LCMGL_UNSIGNED_INT:
-                  case BOT_LCMGL_INT:
-                  case BOT_LCMGL_FLOAT:
-                      bytes_per_subpixel = 4;
-                      break;
+            int size;
+            _add_texture(&textures, &ntextures, id,
+                    _decode_texture(&ldec, &size), 0);
+#else
+            fprintf(stderr, "ERROR, unsupported client request BOT_LCMGL_TEX_2D\n");
+#endif
+            break;
+        }
+        case BOT_LCMGL_TEX_2D_KEYED:
+        {
+#ifdef USE_BOT_VIS
+            uint64_t key = lcmgl_decode_u64(&ldec);
+            if (lcmgl_decode_u8(&ldec) != BOT_LCMGL_TEX_2D) {
+                fprintf(stderr, "ERROR, BOT_LCMGL_TEX_2D_KEYED without a texture\n");
+                ldec.datapos = ldec.datalen;
+                break;
             }
-
-
-            int bytes_per_row = width * subpix_per_pixel * bytes_per_subpixel;
-            int max_data_size = height * bytes_per_row;
-
-
-            int compression = lcmgl_decode_u32(&ldec);
-            int raw_datalen = lcmgl_decode_u32(&ldec);
-            void *data_uncompressed = NULL;
-            int free_uncompressed_data = 0;
-            switch (compression) {
-            case BOT_LCMGL_COMPRESS_NONE:
-              data_uncompressed = &ldec.data[ldec.datapos];
-              ldec.datapos += raw_datalen;
-              break;
-            case BOT_LCMGL_COMPRESS_ZLIB:
-            {
-              data_uncompressed = malloc(raw_datalen);
-              free_uncompressed_data = 1;
-
-              for (int row = 0; row < height; row++) {
-                void *row_start = (uint8_t*) data_uncompressed + row * bytes_per_row;
-                uint32_t compressed_size = lcmgl_decode_u32(&ldec);
-                uLong uncompressed_size = bytes_per_row;
-                uLong uncompress_return = uncompress((Bytef *) row_start, (uLong *) &uncompressed_size,
-                    (Bytef *) &ldec.data[ldec.datapos], (uLong) compressed_size);
-                if (uncompress_return != Z_OK || bytes_per_row != uncompressed_size) {
-                  fprintf(stderr, "ERROR uncompressing the texture2D, ret = %lu\n", uncompress_return);
-                  exit(1);
-                }
-                ldec.datapos += compressed_size;
-              }
+            uint32_t id = lcmgl_decode_u32(&ldec);
+            int size;
+            _lcmgl_cached_texture_t *cached = _texture_cache_find(key);
+            if (cached) {
+                _skip_texture(&ldec);
+                _add_texture(&textures, &ntextures, id, cached->tex, 1);
+            } else {
+                BotGlTexture *tex = _decode_texture(&ldec, &size);
+                _texture_cache_add(key, tex, size);
+                _add_texture(&textures, &ntextures, id, tex, 1);
+                int pending = _pending_texture_index(key);
+                if (pending >= 0)
+                    _pending_texture_remove(pending);
             }
+#else
+            fprintf(stderr, "ERROR, unsupported client request BOT_LCMGL_TEX_2D_KEYED\n");
+#endif
             break;
+        }
+        case BOT_LCMGL_TEX_2D_CACHED:
+        {
+#ifdef USE_BOT_VIS
+            uint32_t id = lcmgl_decode_u32(&ldec);
+            uint64_t key = lcmgl_decode_u64(&ldec);
+            BotGlTexture *tex = NULL;
+            _lcmgl_cached_texture_t *cached = _texture_cache_find(key);
+            int pending = cached ? -1 : _pending_texture_index(key);
+            if (cached) {
+                tex = cached->tex;
+            } else if (pending >= 0) {
+                // the scene that sent the texture was received, but not
+                // drawn
+                lcmgl_decoder_t tex_ldec;
+                tex_ldec.data = _pending_textures[pending].data;
+                tex_ldec.datalen = _pending_textures[pending].datalen;
+                tex_ldec.datapos = 0;
+                int size;
+                tex = _decode_texture(&tex_ldec, &size);
+                _texture_cache_add(key, tex, size);
+                _pending_texture_remove(pending);
             }
-
-            _lcmgl_texture_t *tex = (_lcmgl_texture_t*)malloc(sizeof(_lcmgl_texture_t));
-
-            tex->tex = bot_gl_texture_new(width, height, max_data_size);
-            bot_gl_texture_upload(tex->tex, gl_format, gl_type,
-                    bytes_per_row, data_uncompressed);
-
-            if (free_uncompressed_data)
-              free(data_uncompressed);
-
-            ntextures++;
-            textures = realloc(textures, ntextures * sizeof(_lcmgl_texture_t));
-            textures[ntextures-1] = tex;
-
-            if(id != ntextures) {
-                // TODO emit warning...
-            }
+            // missing if the scene that sent the texture wasn't received.
+            // Quads with the texture aren't drawn until it's sent again.
+            _add_texture(&textures, &ntextures, id, tex, 1);
 #else
-            fprintf(stderr, "ERROR, unsupported client request BOT_LCMGL_TEX_2D\n");
+            fprintf(stderr, "ERROR, unsupported client request BOT_LCMGL_TEX_2D_CACHED\n");
 #endif
             break;
         }
@@ -674,7 +1116,7 @@ void bot_lcmgl_decode(uint8_t *data, int datalen)
             double y_bot_left = lcmgl_decode_double(&ldec);
             double z_bot_left = lcmgl_decode_double(&ldec);
 
-            if(id <= ntextures) {
+            if(id <= ntextures && textures[id - 1]->tex) {
                 _lcmgl_texture_t *tex = textures[id - 1];
                 bot_gl_texture_draw_coords(tex->tex, 
                         x_top_left, y_top_left, z_top_left,
@@ -700,6 +1142,30 @@ void bot_lcmgl_decode(uint8_t *data, int datalen)
             break;
         }
 
+        case BOT_LCMGL_LIST_DEFINE:
+        {
+            // the list was defined when the data was received
+            ldec.datapos += 8 + 4;
+            int list_datalen = lcmgl_decode_u32(&ldec);
+            ldec.datapos += list_datalen;
+            break;
+        }
+        case BOT_LCMGL_LIST_CALL:
+        {
+            uint64_t key = lcmgl_decode_u64(&ldec);
+            uint32_t version = lcmgl_decode_u32(&ldec);
+            // the list is missing if the scene that defined it wasn't
+            // received.  It isn't drawn until it's defined again.
+            _lcmgl_list_t *list = _find_list(key);
+            if (list && list->version == version && !list->drawing &&
+                    depth < MAX_LIST_DEPTH) {
+                list->drawing = 1;
+                _decode(list->data, list->datalen, depth + 1);
+                list->drawing = 0;
+            }
+            break;
+        }
+
         default:
             printf("lcmgl unknown opcode %d\n", opcode);
             break;
@@ -708,7 +1174,8 @@ void bot_lcmgl_decode(uint8_t *data, int datalen)
 
 #ifdef USE_BOT_VIS
     for(int i=0; i<ntextures; i++) {
-        bot_gl_texture_free(textures[i]->tex);
+        if (!textures[i]->cached)
+            bot_gl_texture_free(textures[i]->tex);
         free(textures[i]);
     }
     free(textures);
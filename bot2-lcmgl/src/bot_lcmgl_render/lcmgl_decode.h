@@ -20,11 +20,23 @@
 extern "C" {
 #endif
 
+/**
+ * bot_lcmgl_receive:
+ *
+ * Registers the display lists defined in a block of LCMGL data, and keeps a
+ * copy of the cached textures it sends until they are drawn, without
+ * executing any OpenGL commands.  Call this once for every block of data
+ * received, whether or not it is ever drawn, so that the lists and textures
+ * it sends can be used by the blocks received after it.
+ */
+void bot_lcmgl_receive(uint8_t *data, int datalen);
+
 /**
  * bot_lcmgl_decode:
  *
  * Decodes a block of LCMGL data, and executes the OpenGL commands with 
- * the current OpenGL context.
+ * the current OpenGL context.  The block must have been passed to
+ * bot_lcmgl_receive first.
  */
 void bot_lcmgl_decode(uint8_t *data, int datalen);
 
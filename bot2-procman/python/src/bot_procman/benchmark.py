@@ -0,0 +1,136 @@
+"""Cost of looking up commands in the sheriff.
+
+Adds the commands of fleets of deputies of different sizes to a Sheriff,
+through a stand-in for lcm.LCM that drops everything published, and times
+the lookups that the sheriff GUI and scripts do for every message from a
+deputy and every script action.  They use the sheriff's command index, so
+their cost shouldn't grow with the number of commands.  For comparison, a
+search through get_all_commands(), which is how the sheriff used to look
+commands up, is timed too.
+
+usage: python -m bot_procman.benchmark [options]
+"""
+import getopt
+import sys
+import timeit
+
+from bot_procman.sheriff import Sheriff, SheriffCommandSpec
+
+# seconds each lookup is timed for, by default
+DEFAULT_SECONDS = 0.5
+
+# numbers of deputies in the fleets, each with COMMANDS_PER_DEPUTY commands
+DEFAULT_DEPUTIES = [ 4, 40, 160 ]
+COMMANDS_PER_DEPUTY = 15
+
+# groups of the commands of each deputy
+GROUPS_PER_DEPUTY = 3
+
+class _LCM(object):
+    """Stand-in for lcm.LCM that drops everything published."""
+    def subscribe(self, channel, handler):
+        pass
+
+    def publish(self, channel, data):
+        pass
+
+def make_sheriff(ndeputies):
+    """Create a sheriff with ndeputies deputies, each with
+    COMMANDS_PER_DEPUTY commands in GROUPS_PER_DEPUTY groups of its own.
+    Returns the sheriff and its commands."""
+    sheriff = Sheriff(_LCM())
+    cmds = []
+    for i in range(ndeputies):
+        for j in range(COMMANDS_PER_DEPUTY):
+            spec = SheriffCommandSpec()
+            spec.deputy_name = "deputy%d" % i
+            spec.exec_str = "true"
+            spec.command_id = "command%d_%d" % (i, j)
+            spec.group_name = "group%d/sub%d" % (i, j % GROUPS_PER_DEPUTY)
+            cmds.append(sheriff.add_command(spec))
+    return sheriff, cmds
+
+def _scan_by_id(sheriff, cmd_id):
+    return [ cmd for cmd in sheriff.get_all_commands() \
+            if cmd.command_id == cmd_id ]
+
+def lookups(sheriff, cmds):
+    """Returns the (name, function) pairs of the lookups that are timed, each
+    looking up commands in the middle of the fleet."""
+    cmd = cmds[len(cmds) // 2]
+    group = cmd.group
+    return [ ("get_command_by_sheriff_id",
+                lambda: sheriff.get_command_by_sheriff_id(cmd.sheriff_id)),
+            ("get_command_deputy", lambda: sheriff.get_command_deputy(cmd)),
+            ("get_commands_by_id",
+                lambda: sheriff.get_commands_by_id(cmd.command_id)),
+            ("get_commands_by_group",
+                lambda: sheriff.get_commands_by_group(group)),
+            ("scan of get_all_commands",
+                lambda: _scan_by_id(sheriff, cmd.command_id)) ]
+
+def run_timed(func, seconds):
+    """Call func over and over for the given number of seconds.  Returns the
+    seconds per call."""
+    timer = timeit.default_timer
+    ncalls = 0
+    start = timer()
+    while True:
+        for i in range(100):
+            func()
+        ncalls += 100
+        elapsed = timer() - start
+        if elapsed >= seconds:
+            return elapsed / ncalls
+
+def usage():
+    sys.stderr.write("""usage: %s [options]
+
+Times looking up commands in sheriffs with fleets of deputies of different
+sizes, and prints the microseconds per lookup.
+
+    -h --help           print this message
+    -s --seconds=sec    time each lookup for [sec] seconds [default %g]
+    -d --deputies=N,... numbers of deputies in the fleets, each with %d
+                        commands [default %s]
+""" % (sys.argv[0], DEFAULT_SECONDS, COMMANDS_PER_DEPUTY,
+        ",".join(str(n) for n in DEFAULT_DEPUTIES)))
+    sys.exit(1)
+
+def main():
+    try:
+        opts, args = getopt.gnu_getopt(sys.argv[1:], "hs:d:",
+                [ "help", "seconds=", "deputies=" ])
+    except getopt.GetoptError as err:
+        sys.stderr.write("%s\n" % err)
+        usage()
+    seconds = DEFAULT_SECONDS
+    fleets = DEFAULT_DEPUTIES
+    for o, a in opts:
+        if o in ("-h", "--help"):
+            usage()
+        elif o in ("-s", "--seconds"):
+            seconds = float(a)
+        elif o in ("-d", "--deputies"):
+            fleets = [ int(n) for n in a.split(",") ]
+    if args:
+        usage()
+
+    results = []
+    for ndeputies in fleets:
+        sheriff, cmds = make_sheriff(ndeputies)
+        results.append([ (name, run_timed(func, seconds)) \
+                for name, func in lookups(sheriff, cmds) ])
+
+    sys.stdout.write("%-26s" % "us/lookup, by commands")
+    for ndeputies in fleets:
+        sys.stdout.write(" %9d" % (ndeputies * COMMANDS_PER_DEPUTY))
+    sys.stdout.write("\n")
+    for i, (name, t) in enumerate(results[0]):
+        sys.stdout.write("%-26s" % name)
+        for fleet_results in results:
+            sys.stdout.write(" %9.2f" % (fleet_results[i][1] * 1e6))
+        sys.stdout.write("\n")
+
+if __name__ == "__main__":
+    main()
@@ -8,6 +8,7 @@ import sys
 import time
 import random
 import signal
+import struct
 
 import gobject
 
@@ -272,12 +273,117 @@ class SheriffDeputyCommand(object):
    mem_rss:      %(mem_rss_bytes)d
    actual_runid: %(actual_runid)d""" % self.__dict__
 
+class _GroupTrieNode(object):
+    __slots__ = [ "children", "commands" ]
+
+    def __init__(self):
+        # group name component -> _GroupTrieNode
+        self.children = {}
+
+        # commands whose group is exactly the path to this node
+        self.commands = set()
+
+    def collect(self, result):
+        result.extend(self.commands)
+        for child in self.children.values():
+            child.collect(result)
+
+class _CommandIndex(object):
+    """Lookup tables over every command managed by every deputy.
+
+    The index is kept in sync by SheriffDeputy whenever a command is added to
+    or removed from a deputy, and by the Sheriff whenever a command's id or
+    group changes.  This keeps command lookups independent of the number of
+    deputies and commands.
+    """
+    def __init__(self):
+        # sheriff_id -> (deputy, cmd)
+        self._by_sheriff_id = {}
+
+        # command_id -> set of commands
+        self._by_command_id = {}
+
+        # group trie.  Commands are stored at the node given by the
+        # components of their group name.
+        self._group_root = _GroupTrieNode()
+
+        # cmd -> (deputy, sheriff_id, command_id, group_parts) as they were
+        # indexed.
+        self._keys = {}
+
+    def add(self, deputy, cmd):
+        if cmd in self._keys:
+            self.remove(cmd)
+        self._by_sheriff_id[cmd.sheriff_id] = (deputy, cmd)
+        self._by_command_id.setdefault(cmd.command_id, set()).add(cmd)
+        group_parts = tuple(cmd.group.split("/"))
+        node = self._group_root
+        for part in group_parts:
+            node = node.children.setdefault(part, _GroupTrieNode())
+        node.commands.add(cmd)
+        self._keys[cmd] = (deputy, cmd.sheriff_id, cmd.command_id, group_parts)
+
+    def remove(self, cmd):
+        if cmd not in self._keys:
+            return
+        _, sheriff_id, command_id, group_parts = self._keys.pop(cmd)
+
+        entry = self._by_sheriff_id.get(sheriff_id)
+        if entry is not None and entry[1] is cmd:
+            del self._by_sheriff_id[sheriff_id]
+
+        cmds = self._by_command_id[command_id]
+        cmds.discard(cmd)
+        if not cmds:
+            del self._by_command_id[command_id]
+
+        # remove the command from the trie, pruning nodes that become empty
+        path = [ self._group_root ]
+        for part in group_parts:
+            path.append(path[-1].children[part])
+        path[-1].commands.discard(cmd)
+        for depth in range(len(group_parts), 0, -1):
+            node = path[depth]
+            if node.commands or node.children:
+                break
+            del path[depth - 1].children[group_parts[depth - 1]]
+
+    def reindex(self, cmd):
+        """Update the index after a command's id or group changes."""
+        if cmd not in self._keys:
+            return
+        deputy, _, command_id, group_parts = self._keys[cmd]
+        if command_id == cmd.command_id and \
+                group_parts == tuple(cmd.group.split("/")):
+            return
+        self.remove(cmd)
+        self.add(deputy, cmd)
+
+    def get(self, sheriff_id):
+        return self._by_sheriff_id[sheriff_id]
+
+    def has_sheriff_id(self, sheriff_id):
+        return sheriff_id in self._by_sheriff_id
+
+    def get_commands_by_id(self, command_id):
+        return list(self._by_command_id.get(command_id, ()))
+
+    def get_commands_by_group_parts(self, group_parts):
+        node = self._group_root
+        for part in group_parts:
+            node = node.children.get(part)
+            if node is None:
+                return []
+        result = []
+        node.collect(result)
+        return result
+
 class SheriffDeputy(object):
     """%Sheriff view of a deputy
 
     \ingroup python_api
     """
-    def __init__(self, name):
+    def __init__(self, name, command_index=None):
         """Initializes a deputy with the specified name.  Do not use this
         constructor directly.  Instead, get a list of deputies from the
         Sheriff.
@@ -307,6 +413,18 @@ class SheriffDeputy(object):
         # Dictionary of commands owned by the deputy
         self._commands = {}
 
+        # Sheriff-wide command index, updated as commands are added and
+        # removed.
+        self._command_index = command_index
+
+        # Cached (channel, encoded orders) for the deputy, and whether the
+        # desired state has changed since they were last encoded.
+        self._encoded_orders = None
+        self._orders_dirty = True
+
+        # Last time orders were published to the deputy, in microseconds since
+        # the epoch.
+        self._orders_publish_utime = 0
 
     def get_commands(self):
         """Retrieve a list of all commands managed by the deputy
@@ -349,7 +467,10 @@ class SheriffDeputy(object):
                 self._add_command(cmd)
                 old_status = None
 
+            force_quit = cmd.force_quit
             cmd._update_from_cmd_info2(cmd_msg)
+            if cmd.force_quit != force_quit:
+                self._orders_dirty = True
             new_status = cmd.status()
 
             if old_status != new_status:
@@ -365,7 +486,7 @@ class SheriffDeputy(object):
             cmd = self._commands[toremove.sheriff_id]
             old_status = cmd.status()
             status_changes.append((cmd, old_status, None))
-            del self._commands[toremove.sheriff_id]
+            self._remove_command(cmd)
 
         self.last_update_utime = _now_utime()
         self.cpu_load = dep_info_msg.cpu_load
@@ -374,6 +495,7 @@ class SheriffDeputy(object):
         return status_changes
 
     def _update_from_deputy_orders2(self, orders_msg):
+        self._orders_dirty = True
         status_changes = []
         for cmd_msg in orders_msg.cmds:
             if cmd_msg.sheriff_id in self._commands:
@@ -392,6 +514,8 @@ class SheriffDeputy(object):
                 self._add_command(cmd)
                 old_status = None
             cmd._update_from_cmd_order2(cmd_msg)
+            if self._command_index is not None:
+                self._command_index.reindex(cmd)
             new_status = cmd.status()
             if old_status != new_status:
                 status_changes.append((cmd, old_status, new_status))
@@ -409,14 +533,29 @@ class SheriffDeputy(object):
         assert newcmd.sheriff_id != 0
         assert isinstance(newcmd, SheriffDeputyCommand)
         self._commands[newcmd.sheriff_id] = newcmd
+        self._orders_dirty = True
+        if self._command_index is not None:
+            self._command_index.add(self, newcmd)
+
+    def _remove_command(self, cmd):
+        del self._commands[cmd.sheriff_id]
+        self._orders_dirty = True
+        if self._command_index is not None:
+            self._command_index.remove(cmd)
+
+    def _change_sheriff_id(self, cmd, sheriff_id):
+        self._remove_command(cmd)
+        cmd.sheriff_id = sheriff_id
+        self._add_command(cmd)
 
     def _schedule_for_removal(self, cmd):
         if not self.owns_command(cmd):
             raise KeyError("invalid command")
         old_status = cmd.status()
         cmd.scheduled_for_removal = True
+        self._orders_dirty = True
         if not self.last_update_utime:
-            del self._commands[cmd.sheriff_id]
+            self._remove_command(cmd)
             new_status = None
         else:
             new_status = cmd.status()
@@ -476,6 +615,30 @@ class SheriffDeputy(object):
         msg.option_values = []
         return msg
 
+    def _get_encoded_orders(self, sheriff_name):
+        """Retrieve the orders for this deputy as a (channel, data) tuple.
+
+        The orders are only re-encoded if the deputy's desired state has
+        changed since the last call.  Otherwise, the cached encoding is reused
+        with a fresh timestamp.
+        """
+        if self._orders_dirty or self._encoded_orders is None:
+            if self._orders_version == 1:
+                msg = self._make_orders_message(sheriff_name)
+                channel = "PMD_ORDERS"
+            else:
+                msg = self._make_orders2_message(sheriff_name)
+                channel = "PMD_ORDERS2"
+            self._encoded_orders = (channel, msg.encode())
+            self._orders_dirty = False
+            return self._encoded_orders
+
+        # orders_t and orders2_t both start with an int64 utime, immediately
+        # after the 8-byte fingerprint.
+        channel, data = self._encoded_orders
+        data = data[:8] + struct.pack(">q", _now_utime()) + data[16:]
+        return channel, data
+
 class ScriptExecutionContext(object):
     def __init__(self, sheriff, script):
         assert(script is not None)
@@ -548,11 +711,14 @@ class Sheriff(object):
     \endcode
     """
 
-    def __init__ (self, lcm_obj = None):
+    def __init__ (self, lcm_obj = None, command_status_signal = True):
         """Initialize a new Sheriff object.
 
         \param lcm_obj the LCM object to use for communication.  If None, then
         the sheriff creates a new lcm.LCM() instance.
+        \param command_status_signal whether to emit command_status_changed
+        for each command whose status changes.  commands_status_changed is
+        emitted either way.
         """
         self._lcm = lcm_obj
         if self._lcm is None:
@@ -562,7 +728,10 @@ class Sheriff(object):
         self._lcm.subscribe("PMD_ORDERS", self._on_pmd_orders)
         self._lcm.subscribe("PMD_ORDERS2", self._on_pmd_orders2)
         self._deputies = {}
+        self._command_index = _CommandIndex()
         self._is_observer = False
+        self._orders_keepalive_usec = 0
+        self._command_status_signal = command_status_signal
         self._name = platform.node() + ":" + str(os.getpid()) + \
                 ":" + str(_now_utime())
 
@@ -606,7 +775,8 @@ class Sheriff(object):
         self.command_removed = Signal()
 
         ## [Signal](\ref bot_procman.signal_slot.Signal) emitted when the
-        # status of a command changes (e.g., running, stopped, etc.).
+        # status of a command changes (e.g., running, stopped, etc.).  Not
+        # emitted if the sheriff was created with command_status_signal=False.
         # `command_status_changed(cmd_object, old_status, new_status)`
         #
         # \param cmd_object is a SheriffDeputyCommand for the command.
@@ -614,6 +784,18 @@ class Sheriff(object):
         # \param new_status indicates the new command status.
         self.command_status_changed = Signal()
 
+        ## [Signal](\ref bot_procman.signal_slot.Signal) emitted once for a
+        # set of command status changes on a single deputy, e.g., for each
+        # message received from the deputy, or when starting a group of
+        # commands with start_commands().
+        # `commands_status_changed(deputy_object, status_changes)`
+        #
+        # \param deputy_object is a SheriffDeputy for the deputy that owns the
+        # commands.
+        # \param status_changes is a list of (cmd_object, old_status,
+        # new_status) tuples.
+        self.commands_status_changed = Signal()
+
         ## [Signal](\ref bot_procman.signal_slot.Signal) emitted when a command
         # is moved into a different group.
         #
@@ -659,10 +841,12 @@ class Sheriff(object):
 
     def _get_or_make_deputy(self, deputy_name):
         if deputy_name not in self._deputies:
-            self._deputies[deputy_name] = SheriffDeputy(deputy_name)
+            self._deputies[deputy_name] = SheriffDeputy(deputy_name,
+                    self._command_index)
         return self._deputies[deputy_name]
 
     def _maybe_emit_status_change_signals(self, deputy, status_changes):
+        changed = []
         for cmd, old_status, new_status in status_changes:
             if old_status == new_status:
                 continue
@@ -671,14 +855,24 @@ class Sheriff(object):
             elif new_status is None:
                 self.command_removed(deputy, cmd)
             else:
-                self._check_wait_action_status()
-                self.command_status_changed(cmd, old_status, new_status)
+                if self._command_status_signal:
+                    self.command_status_changed(cmd, old_status, new_status)
+                changed.append((cmd, old_status, new_status))
+        if changed:
+            self._check_wait_action_status()
+            self.commands_status_changed(deputy, changed)
+
+    def _mark_orders_dirty(self, cmd):
+        try:
+            self.get_command_deputy(cmd)._orders_dirty = True
+        except KeyError:
+            pass
 
     def _get_command_deputy(self, cmd):
-        for deputy in self._deputies.values():
-            if deputy.owns_command(cmd):
-                return deputy
-        raise KeyError()
+        deputy, indexed_cmd = self._command_index.get(cmd.sheriff_id)
+        if indexed_cmd is not cmd:
+            raise KeyError()
+        return deputy
 
     def _handle_info2_t(self, info_msg, version):
         now = _now_utime()
@@ -708,26 +902,22 @@ class Sheriff(object):
                               cmd.auto_respawn == cmd_msg.cmd.auto_respawn
                     if not matched:
                         continue
-                    collision = False
-                    for other_deputy in self._deputies.values():
-                        if other_deputy._commands.get(cmd_msg.sheriff_id, cmd) \
-                                is not cmd:
-                            collision = True
-                            break
-                    if collision:
+                    if self._command_index.has_sheriff_id(cmd_msg.sheriff_id) \
+                            and self._command_index.get(cmd_msg.sheriff_id)[1] \
+                            is not cmd:
                         continue
                     # found a command managed by the deputy that looks
                     # exactly like the command the sheriff wants the
                     # deputy to run.  Reassign the sheriff ID to match
                     # what the deputy is reporting.
-                    del deputy._commands[cmd.sheriff_id]
-                    cmd.sheriff_id = cmd_msg.sheriff_id
-                    deputy._commands[cmd.sheriff_id] = cmd
+                    deputy._change_sheriff_id(cmd, cmd_msg.sheriff_id)
                     _dbg("Merging command [%s] with command reported by deputy" \
                             % cmd.command_id)
                     break
 
-        deputy._orders_version = version
+        if deputy._orders_version != version:
+            deputy._orders_version = version
+            deputy._orders_dirty = True
 
         status_changes = deputy._update_from_deputy_info2(info_msg)
 
@@ -831,11 +1021,7 @@ class Sheriff(object):
         id_to_try = random.randint(0, (1 << 31) - 1)
 
         for _ in range(1 << 16):
-            collision = False
-            for deputy in self._deputies.values():
-                if id_to_try in deputy._commands:
-                    collision = True
-                    break
+            collision = self._command_index.has_sheriff_id(id_to_try)
 
             if not collision:
                 result = id_to_try
@@ -862,9 +1048,16 @@ class Sheriff(object):
 
         @note Orders will only be sent to a deputy if the sheriff has received at
         least one update from the deputy.
+
+        @note If an orders keepalive is set, then orders are only sent to
+        deputies whose desired state has changed, or whose keepalive period has
+        elapsed.  See set_orders_keepalive().
         """
         if self._is_observer:
             raise ValueError("Can't send orders in Observer mode")
+        if self._orders_keepalive_usec:
+            self._send_changed_orders()
+            return
         for deputy in self._deputies.values():
             # only send orders to a deputy if we've heard from it.
             if deputy.last_update_utime > 0:
@@ -877,6 +1070,43 @@ class Sheriff(object):
                     msg = deputy._make_orders2_message(self._name)
                     self._lcm.publish("PMD_ORDERS2", msg.encode())
 
+    def _send_changed_orders(self):
+        now = _now_utime()
+        for deputy in self._deputies.values():
+            # only send orders to a deputy if we've heard from it.
+            if deputy.last_update_utime <= 0:
+                continue
+            if not deputy._orders_dirty and \
+                    now - deputy._orders_publish_utime < \
+                    self._orders_keepalive_usec:
+                continue
+            channel, data = deputy._get_encoded_orders(self._name)
+            self._lcm.publish(channel, data)
+            deputy._orders_publish_utime = now
+
+    def set_orders_keepalive(self, keepalive_sec):
+        """Switch between periodic and change-driven orders transmission.
+
+        By default, every call to send_orders() publishes a freshly encoded
+        orders message for every deputy.  If \p keepalive_sec is positive,
+        then send_orders() instead publishes orders to a deputy only if the
+        deputy's desired state has changed since its orders were last sent, or
+        if at least \p keepalive_sec seconds have passed since then.  Orders
+        are only re-encoded for deputies whose desired state has changed.
+
+        @param keepalive_sec the keepalive period in seconds, or 0 to publish
+        orders to every deputy on every call to send_orders().
+        """
+        self._orders_keepalive_usec = int(keepalive_sec * 1000000)
+
+    def get_orders_keepalive(self):
+        """Retrieve the orders keepalive period.
+
+        @return the keepalive period in seconds, or 0 if change-driven orders
+        transmission is disabled.
+        """
+        return self._orders_keepalive_usec * 1e-6
+
     def add_command(self, spec):
         """Add a new command.
 
@@ -918,15 +1148,7 @@ class Sheriff(object):
 
         @param cmd a SheriffDeputyCommand object specifying the command to run.
         """
-        if self._is_observer:
-            raise ValueError("Can't modify commands in Observer mode")
-        old_status = cmd.status()
-        cmd._start()
-        new_status = cmd.status()
-        deputy = self.get_command_deputy(cmd)
-        self._maybe_emit_status_change_signals(deputy,
-                ((cmd, old_status, new_status),))
-        self.send_orders()
+        self.start_commands((cmd,))
 
     def restart_command(self, cmd):
         """Starts a command if it's not running, or stop and then start it if it's
@@ -938,15 +1160,7 @@ class Sheriff(object):
         @param cmd a SheriffDeputyCommand object specifying the command to
         restart.
         """
-        if self._is_observer:
-            raise ValueError("Can't modify commands in Observer mode")
-        old_status = cmd.status()
-        cmd._restart()
-        new_status = cmd.status()
-        deputy = self.get_command_deputy(cmd)
-        self._maybe_emit_status_change_signals(deputy,
-                ((cmd, old_status, new_status),))
-        self.send_orders()
+        self.restart_commands((cmd,))
 
     def stop_command(self, cmd):
         """Sets a command's desired status to stopped.  If the command is
@@ -955,14 +1169,58 @@ class Sheriff(object):
 
         @param cmd a SheriffDeputyCommand object specifying the command to stop.
         """
+        self.stop_commands((cmd,))
+
+    def start_commands(self, cmds):
+        """Sets the desired status of multiple commands to running.  This is
+        equivalent to calling start_command() on each command, except that
+        orders are only sent once, and commands_status_changed is emitted once
+        per deputy.
+        This method calls send_orders().
+
+        @param cmds a list of SheriffDeputyCommand objects to start.
+        """
+        self._modify_commands(cmds, SheriffDeputyCommand._start)
+
+    def restart_commands(self, cmds):
+        """Restarts multiple commands.  This is equivalent to calling
+        restart_command() on each command, except that orders are only sent
+        once, and commands_status_changed is emitted once per deputy.
+        This method calls send_orders().
+
+        @param cmds a list of SheriffDeputyCommand objects to restart.
+        """
+        self._modify_commands(cmds, SheriffDeputyCommand._restart)
+
+    def stop_commands(self, cmds):
+        """Sets the desired status of multiple commands to stopped.  This is
+        equivalent to calling stop_command() on each command, except that
+        orders are only sent once, and commands_status_changed is emitted once
+        per deputy.
+        This method calls send_orders().
+
+        @param cmds a list of SheriffDeputyCommand objects to stop.
+        """
+        self._modify_commands(cmds, SheriffDeputyCommand._stop)
+
+    def _modify_commands(self, cmds, modify):
         if self._is_observer:
             raise ValueError("Can't modify commands in Observer mode")
-        old_status = cmd.status()
-        cmd._stop()
-        new_status = cmd.status()
-        deputy = self.get_command_deputy(cmd)
-        self._maybe_emit_status_change_signals(deputy,
-                ((cmd, old_status, new_status),))
+        deputies = []
+        deputy_status_changes = {}
+        for cmd in cmds:
+            deputy = self.get_command_deputy(cmd)
+            old_status = cmd.status()
+            modify(cmd)
+            new_status = cmd.status()
+            deputy._orders_dirty = True
+            if deputy not in deputy_status_changes:
+                deputies.append(deputy)
+                deputy_status_changes[deputy] = []
+            deputy_status_changes[deputy].append((cmd, old_status, new_status))
+        for deputy in deputies:
+            self._maybe_emit_status_change_signals(deputy,
+                    deputy_status_changes[deputy])
         self.send_orders()
 
     def set_command_exec(self, cmd, exec_str):
@@ -977,6 +1235,7 @@ class Sheriff(object):
         @param exec_str the actual command string to execute.
         """
         cmd.exec_str = exec_str
+        self._mark_orders_dirty(cmd)
 
     def set_command_id(self, cmd, new_id):
         """Set the command id.
@@ -989,6 +1248,8 @@ class Sheriff(object):
         if self.get_commands_by_id(new_id):
             _warn("Duplicate command id [%s]" % new_id)
         cmd.command_id = new_id
+        self._command_index.reindex(cmd)
+        self._mark_orders_dirty(cmd)
 
     def set_command_group(self, cmd, group_name):
         """Set the command group.
@@ -1005,6 +1266,8 @@ class Sheriff(object):
         old_group = cmd.group
         if old_group != group_name:
             cmd._set_group(group_name)
+            self._command_index.reindex(cmd)
+            self._mark_orders_dirty(cmd)
             self.command_group_changed( cmd)
 
     def set_auto_respawn(self, cmd, newauto_respawn):
@@ -1016,18 +1279,21 @@ class Sheriff(object):
         restarted.
         """
         cmd.auto_respawn = newauto_respawn
+        self._mark_orders_dirty(cmd)
 
     def set_command_stop_signal(self, cmd, new_stop_signal):
         """Set the OS signal that is sent to a command when requesting it to
         stop cleanly.  If the command doesn't cleanly exit within the stop time
         allowed, then it is sent a SIGKILL."""
         cmd.stop_signal = new_stop_signal
+        self._mark_orders_dirty(cmd)
 
     def set_command_stop_time_allowed(self, cmd, new_stop_time_allowed):
         """Set how much time (seconds) to wait for a command to exit cleanly when
         stopping the command, before sending it a SIGKILL.  Integer values only.
         """
         cmd.stop_time_allowed = int(new_stop_time_allowed)
+        self._mark_orders_dirty(cmd)
 
     def schedule_command_for_removal(self, cmd):
         """Remove a command.  This starts the process of purging a command from
@@ -1110,6 +1376,8 @@ class Sheriff(object):
             cmds = deputy._commands.values()
             if not deputy._commands or \
                     all([ cmd.scheduled_for_removal for cmd in cmds ]):
+                for cmd in cmds:
+                    self._command_index.remove(cmd)
                 del self._deputies[deputy_name]
 
     def get_command_by_sheriff_id(self, sheriff_id):
@@ -1119,10 +1387,9 @@ class Sheriff(object):
         is not the same as the user-assigned command ID.  You generally should
         not need to use this function.
         """
-        for deputy in self._deputies.values():
-            if sheriff_id in deputy._commands:
-                return deputy._commands[sheriff_id]
-        raise KeyError("No such command")
+        if not self._command_index.has_sheriff_id(sheriff_id):
+            raise KeyError("No such command")
+        return self._command_index.get(sheriff_id)[1]
 
     def get_command_deputy(self, command):
         """Retrieve the SheriffDeputy that manages the specified command.
@@ -1132,10 +1399,12 @@ class Sheriff(object):
         @return a SheriffDeputy object corresponding to the deputy that manages
         the specified command.
         """
-        for deputy in self._deputies.values():
-            if command.sheriff_id in deputy._commands:
-                return deputy
-        raise KeyError("No such command")
+        if not self._command_index.has_sheriff_id(command.sheriff_id):
+            raise KeyError("No such command")
+        deputy, indexed_cmd = self._command_index.get(command.sheriff_id)
+        if indexed_cmd is not command:
+            raise KeyError("No such command")
+        return deputy
 
     def get_all_commands(self):
         """Retrieve all commands managed by all deputies.
@@ -1159,11 +1428,9 @@ class Sheriff(object):
         """
         if deputy_name not in self._deputies:
             return []
-        result = []
-        for cmd in self._deputies[deputy_name]._commands.values():
-            if cmd.command_id == cmd_id:
-                result.append(cmd)
-        return result
+        deputy = self._deputies[deputy_name]
+        return [ cmd for cmd in self._command_index.get_commands_by_id(cmd_id) \
+                if deputy.owns_command(cmd) ]
 
     def get_commands_by_id(self, cmd_id):
         """Retrieve all commands with the specified id.  This should only
@@ -1174,12 +1441,7 @@ class Sheriff(object):
         @return a list of SheriffDeputyCommand objects matching the query, or an
         empty list if none are found.
         """
-        result = []
-        for deputy in self._deputies.values():
-            for cmd in deputy._commands.values():
-                if cmd.command_id == cmd_id:
-                    result.append(cmd)
-        return result
+        return self._command_index.get_commands_by_id(cmd_id)
 
     def get_commands_by_group(self, group_name):
         """Retrieve a list of all commands in the specified group.  Use this
@@ -1190,19 +1452,11 @@ class Sheriff(object):
 
         @return a list of SheriffDeputyCommand objects.
         """
-        result = []
         group_name = group_name.strip("/")
         while group_name.find("//") >= 0:
             group_name = group_name.replace("//", "/")
         group_parts = group_name.split("/")
-        for deputy in self._deputies.values():
-            for cmd in deputy._commands.values():
-                cmd_group_parts = cmd.group.split("/")
-                if len(group_parts) <= len(cmd_group_parts) and \
-                        all([ cgp == gp for cgp, gp in zip(group_parts,
-                            cmd_group_parts)]):
-                    result.append(cmd)
-        return result
+        return self._command_index.get_commands_by_group_parts(group_parts)
 
     def get_active_script(self):
         """Retrieve the currently executing script
@@ -1382,14 +1636,11 @@ class Sheriff(object):
 
         # execute an immediate action if applicable
         if action.action_type == "start":
-            for cmd in cmds:
-                self.start_command(cmd)
+            self.start_commands(cmds)
         elif action.action_type == "stop":
-            for cmd in cmds:
-                self.stop_command(cmd)
+            self.stop_commands(cmds)
         elif action.action_type == "restart":
-            for cmd in cmds:
-                self.restart_command(cmd)
+            self.restart_commands(cmds)
 
         # do we need to wait for the commands to achieve a desired status?
         if action.wait_status:
@@ -75,7 +75,7 @@ class SheriffCommandConsole(gtk.ScrolledWindow):
 
         self.sheriff.command_added.connect(self._on_sheriff_command_added)
         self.sheriff.command_removed.connect(self._on_sheriff_command_removed)
-        self.sheriff.command_status_changed.connect(self._on_sheriff_command_status_changed)
+        self.sheriff.commands_status_changed.connect(self._on_sheriff_commands_status_changed)
 
         self._cmd_extradata = {}
 
@@ -186,10 +186,11 @@ class SheriffCommandConsole(gtk.ScrolledWindow):
         self._add_text_to_buffer (self.sheriff_tb, now_str() +
                 "[%s] removed [%s] [%s]\n" % (deputy.name, command.command_id, command.exec_str))
 
-    def _on_sheriff_command_status_changed (self, cmd,
-            old_status, new_status):
-        self._add_text_to_buffer (self.sheriff_tb, now_str() +
-                "[%s] new status: %s\n" % (cmd.command_id, new_status))
+    def _on_sheriff_commands_status_changed (self, deputy, status_changes):
+        prefix = now_str()
+        self._add_text_to_buffer (self.sheriff_tb, "".join([ prefix +
+            "[%s] new status: %s\n" % (cmd.command_id, new_status) \
+                for cmd, old_status, new_status in status_changes ]))
 
     def on_tb_populate_menu(self,textview, menu):
         sep = gtk.SeparatorMenuItem()
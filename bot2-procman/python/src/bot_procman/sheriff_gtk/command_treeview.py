@@ -168,16 +168,13 @@ class SheriffCommandTreeView(gtk.TreeView):
 #            self.set_text_color(gtk.gdk.Color(save_map["cmd_treeview_text_color"]))
 
     def _start_selected_commands (self, *args):
-        for cmd in self.get_selected_commands ():
-            self.sheriff.start_command (cmd)
+        self.sheriff.start_commands (self.get_selected_commands ())
 
     def _stop_selected_commands (self, *args):
-        for cmd in self.get_selected_commands ():
-            self.sheriff.stop_command (cmd)
+        self.sheriff.stop_commands (self.get_selected_commands ())
 
     def _restart_selected_commands (self, *args):
-        for cmd in self.get_selected_commands ():
-            self.sheriff.restart_command (cmd)
+        self.sheriff.restart_commands (self.get_selected_commands ())
 
     def _remove_selected_commands (self, *args):
         for cmd in self.get_selected_commands ():
@@ -75,10 +75,10 @@ class SheriffGtk(object):
         self.spawned_deputy = None
 
         # create sheriff and subscribe to events
-        self.sheriff = sheriff.Sheriff (self.lc)
+        self.sheriff = sheriff.Sheriff (self.lc, command_status_signal=False)
         self.sheriff.command_added.connect(self._schedule_cmds_update)
         self.sheriff.command_removed.connect(self._schedule_cmds_update)
-        self.sheriff.command_status_changed.connect(self._schedule_cmds_update)
+        self.sheriff.commands_status_changed.connect(self._schedule_cmds_update)
         self.sheriff.command_group_changed.connect(self._schedule_cmds_update)
         self.sheriff.script_started.connect(self._on_script_started)
         self.sheriff.script_action_executing.connect(self._on_script_action_executing)
@@ -267,6 +267,7 @@ class SheriffGtk(object):
 
     def _schedule_cmds_update(self, *unused):
         if not self.cmds_update_scheduled:
+            self.cmds_update_scheduled = True
             gobject.timeout_add(100, self._do_repopulate)
         return True
 
@@ -709,6 +710,12 @@ Options:
                       If set to "observe", then the sheriff self-demotes to
                       observer mode.
 
+  --orders-keepalive <seconds>
+                      Only send orders to a deputy when its commands change,
+                      and otherwise resend unchanged orders every <seconds>
+                      seconds.  By default, orders are sent to every deputy
+                      once a second.
+
   -h, --help          Shows this help text
 
 If <procman_config_file> is specified, then the sheriff tries to load
@@ -723,7 +730,8 @@ named script once the config file is loaded.
 def main():
     try:
         opts, args = getopt.getopt( sys.argv[1:], 'hlon',
-                ['help','lone-ranger', 'on-script-complete=', 'no-gui', 'observer'] )
+                ['help','lone-ranger', 'on-script-complete=', 'no-gui', 'observer',
+                 'orders-keepalive='] )
     except getopt.GetoptError:
         usage()
         sys.exit(2)
@@ -732,6 +740,7 @@ def main():
     use_gui = True
     script_done_action = None
     observer = False
+    orders_keepalive = 0
 
     for optval, argval in opts:
         if optval in [ '-l', '--lone-ranger' ]:
@@ -744,6 +753,11 @@ def main():
             script_done_action = argval
             if argval not in [ "exit", "observe" ]:
                 usage()
+        elif optval in [ '--orders-keepalive' ]:
+            try:
+                orders_keepalive = float(argval)
+            except ValueError:
+                usage()
         elif optval in [ '-h', '--help' ]:
             usage()
 
@@ -781,6 +795,7 @@ def main():
 
     if use_gui:
         gui = SheriffGtk(lc)
+        gui.sheriff.set_orders_keepalive(orders_keepalive)
         if observer:
             gui.set_observer(True)
         if spawn_deputy:
@@ -815,7 +830,10 @@ def main():
         if not script_name:
             print("No script specified and running in headless mode.  Exiting")
             sys.exit(1)
-        SheriffHeadless(lc, cfg, spawn_deputy, script_name, script_done_action).run()
+        headless = SheriffHeadless(lc, cfg, spawn_deputy, script_name,
+                script_done_action)
+        headless.sheriff.set_orders_keepalive(orders_keepalive)
+        headless.run()
 
 if __name__ == "__main__":
     main()